@@ -13,6 +13,13 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/znstrider/tmscrape",
     packages=setuptools.find_packages(),
+    extras_require={
+        'archive': ['zstandard'],
+        'parquet': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': ['tmscrape=tmscrape.cli:main'],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License"
@@ -1 +1,14 @@
-from .scrapers import *
\ No newline at end of file
+from .scrapers import *
+from .registry import EntityRegistry, REGISTRY, save_registry, load_registry
+from .fetcher import crawl_memo, start_memo, stop_memo
+from .dateparse import parse_dates, get_invalid_dates, reset_invalid_dates
+from .resultcache import ResultCache, set_result_cache
+from .mvstore import MarketValueStore, MV_STORE, save_mv_store, load_mv_store
+from .standings import compute_standings, validate_standings, check_standings, gameweek_placements
+from .scheduler import RecrawlScheduler, plan_to_jobs
+from .discovery import SeenSet, BloomFilter, Frontier, discover
+from .tracing import Tracer, tracing, start_tracing, stop_tracing, get_tracer
+from .live import MatchdayPoller, poll_league_games
+from .network import TransferNetwork
+from .injuries import InjuryIndex, INJURY_INDEX, save_injury_index, load_injury_index
+from .store import Warehouse
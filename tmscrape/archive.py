@@ -0,0 +1,257 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .fetcher import normalize_url
+
+
+SEGMENT_BYTES = 256 * 1024 * 1024
+RECORD_MAGIC = b'TMA1 '
+
+
+def compress(content, codec, level=None):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 10).compress(content)
+    if codec == 'zlib':
+        return zlib.compress(content, level or 6)
+    raise ValueError(f'unknown codec {codec}')
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError('reading zstd records requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    raise ValueError(f'unknown codec {codec}')
+
+
+def read_record(path, record):
+    '''
+    reads the raw page bytes of an index record of the archive in directory path,
+    without opening the index, ie. in worker processes
+    '''
+    with open(os.path.join(path, record['segment']), 'rb') as f:
+        f.seek(record['offset'])
+        return decompress(f.read(record['length']), record['codec'])
+
+
+class PageArchive(object):
+    '''
+    an append-only archive of raw fetched pages, so parsers can be rerun without fetching again.
+
+    Pages are compressed one by one (zstd if the zstandard package is installed, zlib otherwise)
+    and appended to segment files. Every record starts with a json header line (url, fetch time, status),
+    similar to a WARC record, so segments stay readable without the index.
+    An SQLite index maps (url, fetch time) to segment and offset for random access reads.
+
+    Parameters:
+    -----------
+    path: the archive directory, created if it does not exist
+    segment_bytes = SEGMENT_BYTES: size after which a new segment file is started
+    codec = None: 'zstd' or 'zlib', defaults to zstd if available
+    level = None: compression level of the codec
+    '''
+
+    def __init__(self, path, segment_bytes=SEGMENT_BYTES, codec=None, level=None):
+        if codec is None:
+            codec = 'zlib' if zstandard is None else 'zstd'
+        assert codec in ['zstd', 'zlib'], "codec must be in ['zstd', 'zlib']"
+        if (codec == 'zstd') and (zstandard is None):
+            raise ImportError('codec zstd requires the zstandard package')
+
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.codec = codec
+        self.level = level
+        self._lock = threading.Lock()
+
+        if os.path.isdir(path) == False:
+            os.makedirs(path)
+
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS records (
+                               url TEXT NOT NULL,
+                               fetched_at REAL NOT NULL,
+                               status INTEGER,
+                               segment TEXT NOT NULL,
+                               offset INTEGER NOT NULL,
+                               length INTEGER NOT NULL,
+                               raw_length INTEGER NOT NULL,
+                               codec TEXT NOT NULL,
+                               sha1 TEXT NOT NULL)''')
+            con.execute('CREATE INDEX IF NOT EXISTS records_url ON records (url, fetched_at)')
+            con.execute('CREATE INDEX IF NOT EXISTS records_segment ON records (segment)')
+
+        segments = sorted(glob.glob(os.path.join(path, 'segment-*.tma')))
+        self._segment = os.path.basename(segments[-1]) if len(segments) > 0 else None
+        if (self._segment is None) or (os.path.getsize(self._segment_path(self._segment)) >= segment_bytes):
+            self._segment = self._next_segment_name()
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, segment)
+
+    def _next_segment_name(self):
+        segments = sorted(glob.glob(os.path.join(self.path, 'segment-*.tma')))
+        n = 0 if len(segments) == 0 else int(os.path.basename(segments[-1])[8:14]) + 1
+        return f'segment-{n:06d}.tma'
+
+    def put(self, url, content, fetched_at=None, status=200):
+        '''
+        appends one page to the archive
+
+        Parameters:
+        -----------
+        url: the fetched url, stored normalized
+        content: the raw response bytes
+        fetched_at = None: unix time of the fetch, defaults to now
+        status = 200: the http status code
+
+        Returns:
+        -----------
+        the sha1 hex digest of content
+        '''
+        url = normalize_url(url)
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        sha1 = hashlib.sha1(content).hexdigest()
+        data = compress(content, self.codec, self.level)
+        header = json.dumps({'url': url, 'fetched_at': fetched_at, 'status': status,
+                             'codec': self.codec, 'length': len(data), 'sha1': sha1}).encode('utf-8')
+
+        with self._lock:
+            segment_path = self._segment_path(self._segment)
+            if os.path.isfile(segment_path) and (os.path.getsize(segment_path) >= self.segment_bytes):
+                self._segment = self._next_segment_name()
+                segment_path = self._segment_path(self._segment)
+
+            with open(segment_path, 'ab') as f:
+                f.write(RECORD_MAGIC + header + b'\n')
+                offset = f.tell()
+                f.write(data)
+
+            with self._connect() as con:
+                con.execute('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (url, fetched_at, status, self._segment, offset, len(data), len(content),
+                             self.codec, sha1))
+        return sha1
+
+    def records(self, url=None, url_like=None, since=None, until=None, latest=False):
+        '''
+        lists index records as dicts, ordered by fetch time
+
+        Parameters:
+        -----------
+        url = None: only records of this url
+        url_like = None: only records whose normalized url matches this SQL LIKE pattern,
+                         ie. '%/kader/verein/%'
+        since, until = None: only records fetched in this range of unix times
+        latest = False: only the latest record of every url
+        '''
+        where = []
+        params = []
+        if url is not None:
+            where.append('url = ?')
+            params.append(normalize_url(url))
+        if url_like is not None:
+            where.append('url LIKE ?')
+            params.append(url_like)
+        if since is not None:
+            where.append('fetched_at >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('fetched_at <= ?')
+            params.append(until)
+        where = ('WHERE ' + ' AND '.join(where)) if len(where) > 0 else ''
+
+        if latest:
+            query = f'''SELECT r.* FROM records r
+                        JOIN (SELECT url, MAX(fetched_at) AS fetched_at FROM records {where} GROUP BY url) l
+                        ON r.url = l.url AND r.fetched_at = l.fetched_at ORDER BY r.fetched_at'''
+        else:
+            query = f'SELECT * FROM records {where} ORDER BY fetched_at'
+
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            return [dict(row) for row in con.execute(query, params)]
+
+    def read(self, record):
+        '''
+        reads the raw page bytes of an index record
+        '''
+        return read_record(self.path, record)
+
+    def get(self, url, at=None):
+        '''
+        reads the raw bytes of the latest fetch of url, or the latest fetch before the unix time at
+
+        Returns:
+        -----------
+        the page bytes, or None if the url is not archived
+        '''
+        records = self.records(url=url, until=at)
+        if len(records) == 0:
+            return None
+        return self.read(records[-1])
+
+    def size(self):
+        return sum(os.path.getsize(segment) for segment in glob.glob(os.path.join(self.path, 'segment-*.tma')))
+
+    def prune(self, max_age=None, max_bytes=None):
+        '''
+        deletes whole segments, except the one being written to:
+        segments whose newest record is older than max_age seconds,
+        then the oldest segments until the archive is at most max_bytes large
+
+        Returns:
+        -----------
+        a list of the deleted segments
+        '''
+        with self._lock:
+            with self._connect() as con:
+                newest = dict(con.execute('SELECT segment, MAX(fetched_at) FROM records GROUP BY segment'))
+
+            segments = sorted(os.path.basename(segment) for segment in glob.glob(os.path.join(self.path, 'segment-*.tma')))
+            segments = [segment for segment in segments if segment != self._segment]
+            sizes = {segment: os.path.getsize(self._segment_path(segment)) for segment in segments}
+
+            delete = []
+            if max_age is not None:
+                now = time.time()
+                delete = [segment for segment in segments if now - newest.get(segment, 0) > max_age]
+
+            if max_bytes is not None:
+                total = self.size() - sum(sizes[segment] for segment in delete)
+                for segment in segments:
+                    if total <= max_bytes:
+                        break
+                    if segment not in delete:
+                        delete.append(segment)
+                        total -= sizes[segment]
+
+            with self._connect() as con:
+                con.executemany('DELETE FROM records WHERE segment = ?', [(segment,) for segment in delete])
+            for segment in delete:
+                os.remove(self._segment_path(segment))
+
+        return delete
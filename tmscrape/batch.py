@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from .fetcher import fetch, get_fetch_stats, reset_fetch_stats
+from .registry import REGISTRY
+from .scrapers import (MAX_WORKERS, COMPETITION_REGIONS, get_clubnames_league, scrape_kaderdaten,
+                       scrape_leistungsdaten, scrape_squads_many, get_player_mv_history, get_transfer_history,
+                       get_spieler_verletzungshistorie, get_player_leistungsdaten,
+                       get_national_team_history, scrape_gameinfo_by_pos, get_competition_list,
+                       get_all_competitions, get_team_schedule, scrape_schedules, get_club_colors)
+from .tracing import span, tracing
+
+
+PLAYER_PAGES = {'mv': get_player_mv_history,
+                'transfers': get_transfer_history,
+                'injuries': get_spieler_verletzungshistorie,
+                'performance': get_player_leistungsdaten,
+                'national': get_national_team_history,
+                'positions': scrape_gameinfo_by_pos}
+
+
+def make_job(name, func, **kwargs):
+    '''
+    a job for run_jobs: the scraper func called with kwargs, its result stored under name
+    '''
+    return {'name': name, 'func': func, 'kwargs': kwargs}
+
+
+def call_job(job):
+    '''
+    runs a job, as a span named after its scraper if tracing is on
+    '''
+    with span(job['func'].__name__, cat='job', job=job['name']):
+        return job['func'](**job['kwargs'])
+
+
+def run_jobs(jobs,
+             max_workers=MAX_WORKERS,
+             sink=None,
+             progress=True,
+             stream=sys.stderr,
+             profile=False):
+    '''
+    runs scraper jobs concurrently and reports progress and throughput
+
+    Parameters:
+    -----------
+    jobs: an iterable of make_job dicts
+    max_workers = MAX_WORKERS: number of jobs run at the same time
+    sink = None: a sink with a write(name, result) method, ie. DirectorySink.
+                 If None the results are returned.
+    progress = True: whether to print progress after every job
+    stream = sys.stderr: where progress is printed to
+    profile = False: trace every job (see tracing) and print the time spent per stage when done.
+                     The trace is kept by tracing.get_tracer(), ie. for save_chrome_trace.
+
+    Returns:
+    -----------
+    results, failures: a dict of results by job name (empty if a sink is given)
+                       and a list of [job name, error] for the jobs that raised
+    '''
+    if profile:
+        with tracing() as tracer:
+            results, failures = run_jobs(jobs, max_workers=max_workers, sink=sink, progress=progress, stream=stream)
+        print(tracer.summary().to_string(), file=stream)
+        return results, failures
+
+    jobs = list(jobs)
+    results = {}
+    failures = []
+
+    reset_fetch_stats()
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(call_job, job): job for job in jobs}
+
+        for i, future in enumerate(as_completed(futures), 1):
+            # drop the future once handled, so a result is not kept after it was written to the sink
+            job = futures.pop(future)
+            try:
+                result = future.result()
+                if sink is not None:
+                    sink.write(job['name'], result)
+                else:
+                    results[job['name']] = result
+            except Exception as e:
+                failures.append([job['name'], f'{type(e).__name__}: {e}'])
+
+            if progress:
+                elapsed = time.time() - start
+                stats = get_fetch_stats()
+                print(f'[{i}/{len(jobs)}] {job["name"]} - {i / elapsed:.2f} jobs/s, '
+                      f'{stats["requests"] / elapsed:.2f} requests/s, '
+                      f'{stats["bytes"] / elapsed / 1e6:.2f} MB/s, {len(failures)} failed',
+                      file=stream)
+
+    if sink is not None:
+        sink.close()
+
+    return results, failures
+
+
+def league_jobs(league_abbrev,
+                season,
+                kader=True,
+                leistungsdaten=True,
+                league_only=False,
+                combined=False):
+    '''
+    the league orchestrator: resolves the clubs of a league season
+    and returns the squad and performance jobs for all of them
+
+    Parameters:
+    -----------
+    league_abbrev: the transfermarkt specific league abbreviation, ie. L1
+    season: the year the season begins, ie: 2019
+    kader = True: whether to scrape the 'Kaderdaten' of every club
+    leistungsdaten = True: whether to scrape the 'Leistungsdaten' of every club
+    league_only = False: restrict 'Leistungsdaten' to league matches
+    combined = False: one job per page kind for the whole league season, cleaned in a single pass
+                      (see scrape_squads_many), instead of one job per club
+
+    Returns:
+    -----------
+    a list of jobs. If the clubs cannot be resolved now, one league season job per page kind
+    that resolves them when it runs (see scrape_league_squads), so the error is a failure of run_jobs.
+    '''
+    league_name = REGISTRY.get_slug('competition', league_abbrev, default='wettbewerb')
+    try:
+        clubs = get_clubnames_league(league_abbrev, league_name=league_name, season_id=season)
+    except Exception as e:
+        print(f'clubs of {league_abbrev}-{season} - could not be resolved, deferred to the jobs: '
+              f'{type(e).__name__}: {e}', file=sys.stderr)
+        combined = True
+        clubs = None
+
+    jobs = []
+    if combined and (clubs is None):
+        for kind, scrape in [['kader', kader], ['leistungsdaten', leistungsdaten]]:
+            if scrape:
+                jobs.append(make_job(f'{kind}_{league_abbrev}_{season}', scrape_league_squads,
+                                     league_abbrev=league_abbrev, season=season, kind=kind, league_only=league_only))
+        return jobs
+
+    if combined:
+        clubs = [[str(club), str(club_id)] for club, club_id in clubs]
+        if kader:
+            jobs.append(make_job(f'kader_{league_abbrev}_{season}', scrape_squads_many,
+                                 clubs=clubs, seasons=[season], kind='kader'))
+        if leistungsdaten:
+            jobs.append(make_job(f'leistungsdaten_{league_abbrev}_{season}', scrape_squads_many,
+                                 clubs=clubs, seasons=[season], kind='leistungsdaten',
+                                 league_abbrev=league_abbrev if league_only else None))
+        return jobs
+
+    for club, club_id in clubs:
+        if kader:
+            jobs.append(make_job(f'kader_{league_abbrev}_{season}_{club}', scrape_kaderdaten,
+                                 club=club, club_id=club_id, season=season))
+        if leistungsdaten:
+            jobs.append(make_job(f'leistungsdaten_{league_abbrev}_{season}_{club}', scrape_leistungsdaten,
+                                 club=club, club_id=club_id, season=season,
+                                 league_abbrev=league_abbrev if league_only else None))
+    return jobs
+
+
+def scrape_league_squads(league_abbrev, season, kind='kader', league_only=False):
+    '''
+    resolves the clubs of a league season and scrapes all their squads with scrape_squads_many,
+    the job league_jobs falls back to when the clubs cannot be resolved up front
+    '''
+    league_name = REGISTRY.get_slug('competition', league_abbrev, default='wettbewerb')
+    clubs = get_clubnames_league(league_abbrev, league_name=league_name, season_id=season)
+    clubs = [[str(club), str(club_id)] for club, club_id in clubs]
+    return scrape_squads_many(clubs=clubs, seasons=[season], kind=kind,
+                              league_abbrev=league_abbrev if (league_only and kind == 'leistungsdaten') else None)
+
+
+def player_jobs(player_ids, pages=('mv', 'transfers')):
+    '''
+    jobs for the player pages (keys of PLAYER_PAGES) of every player_id
+    '''
+    jobs = []
+    for player_id in player_ids:
+        for page in pages:
+            kwargs = {'player_id': player_id}
+            if page == 'positions':
+                kwargs['detailed'] = True
+            jobs.append(make_job(f'{page}_{player_id}', PLAYER_PAGES[page], **kwargs))
+    return jobs
+
+
+def competition_jobs(regions=None):
+    '''
+    jobs for the competition lists of regions, or one job for get_all_competitions if None
+    '''
+    if regions is None:
+        return [make_job('competitions', get_all_competitions)]
+    for region in regions:
+        assert region in COMPETITION_REGIONS, f'regions must be in {COMPETITION_REGIONS}'
+    return [make_job(f'competitions_{region}', get_competition_list, competition_string=region)
+            for region in regions]
+
+
+def schedule_jobs(ids, seasons=None):
+    '''
+    jobs for team schedules if seasons is None, otherwise
+    one job per league (ids: league abbreviations) fetching all seasons at once
+    '''
+    if seasons is None:
+        return [make_job(f'schedule_{team_id}', get_team_schedule, team_id=team_id) for team_id in ids]
+
+    return [make_job(f'schedule_{league_abbrev}_{min(seasons)}-{max(seasons)}', scrape_schedules,
+                     competition=league_abbrev, seasons=list(seasons))
+            for league_abbrev in ids]
+
+
+def get_club_media(club_id, out_dir):
+    '''
+    downloads the emblem of a club to out_dir/emblems and scrapes its club colors
+
+    Returns:
+    -----------
+    a DataFrame with one row of club_id, Colors and Emblem (the file path)
+    '''
+    emblem_dir = os.path.join(out_dir, 'emblems')
+    if os.path.isdir(emblem_dir) == False:
+        os.makedirs(emblem_dir, exist_ok=True)
+
+    response = fetch(f'https://tmssl.akamaized.net//images/wappen/big/{club_id}.png')
+    response.raise_for_status()
+    emblem = os.path.join(emblem_dir, f'{club_id}.png')
+    with open(emblem, 'wb') as f:
+        f.write(response.content)
+
+    colors = get_club_colors(None, club_id)
+
+    return pd.DataFrame({'club_id': [club_id], 'Colors': [','.join(colors)], 'Emblem': [emblem]})
+
+
+def media_jobs(club_ids, out_dir):
+    return [make_job(f'media_{club_id}', get_club_media, club_id=club_id, out_dir=out_dir)
+            for club_id in club_ids]
@@ -0,0 +1,200 @@
+import argparse
+import os
+import sys
+import time
+
+from . import batch
+from .archive import PageArchive
+from .fetcher import set_archive, set_rate_limit, start_memo
+from .registry import REGISTRY, REGISTRY_PATH
+from .resultcache import ResultCache, set_result_cache
+from .reparse import REPARSERS, reparse
+from .scrapers import MAX_WORKERS, COMPETITION_REGIONS
+from .sinks import DirectorySink, StreamingSink, SINK_FORMATS
+from .tracing import start_tracing, stop_tracing
+from .workqueue import SQLiteQueue, job_to_spec, run_worker
+
+
+def read_ids(ids, files):
+    '''
+    collects ids from the command line and from files with one id per line ('#' starts a comment)
+    '''
+    ids = list(ids)
+    for file in files or []:
+        with (sys.stdin if file == '-' else open(file)) as f:
+            for line in f:
+                line = line.split('#')[0].strip()
+                if line:
+                    ids.append(line)
+    return ids
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tmscrape',
+                                     description='batch dataset builds from transfermarkt.de')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('ids', nargs='*', help='ids to scrape')
+    common.add_argument('-f', '--file', action='append', dest='files',
+                        help='file with one id per line, - for stdin. Can be repeated')
+    common.add_argument('-o', '--out', default='tmscrape_output', help='output directory')
+    common.add_argument('--format', default='csv', choices=SINK_FORMATS, help='output file format')
+    common.add_argument('--stream', action='store_true',
+                        help='stream results into one Parquet dataset per table instead of a file per job')
+    common.add_argument('--max-memory', type=float, default=256,
+                        help='with --stream: MB of results buffered before they are flushed')
+    common.add_argument('-w', '--workers', type=int, default=MAX_WORKERS, help='jobs run at the same time')
+    common.add_argument('--rate', type=float, default=None,
+                        help='maximum requests per second over all workers, default unlimited')
+    common.add_argument('--no-cache', action='store_true',
+                        help='do not keep responses in memory for the run (implied by --stream)')
+    common.add_argument('--archive', default=None,
+                        help='directory of a raw page archive every fetched page is appended to')
+    common.add_argument('--result-cache', default=None,
+                        help='directory of a cache of parsed results, reused when a page did not change')
+    common.add_argument('--registry', default=REGISTRY_PATH,
+                        help='entity registry snapshot loaded before and saved after the run')
+    common.add_argument('--no-registry', action='store_true', help='do not load or save the registry')
+    common.add_argument('--profile', default=None, metavar='PREFIX',
+                        help='trace the run and write PREFIX.trace.json (Chrome trace) and PREFIX.collapsed (flamegraph stacks)')
+    common.add_argument('-q', '--quiet', action='store_true', help='do not report progress')
+    common.add_argument('--queue', default=None,
+                        help='SQLite work queue on a shared volume: enqueue the jobs for tmscrape worker instead of running them')
+
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    league = subparsers.add_parser('league', parents=[common],
+                                   help='squads and performance data of all clubs of leagues (ids: league abbreviations)')
+    league.add_argument('-s', '--season', type=int, action='append', required=True,
+                        help='the year a season begins. Can be repeated')
+    league.add_argument('--no-kader', action='store_true', help='skip the Kaderdaten')
+    league.add_argument('--no-leistungsdaten', action='store_true', help='skip the Leistungsdaten')
+    league.add_argument('--league-only', action='store_true', help='Leistungsdaten of league matches only')
+    league.add_argument('--combined', action='store_true',
+                        help='one output per league season instead of one per club, cleaned in a single pass')
+
+    players = subparsers.add_parser('players', parents=[common], help='player pages (ids: player ids)')
+    players.add_argument('-p', '--page', action='append', choices=sorted(batch.PLAYER_PAGES),
+                         help='player pages to scrape, default mv and transfers. Can be repeated')
+
+    subparsers.add_parser('competitions', parents=[common],
+                          help=f'competition lists (ids: regions of {COMPETITION_REGIONS}, all if none given)')
+
+    schedule = subparsers.add_parser('schedule', parents=[common],
+                                     help='team schedules (ids: club ids) or league schedules with --season (ids: league abbreviations)')
+    schedule.add_argument('-s', '--season', type=int, action='append',
+                          help='the year a season begins. Can be repeated')
+
+    subparsers.add_parser('media', parents=[common], help='club emblems and colors (ids: club ids)')
+
+    reparse_parser = subparsers.add_parser('reparse', parents=[common],
+                                           help=f'rerun scrapers over the pages of an --archive (ids: scrapers of {sorted(REPARSERS)})')
+    reparse_parser.add_argument('--all-versions', action='store_true',
+                                help='parse every archived version of a page, not only the latest')
+
+    worker = subparsers.add_parser('worker', parents=[common], help='run the jobs of a --queue until it is drained')
+    worker.add_argument('--worker-id', default=None, help='name of this worker, defaults to host and process id')
+    worker.add_argument('--wait', action='store_true', help='keep polling the queue when it is drained')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ids = read_ids(args.ids, args.files)
+
+    set_rate_limit(args.rate)
+    # the memo would keep the raw pages that --stream flushes the results of
+    if not (args.no_cache or args.stream):
+        start_memo()
+    if (args.archive is not None) and (args.command != 'reparse'):
+        set_archive(PageArchive(args.archive))
+    if args.result_cache is not None:
+        set_result_cache(ResultCache(args.result_cache))
+    if (not args.no_registry) and os.path.isfile(args.registry):
+        REGISTRY.load(args.registry)
+
+    if args.profile is not None:
+        start_tracing()
+
+    start = time.time()
+
+    if args.command == 'league':
+        jobs = []
+        for league_abbrev in ids:
+            for season in args.season:
+                jobs += batch.league_jobs(league_abbrev, season,
+                                          kader=not args.no_kader,
+                                          leistungsdaten=not args.no_leistungsdaten,
+                                          league_only=args.league_only,
+                                          combined=args.combined)
+    elif args.command == 'players':
+        jobs = batch.player_jobs(ids, pages=args.page or ['mv', 'transfers'])
+    elif args.command == 'competitions':
+        jobs = batch.competition_jobs(ids or None)
+    elif args.command == 'schedule':
+        jobs = batch.schedule_jobs(ids, seasons=args.season)
+    elif args.command == 'media':
+        jobs = batch.media_jobs(ids, args.out)
+    elif args.command in ['worker', 'reparse']:
+        jobs = []
+
+    if args.stream:
+        sink = StreamingSink(args.out, max_memory_bytes=int(args.max_memory * 1024 * 1024))
+    else:
+        sink = DirectorySink(args.out, fmt=args.format)
+
+    if args.command == 'worker':
+        if args.queue is None:
+            print('tmscrape worker requires --queue', file=sys.stderr)
+            return 2
+        queue = SQLiteQueue(args.queue)
+        stream = open(os.devnull, 'w') if args.quiet else sys.stderr
+        try:
+            completed = run_worker(queue, worker_id=args.worker_id, sink=sink, max_workers=args.workers,
+                                   exit_when_empty=not args.wait, stream=stream)
+        finally:
+            if stream is not sys.stderr:
+                stream.close()
+        failures = queue.failures()
+        summary = f'{completed} jobs completed by this worker, queue: {queue.counts()}'
+    elif args.command == 'reparse':
+        if args.archive is None:
+            print('tmscrape reparse requires --archive', file=sys.stderr)
+            return 2
+        failures = []
+        for scraper in ids:
+            _, scraper_failures = reparse(PageArchive(args.archive), scraper, workers=args.workers, sink=sink,
+                                          latest=not args.all_versions, progress=not args.quiet)
+            failures += scraper_failures
+        summary = f'{len(ids)} scrapers reparsed with {len(failures)} failed pages, written to {args.out}'
+    elif args.queue is not None:
+        n = SQLiteQueue(args.queue).put([job_to_spec(job) for job in jobs])
+        failures = []
+        summary = f'{n} new jobs of {len(jobs)} enqueued to {args.queue}'
+    else:
+        _, failures = batch.run_jobs(jobs, max_workers=args.workers, sink=sink, progress=not args.quiet)
+        summary = f'{len(jobs) - len(failures)}/{len(jobs)} jobs succeeded, written to {args.out}'
+
+    if not args.no_registry:
+        REGISTRY.save(args.registry)
+
+    if args.profile is not None:
+        tracer = stop_tracing()
+        tracer.save_chrome_trace(f'{args.profile}.trace.json')
+        tracer.save_collapsed(f'{args.profile}.collapsed')
+        if not args.quiet:
+            print(tracer.summary().to_string(), file=sys.stderr)
+
+    print(f'{summary} in {time.time() - start:.1f}s', file=sys.stderr)
+    if len(failures) > 0:
+        print(f'{len(failures)} jobs failed:', file=sys.stderr)
+        for name, error in failures:
+            print(f'  {name}: {error}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import sys
+import threading
+
+import pandas as pd
+
+
+# the date formats transfermarkt uses on each domain, tried in order
+DATE_FORMATS = {'de': ['%d.%m.%Y', '%d.%m.%y'],
+                'com': ['%b %d, %Y', '%d/%m/%Y', '%d.%m.%Y', '%d.%m.%y'],
+                'co.uk': ['%d/%m/%Y', '%b %d, %Y', '%d.%m.%Y', '%d.%m.%y']}
+
+# placeholders transfermarkt shows instead of a date, parsed to NaT without being reported
+MISSING_DATES = ['', '-', '?', 'k. A.', 'unbekannt', 'unknown', 'N/A', 'nan', 'None']
+
+CACHE_SIZE = 200000
+
+_cache = {}
+_invalid = {}
+_lock = threading.Lock()
+
+
+def parse_dates(values,
+                domain='de',
+                formats=None,
+                errors='report',
+                name=None,
+                stream=sys.stderr):
+    '''
+    parses transfermarkt date strings with the explicit formats of a domain instead of format inference.
+    Every distinct string is parsed once and the result is memoized across calls,
+    then mapped back onto all values.
+
+    Parameters:
+    -----------
+    values: a Series, Index or list of date strings
+    domain = 'de': the transfermarkt domain the strings come from, a key of DATE_FORMATS
+    formats = None: a list of strftime formats tried in order, defaults to DATE_FORMATS[domain]
+    errors = 'report': what to do with strings matching no format that are not in MISSING_DATES:
+                       'report' prints them and returns NaT, 'raise' raises a ValueError, 'coerce' returns NaT silently.
+                       All invalid strings are counted, see get_invalid_dates.
+    name = None: a name for the values used in reports, ie. the column name
+    stream = sys.stderr: where reports are printed to
+
+    Returns:
+    -----------
+    datetimes of the same shape as values: a Series (with the index of values), a DatetimeIndex or a Series for lists
+    '''
+    assert errors in ['report', 'raise', 'coerce'], "errors must be in ['report', 'raise', 'coerce']"
+    if formats is None:
+        assert domain in DATE_FORMATS, f'domain must be in {sorted(DATE_FORMATS)}'
+        formats = DATE_FORMATS[domain]
+    formats = tuple(formats)
+
+    if isinstance(values, pd.Index):
+        strings = pd.Series(values, dtype='object')
+    elif isinstance(values, pd.Series):
+        strings = values.astype('object')
+    else:
+        strings = pd.Series(list(values), dtype='object')
+    strings = strings.where(strings.notna(), '').astype('str').str.strip().str.strip("'")
+
+    uniques = pd.unique(strings)
+    with _lock:
+        known = {value: _cache[(formats, value)] for value in uniques if (formats, value) in _cache}
+    todo = pd.Series([value for value in uniques if value not in known], dtype='object')
+
+    parsed = pd.Series(pd.NaT, index=todo, dtype='datetime64[ns]')
+    remaining = todo[~todo.isin(MISSING_DATES)]
+    for fmt in formats:
+        if len(remaining) == 0:
+            break
+        attempt = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        ok = attempt.notna().to_numpy()
+        parsed.iloc[remaining.index[ok]] = attempt[ok].to_numpy()
+        remaining = remaining[~ok]
+
+    invalid = list(remaining)
+    with _lock:
+        if len(_cache) + len(parsed) > CACHE_SIZE:
+            _cache.clear()
+        # invalid strings are not cached, so they are counted and reported (or raised) on every call
+        invalid_set = set(invalid)
+        for value, date in zip(todo, parsed):
+            if value not in invalid_set:
+                _cache[(formats, value)] = date
+        for value in invalid:
+            _invalid[value] = _invalid.get(value, 0) + 1
+
+    if len(invalid) > 0:
+        message = f'{len(invalid)} invalid dates{" in " + name if name else ""}: {invalid[:10]}'
+        if errors == 'raise':
+            raise ValueError(message)
+        if errors == 'report':
+            print(message, file=stream)
+
+    lookup = pd.concat([pd.Series(known, index=list(known), dtype='datetime64[ns]'),
+                        pd.Series(parsed.to_numpy(), index=todo.to_numpy(), dtype='datetime64[ns]')])
+    dates = pd.Series(lookup.reindex(strings.to_numpy()).to_numpy(), dtype='datetime64[ns]')
+
+    if isinstance(values, pd.Index):
+        return pd.DatetimeIndex(dates, name=values.name)
+    if isinstance(values, pd.Series):
+        dates.index = values.index
+        dates.name = values.name
+    return dates
+
+
+def get_invalid_dates():
+    '''
+    the strings that matched no date format since the last reset, with the number of calls they were seen in
+    '''
+    with _lock:
+        return dict(_invalid)
+
+
+def reset_invalid_dates():
+    with _lock:
+        _invalid.clear()
+
+
+def clear_date_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,363 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .fetcher import get_fetch_stats, set_rate_limit
+from .registry import REGISTRY
+from .scrapers import (MAX_WORKERS, clean_player_names, current_season, extract_kaderdaten, get_all_competitions,
+                       get_clubnames_league, get_transfer_history, iter_soups)
+
+
+class SeenSet(object):
+    '''
+    a persistent set of discovered entity ids in an SQLite file, so discovery can be resumed
+    and runs with memory independent of the number of entities
+
+    Parameters:
+    -----------
+    path: the SQLite database file, created if it does not exist
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+        with self._connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS seen (kind TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (kind, id))')
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def add_many(self, kind, ids):
+        '''
+        adds ids and returns those that were not seen before, in order
+        '''
+        new = []
+        with self._lock:
+            with self._connect() as con:
+                for entity_id in dict.fromkeys(str(entity_id) for entity_id in ids):
+                    if con.execute('INSERT OR IGNORE INTO seen VALUES (?, ?)', (kind, entity_id)).rowcount == 1:
+                        new.append(entity_id)
+        return new
+
+    def __contains__(self, key):
+        kind, entity_id = key
+        with self._connect() as con:
+            return con.execute('SELECT 1 FROM seen WHERE kind = ? AND id = ?', (kind, str(entity_id))).fetchone() is not None
+
+    def count(self, kind=None):
+        with self._connect() as con:
+            if kind is None:
+                return con.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+            return con.execute('SELECT COUNT(*) FROM seen WHERE kind = ?', (kind,)).fetchone()[0]
+
+
+class BloomFilter(object):
+    '''
+    a fixed size probabilistic set for dedup with a false positive rate of about error_rate at capacity,
+    ie. 10 million ids at 0.1 % in 18 MB. An id reported as seen may be new, an id reported as new never was seen.
+
+    Parameters:
+    -----------
+    capacity = 10000000: the expected number of ids
+    error_rate = 0.001: the false positive rate at capacity
+    path = None: a .npy snapshot to load on creation, if it exists
+    '''
+
+    def __init__(self, capacity=10000000, error_rate=0.001, path=None):
+        self.n_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * np.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype='uint8')
+        self._lock = threading.Lock()
+        if (path is not None) and os.path.isfile(path):
+            self.load(path)
+
+    def _positions(self, kind, entity_id):
+        digest = hashlib.blake2b(f'{kind}:{entity_id}'.encode('utf-8'), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'little')
+        b = int.from_bytes(digest[8:], 'little') | 1
+        return np.array([(a + i * b) % self.n_bits for i in range(self.n_hashes)], dtype='int64')
+
+    def add_many(self, kind, ids):
+        new = []
+        with self._lock:
+            for entity_id in dict.fromkeys(str(entity_id) for entity_id in ids):
+                positions = self._positions(kind, entity_id)
+                present = (self.bits[positions >> 3] >> (positions & 7).astype('uint8')) & 1
+                if not present.all():
+                    np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype('uint8'))
+                    new.append(entity_id)
+        return new
+
+    def __contains__(self, key):
+        kind, entity_id = key
+        positions = self._positions(kind, str(entity_id))
+        return bool(((self.bits[positions >> 3] >> (positions & 7).astype('uint8')) & 1).all())
+
+    def save(self, path):
+        np.save(path, self.bits)
+
+    def load(self, path):
+        bits = np.load(path)
+        assert len(bits) == len(self.bits), 'the snapshot was written with another capacity or error_rate'
+        self.bits = bits
+
+
+class Frontier(object):
+    '''
+    an on-disk queue of the squads a discovery pass still has to crawl, as (club_id, season) pairs.
+    Squads are deduplicated by the queue itself, read in insertion order in batches and removed once done,
+    so the frontier of a pass needs no memory and survives an interruption.
+
+    Parameters:
+    -----------
+    path: the SQLite database file, created if it does not exist. May be the file of a SeenSet.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS frontier (
+                               club_id TEXT NOT NULL,
+                               season TEXT NOT NULL,
+                               PRIMARY KEY (club_id, season))''')
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def put_many(self, squads):
+        '''
+        queues [club_id, season] pairs that are not queued yet
+        '''
+        with self._lock:
+            with self._connect() as con:
+                con.executemany('INSERT OR IGNORE INTO frontier VALUES (?, ?)',
+                                [(str(club_id), str(season)) for club_id, season in squads])
+
+    def batch(self, n, after=0):
+        '''
+        the next n queued squads after the position after
+
+        Returns:
+        -----------
+        a list of [position, club_id, season]
+        '''
+        with self._connect() as con:
+            return [list(row) for row in con.execute('SELECT rowid, club_id, season FROM frontier WHERE rowid > ? '
+                                                     'ORDER BY rowid LIMIT ?', (after, n))]
+
+    def remove_many(self, squads):
+        with self._lock:
+            with self._connect() as con:
+                con.executemany('DELETE FROM frontier WHERE club_id = ? AND season = ?',
+                                [(str(club_id), str(season)) for club_id, season in squads])
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute('SELECT COUNT(*) FROM frontier').fetchone()[0]
+
+
+def _squad_url(club, club_id, season):
+    return f'https://www.transfermarkt.de/{club}/kader/verein/{club_id}/saison_id/{season}/plus/1'
+
+
+def discover(seen,
+             seasons=None,
+             competitions=None,
+             league_types=None,
+             transfers=False,
+             max_workers=MAX_WORKERS,
+             batch_size=200,
+             rate=None,
+             max_requests=None,
+             frontier=None):
+    '''
+    walks competitions -> clubs -> squads breadth first and yields every entity the first time it is seen,
+    ie. to enumerate all players. Ids are deduplicated through seen, so a discovery pass can be interrupted
+    and resumed, and entities found in earlier passes are not emitted again.
+
+    Parameters:
+    -----------
+    seen: a SeenSet or BloomFilter
+    seasons = None: the years the seasons begin to collect clubs and squads of, defaults to the current season
+    competitions = None: competition abbreviations to start from, defaults to all competitions of get_all_competitions
+    league_types = None: only start from competitions of these League_Types of get_all_competitions
+    transfers = False: also fetch the transfer history of every new player and walk the squads of the clubs found there
+    max_workers = MAX_WORKERS: number of pages fetched at the same time
+    batch_size = 200: squads crawled per step, the request budget is checked between steps
+    rate = None: maximum requests per second, see fetcher.set_rate_limit
+    max_requests = None: stop after about this many requests
+    frontier = None: the Frontier of squads to crawl, defaults to one in the database of a SeenSet,
+                     or in a temporary file for a BloomFilter
+
+    Yields:
+    -----------
+    DataFrames of newly discovered entities with the columns kind, id, slug, name, source and season
+    '''
+    seasons = [current_season()] if seasons is None else list(seasons)
+    if rate is not None:
+        set_rate_limit(rate)
+    start_requests = get_fetch_stats()['requests']
+
+    def budget_left():
+        return (max_requests is None) or (get_fetch_stats()['requests'] - start_requests < max_requests)
+
+    def emit(kind, ids, slugs, names, source, season=None):
+        ids = [str(entity_id) for entity_id in ids]
+        new = set(seen.add_many(kind, ids))
+        rows = [[kind, entity_id, slug, name, source, season]
+                for entity_id, slug, name in zip(ids, slugs, names) if entity_id in new]
+        return pd.DataFrame(rows, columns=['kind', 'id', 'slug', 'name', 'source', 'season'])
+
+    if competitions is None:
+        table = get_all_competitions(max_workers=max_workers)
+        if league_types is not None:
+            table = table.loc[table['League_Type'].isin(league_types)]
+        competitions = list(table.index)
+        names = list(table['League_Name'])
+    else:
+        competitions = list(competitions)
+        names = [None] * len(competitions)
+
+    slugs = [REGISTRY.get_slug('competition', competition, default='wettbewerb') for competition in competitions]
+    found = emit('competition', competitions, slugs, names, 'competitions')
+    if len(found) > 0:
+        yield found
+
+    temporary = None
+    if frontier is None:
+        if isinstance(seen, SeenSet):
+            frontier = Frontier(seen.path)
+        else:
+            handle, temporary = tempfile.mkstemp(suffix='.sqlite')
+            os.close(handle)
+            frontier = Frontier(temporary)
+    try:
+        yield from _crawl_squads(seen, frontier, competitions, slugs, seasons, transfers, max_workers, batch_size,
+                                 budget_left, emit)
+    finally:
+        if temporary is not None:
+            os.remove(temporary)
+
+
+def _crawl_squads(seen, frontier, competitions, slugs, seasons, transfers, max_workers, batch_size,
+                  budget_left, emit):
+    # squads are only marked in seen once crawled and the transfer histories of their players are fetched,
+    # until then they stay in the frontier, so an interrupted pass crawls the squads it did not finish on resume
+    def enqueue(club_ids, seasons):
+        squads = [[str(club_id), str(season)] for club_id in dict.fromkeys(club_ids) for season in seasons]
+        frontier.put_many([squad for squad in squads if ('squad', f'{squad[0]}/{squad[1]}') not in seen])
+
+    # level 1: the clubs of every competition and season
+    leagues = deque((competition, slug, season) for competition, slug in zip(competitions, slugs) for season in seasons)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while leagues and budget_left():
+            chunk = [leagues.popleft() for _ in range(min(batch_size, len(leagues)))]
+
+            def league_clubs(task):
+                competition, slug, season = task
+                try:
+                    return get_clubnames_league(competition, league_name=slug, season_id=season)
+                except Exception as e:
+                    print(f'discovery: clubs of {competition}-{season} failed: {type(e).__name__}: {e}')
+                    return []
+
+            for (competition, _, season), clubs in zip(chunk, executor.map(league_clubs, chunk)):
+                clubs = [[str(club), str(club_id)] for club, club_id in clubs]
+                names = [(REGISTRY.get('club', club_id) or {}).get('name') for _, club_id in clubs]
+                found = emit('club', [club_id for _, club_id in clubs], [club for club, _ in clubs], names,
+                             competition, season)
+                if len(found) > 0:
+                    yield found
+                enqueue([club_id for _, club_id in clubs], [season])
+
+    def transfer_history(player_id):
+        try:
+            return get_transfer_history(player_id)
+        except Exception as e:
+            print(f'discovery: transfers of {player_id} failed: {type(e).__name__}: {e}')
+            return None
+
+    # level 2: the players of every squad, level 3: the clubs of their transfers.
+    # Squads that failed stay in the frontier and are retried by the next pass.
+    position = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while budget_left():
+            chunk = frontier.batch(batch_size, after=position)
+            if len(chunk) == 0:
+                break
+            position = chunk[-1][0]
+            urls = [_squad_url(REGISTRY.get_slug('club', club_id, default='verein'), club_id, season)
+                    for _, club_id, season in chunk]
+
+            crawled = []
+            for (_, club_id, season), soup in zip(chunk, iter_soups(urls, max_workers=max_workers)):
+                try:
+                    squad = extract_kaderdaten(soup)
+                except Exception as e:
+                    print(f'discovery: squad of {club_id}-{season} failed: {type(e).__name__}: {e}')
+                    continue
+                squad = squad.loc[squad['player_id'].fillna('') != '']
+                REGISTRY.add_many('player', squad['player_id'], squad['player_string'])
+                found = emit('player', squad['player_id'], squad['player_string'],
+                             clean_player_names(squad['Last Name']), f'squad {club_id}', int(season))
+                if len(found) > 0:
+                    yield found
+                crawled.append([club_id, season, list(dict.fromkeys(squad['player_id'].astype('str')))])
+
+            if not transfers:
+                seen.add_many('squad', [f'{club_id}/{season}' for club_id, season, _ in crawled])
+                frontier.remove_many([[club_id, season] for club_id, season, _ in crawled])
+                continue
+
+            # the transfer histories of the new players of the chunk, fetched concurrently batch by batch
+            pending = [player_id for player_id in dict.fromkeys(player_id for _, _, player_ids in crawled
+                                                                for player_id in player_ids)
+                       if ('transfers', player_id) not in seen]
+            attempted = set()
+            while pending and budget_left():
+                players, pending = pending[:batch_size], pending[batch_size:]
+                for player_id, history in zip(players, executor.map(transfer_history, players)):
+                    attempted.add(player_id)
+                    if history is None:
+                        continue
+                    if len(history) > 0:
+                        for side in ['old', 'new']:
+                            found = emit('club', history[f'{side}_club_id'], history[f'{side}_club_string'],
+                                         history[f'{side.title()}_Club'], f'transfers {player_id}')
+                            if len(found) > 0:
+                                yield found
+                            enqueue(history[f'{side}_club_id'].astype('str'), seasons)
+                    seen.add_many('transfers', [player_id])
+
+            # squads whose players were not all attempted before the budget ran out stay in the frontier
+            done = [[club_id, season] for club_id, season, player_ids in crawled
+                    if all((player_id in attempted) or (('transfers', player_id) in seen) for player_id in player_ids)]
+            seen.add_many('squad', [f'{club_id}/{season}' for club_id, season in done])
+            frontier.remove_many(done)
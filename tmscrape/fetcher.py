@@ -0,0 +1,270 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+from .tracing import span
+
+
+MEMO_MAX_BYTES = 256 * 1024 * 1024
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_memo = {'responses': None, 'bytes': 0, 'max_bytes': 0}
+_memo_lock = threading.Lock()
+_archive = {'archive': None}
+
+_rate = {'interval': 0.0, 'next': 0.0}
+_rate_lock = threading.Lock()
+
+_stats = {'requests': 0, 'bytes': 0, 'coalesced': 0, 'memo_hits': 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_url(url):
+    '''
+    normalizes a url so that equivalent transfermarkt urls share one key:
+    lower case scheme and host, sorted query parameters, no fragment and no trailing slash
+    '''
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def set_rate_limit(requests_per_second=None):
+    '''
+    limits the requests sent by all threads together to requests_per_second, None or 0 for no limit
+    '''
+    _rate['interval'] = 1 / requests_per_second if requests_per_second else 0.0
+
+
+def wait_for_rate_limit():
+    '''
+    blocks until the next request may be sent under the rate limit
+    '''
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _rate['next'] - now
+        _rate['next'] = max(now, _rate['next']) + _rate['interval']
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _count(stat, n=1):
+    with _stats_lock:
+        _stats[stat] += n
+
+
+def get_fetch_stats():
+    '''
+    counters since the last reset_fetch_stats:
+    requests sent, bytes received, fetches coalesced into a request in flight and memo hits
+    '''
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_fetch_stats():
+    with _stats_lock:
+        for stat in _stats:
+            _stats[stat] = 0
+
+
+def set_archive(archive=None):
+    '''
+    stores the raw content of every fetched page in archive, ie. an archive.PageArchive, None to stop archiving
+    '''
+    _archive['archive'] = archive
+
+
+def _archive_put(url, response):
+    # a failed archive write (disk full, locked index) must not fail the fetch
+    if _archive['archive'] is None:
+        return
+    try:
+        _archive['archive'].put(url, response.content, status=response.status_code)
+    except Exception as e:
+        print(f'archive {url} - could not be stored: {type(e).__name__}: {e}')
+
+
+def start_memo(max_bytes=MEMO_MAX_BYTES):
+    '''
+    keeps successful responses until stop_memo is called,
+    so repeated fetches of a url within one crawl are free.
+    Once the responses kept exceed max_bytes of content, the least recently used are dropped.
+    '''
+    with _memo_lock:
+        if _memo['responses'] is None:
+            _memo['responses'] = OrderedDict()
+            _memo['bytes'] = 0
+        _memo['max_bytes'] = max_bytes
+
+
+def stop_memo():
+    with _memo_lock:
+        _memo['responses'] = None
+        _memo['bytes'] = 0
+
+
+def _memo_get(memo, key):
+    with _memo_lock:
+        response = memo.get(key)
+        if response is not None:
+            memo.move_to_end(key)
+        return response
+
+
+def _memo_put(memo, key, response):
+    with _memo_lock:
+        if (memo is not _memo['responses']) or (key in memo):
+            return
+        memo[key] = response
+        _memo['bytes'] += len(response.content)
+        while (_memo['bytes'] > _memo['max_bytes']) and memo:
+            _, dropped = memo.popitem(last=False)
+            _memo['bytes'] -= len(dropped.content)
+
+
+@contextmanager
+def crawl_memo(max_bytes=MEMO_MAX_BYTES):
+    '''
+    context manager around start_memo / stop_memo for one crawl, ie.
+
+    with crawl_memo():
+        for club, club_id in clubs:
+            scrape_kaderdaten(club, club_id, 2019)
+    '''
+    already_started = _memo['responses'] is not None
+    start_memo(max_bytes=max_bytes)
+    try:
+        yield
+    finally:
+        if not already_started:
+            stop_memo()
+
+
+def fetch(url, headers=HEADERS):
+    '''
+    requests.get with single-flight coalescing: concurrent fetches of the same normalized url
+    wait for the one request in flight instead of sending their own.
+    If a crawl_memo is active, responses are also served from it.
+
+    Parameters:
+    -----------
+    url: the url to fetch
+    headers: requests.get headers
+
+    Returns:
+    -----------
+    a requests.Response shared by all callers, which must not modify it
+    '''
+    with span('fetch', url=url) as attrs:
+        response = _fetch(url, headers, attrs)
+        attrs['bytes'] = len(response.content)
+        return response
+
+
+def _fetch(url, headers, attrs):
+    key = normalize_url(url)
+
+    memo = _memo['responses']
+    if memo is not None:
+        response = _memo_get(memo, key)
+        if response is not None:
+            _count('memo_hits')
+            attrs['memo_hit'] = True
+            return response
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        _count('coalesced')
+        attrs['coalesced'] = True
+        with span('wait_for_inflight'):
+            return future.result()
+
+    try:
+        with span('wait_for_rate_limit'):
+            wait_for_rate_limit()
+        with span('request') as request_attrs:
+            response = requests.get(url, headers=headers)
+            request_attrs['status'] = response.status_code
+            request_attrs['bytes'] = len(response.content)
+        _count('requests')
+        _count('bytes', len(response.content))
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        if (memo is not None) and response.ok:
+            _memo_put(memo, key, response)
+        future.set_result(response)
+        _archive_put(url, response)
+        return response
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def fetch_if_modified(url, validators=None, headers=HEADERS):
+    '''
+    a conditional GET for polling a page: sends the ETag and Last-Modified of the previous response
+    as If-None-Match / If-Modified-Since, so an unchanged page costs a 304 without a body.
+    Servers ignoring them are caught by comparing the sha1 of the content.
+    Bypasses the crawl memo and coalescing, which would return the previous version of the page.
+
+    Parameters:
+    -----------
+    url: the url to fetch
+    validators = None: the validators returned by the previous call for url
+    headers: requests.get headers
+
+    Returns:
+    -----------
+    response, validators: the requests.Response or None if the page did not change,
+                          and the validators to pass to the next call
+    '''
+    validators = dict(validators or {})
+    headers = dict(headers)
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    with span('fetch', url=url, conditional=True) as attrs:
+        with span('wait_for_rate_limit'):
+            wait_for_rate_limit()
+        with span('request') as request_attrs:
+            response = requests.get(url, headers=headers)
+            request_attrs['status'] = response.status_code
+            request_attrs['bytes'] = len(response.content)
+        _count('requests')
+        _count('bytes', len(response.content))
+
+        if response.status_code == 304:
+            attrs['modified'] = False
+            return None, validators
+        response.raise_for_status()
+        _archive_put(url, response)
+
+        sha1 = hashlib.sha1(response.content).hexdigest()
+        modified = sha1 != validators.get('sha1')
+        attrs['modified'] = modified
+        attrs['bytes'] = len(response.content)
+        validators = {'etag': response.headers.get('ETag'),
+                      'last_modified': response.headers.get('Last-Modified'),
+                      'sha1': sha1}
+        return (response if modified else None), validators
@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .dateparse import parse_dates
+from .playerindex import PlayerIndex, _DAYS, days_since_epoch
+
+
+INJURY_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape', 'injuries.parquet')
+INJURY_COLUMNS = ['player_id', 'von', 'bis', 'Verletzung', 'Saison', 'Tage', 'Verpasste Spiele']
+
+# the end day of injuries without a 'bis' date, ie. players still injured
+_OPEN = _DAYS - 1
+
+
+def _dates(values, domain, name):
+    if pd.api.types.is_datetime64_any_dtype(values) == False:
+        values = parse_dates(values, domain=domain, name=name)
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]')
+
+
+class InjuryIndex(PlayerIndex):
+    '''
+    an interval index of the injury histories of many players for vectorized availability queries,
+    ie. which players of every squad were injured on every matchday of a season, without a loop over players.
+
+    Injuries are kept in a playerindex.PlayerIndex sorted by player and start day, extended by
+    the running maximum of the end days within every player's block, so whether a player is injured on a date
+    is a binary search per query. Injuries without an end ('bis') count as lasting until today and beyond.
+
+    Parameters:
+    -----------
+    path = None: snapshot to load on creation, if it exists
+    '''
+
+    COLUMNS = {'player_id': 'int64',
+               'von': 'datetime64[ns]',
+               'bis': 'datetime64[ns]',
+               'Verletzung': 'object',
+               'Saison': 'object',
+               'Tage': 'float',
+               'Verpasste Spiele': 'float'}
+    DATE_COLUMN = 'von'
+    # a refetched history replaces the injuries of the earlier fetch with the same start
+    DEDUP_COLUMNS = ['player_id', 'von', 'Verletzung']
+    TEXT_COLUMNS = ['Verletzung', 'Saison']
+    PATH = INJURY_INDEX_PATH
+
+    def append(self, df, domain='de'):
+        '''
+        appends injuries, a DataFrame with player_id, von and bis and optionally the other INJURY_COLUMNS,
+        ie. concatenated get_spieler_verletzungshistorie frames. Without a player_id column, the player is
+        taken from a job column of batch names (ie. injuries_12345, see sinks.StreamingSink).
+        von and bis strings, ie. from csv files, are parsed with the date formats of domain, see dateparse.parse_dates.
+        '''
+        if len(df) == 0:
+            return
+        if 'player_id' in df:
+            player_ids = df['player_id']
+        else:
+            player_ids = df['job'].astype('str').str.rpartition('_')[2]
+        df = pd.DataFrame({'player_id': pd.to_numeric(player_ids, errors='coerce').to_numpy(),
+                           'von': _dates(df['von'], domain, 'von'),
+                           'bis': _dates(df['bis'], domain, 'bis'),
+                           'Verletzung': df['Verletzung'].to_numpy(dtype='object') if 'Verletzung' in df else None,
+                           'Saison': df['Saison'].to_numpy(dtype='object') if 'Saison' in df else None,
+                           'Tage': pd.to_numeric(df['Tage'], errors='coerce').to_numpy(dtype='float')
+                                   if 'Tage' in df else np.nan,
+                           'Verpasste Spiele': pd.to_numeric(df['Verpasste Spiele'], errors='coerce').to_numpy(dtype='float')
+                                               if 'Verpasste Spiele' in df else np.nan})
+        self._append(df)
+
+    def add_history(self, player_id, df):
+        '''
+        appends the output of get_spieler_verletzungshistorie for player_id
+        '''
+        if len(df) == 0:
+            return
+        self.append(df.assign(player_id=player_id))
+
+    def _build_index(self, data, ranks):
+        index = PlayerIndex._build_index(self, data, ranks)
+        ends = days_since_epoch(data['bis'])
+        index['ends'] = np.where(ends < 0, _OPEN, ends)
+
+        # the running maximum of the end days within every player's block
+        max_ends = ranks * _DAYS + index['ends']
+        index['max_ends'] = np.maximum.accumulate(max_ends) - ranks * _DAYS if len(max_ends) > 0 else max_ends
+        return index
+
+    def active(self, player_ids, dates):
+        '''
+        the injury of every player on a date, vectorized over all queries
+
+        Parameters:
+        -----------
+        player_ids: an array of player ids
+        dates: an array of dates of the same length, or a single date for all players
+
+        Returns:
+        -----------
+        a DataFrame with a row per query: player_id, date, injured and the Verletzung, von and bis of the
+        latest injury active on the date (NaN if the player was fit)
+        '''
+        # the last injury starting on or before the date, and whether any injury up to it lasts until the date
+        lookup = self._lookup(player_ids, dates)
+        player_ids, dates, days, data = lookup['player_ids'], lookup['dates'], lookup['days'], lookup['data']
+        rank, position, started = lookup['rank'], lookup['position'], lookup['found']
+        starts, keys = lookup['index']['starts'], lookup['index']['keys']
+        ends, max_ends = lookup['index']['ends'], lookup['index']['max_ends']
+        safe = np.maximum(position, 0)
+        any_active = started & (max_ends[safe] >= days) if len(keys) > 0 else started
+
+        found = np.where(any_active & (ends[safe] >= days), position, -1) if len(keys) > 0 else np.full(len(days), -1)
+        # the last started injury ended before the date, but an earlier, longer one did not (rare)
+        for i in np.flatnonzero(any_active & (found < 0)):
+            block = np.arange(starts[rank[i]], position[i] + 1)
+            found[i] = block[ends[block] >= days[i]][-1]
+
+        injured = found >= 0
+        result = pd.DataFrame({'player_id': player_ids, 'date': dates, 'injured': injured})
+        for column in ['Verletzung', 'von', 'bis']:
+            values = data[column].to_numpy()
+            if column == 'Verletzung':
+                out = np.full(len(player_ids), None, dtype='object')
+            else:
+                out = np.full(len(player_ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+            out[injured] = values[found[injured]]
+            result[column] = out
+        return result
+
+    def squad_availability(self, squads, dates, group_col='club_id', player_col='player_id'):
+        '''
+        the injured players of squads on dates
+
+        Parameters:
+        -----------
+        squads: a DataFrame with a row per player and squad, ie. from scrape_squads_many
+        dates: a list of dates, ie. the matchdays of a season
+        group_col = 'club_id': the column (or list of columns) identifying a squad
+        player_col = 'player_id': the player id column
+
+        Returns:
+        -----------
+        a DataFrame with a row per injured player, squad and date: the group columns, date, player_id,
+        Verletzung, von and bis
+        '''
+        group_cols = [group_col] if isinstance(group_col, str) else list(group_col)
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[ns]')
+
+        queries = squads[group_cols + [player_col]].drop_duplicates()
+        n = len(queries)
+        injuries = self.active(np.tile(queries[player_col].to_numpy(), len(dates)), np.repeat(dates, n))
+        injured = injuries['injured'].to_numpy()
+
+        result = pd.concat([queries] * len(dates), ignore_index=True).loc[injured, group_cols].reset_index(drop=True)
+        injuries = injuries.loc[injured].reset_index(drop=True)
+        for column in ['date', 'player_id', 'Verletzung', 'von', 'bis']:
+            result[column] = injuries[column].to_numpy()
+        return result
+
+
+INJURY_INDEX = InjuryIndex()
+
+
+def save_injury_index(path=INJURY_INDEX_PATH):
+    INJURY_INDEX.save(path)
+
+
+def load_injury_index(path=INJURY_INDEX_PATH):
+    INJURY_INDEX.load(path)
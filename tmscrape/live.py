@@ -0,0 +1,201 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .fetcher import fetch_if_modified
+from .registry import REGISTRY
+from .scrapers import SCHEDULE_URLS, current_season, parse_league_games, scrape_league_games
+
+
+# the columns of a fixture that change during a matchday
+DELTA_COLUMNS = ['Date', 'Result', 'Period', 'Home_Goals', 'Away_Goals', 'Report_Link']
+FIXTURE_KEY = ['Home_id', 'Away_id']
+POLL_INTERVAL = 120
+
+GAMEWEEK_URL = SCHEDULE_URLS['league'] + '&spieltagVon={gameweek}&spieltagBis={gameweek}'
+
+
+def gameweek_numbers(games):
+    '''
+    the gameweek number of every fixture, from its 'Spieltag' label, ie. 5 for '5.Spieltag'
+    '''
+    return pd.to_numeric(games['Spieltag'].astype('str').str.extract(r'(\d+)', expand=False), errors='coerce')
+
+
+def _differs(a, b):
+    a = pd.Series(a).reset_index(drop=True)
+    b = pd.Series(b).reset_index(drop=True)
+    both_missing = (a.isna() & b.isna()).to_numpy()
+    return ~both_missing & (a.astype('str') != b.astype('str')).to_numpy()
+
+
+class MatchdayPoller(object):
+    '''
+    polls the results of a running league season. The season is parsed once with scrape_league_games
+    and kept in memory, every poll only fetches the current gameweek with a conditional request
+    (see fetcher.fetch_if_modified) and returns the fixtures whose result, period, date or report link changed.
+
+    Parameters:
+    -----------
+    competition: the transfermarkt league abbreviation, ie. L1
+    season = None: the year the season begins, defaults to the current season
+    competition_name = None: the transfermarkt competition name, looked up in the REGISTRY if None
+    games = None: an already scraped season to start from instead of fetching it
+    '''
+
+    def __init__(self, competition, season=None, competition_name=None, games=None):
+        self.competition = competition
+        self.season = current_season() if season is None else int(season)
+        if competition_name is None:
+            competition_name = REGISTRY.get_slug('competition', competition, default='wettbewerb')
+        self.competition_name = competition_name
+        self.validators = {}
+        self.polls = 0
+        self.games = None
+        if games is not None:
+            self.set_games(games)
+
+    def url(self, gameweek=None):
+        '''
+        the url of the whole season or only one gameweek of it
+        '''
+        kwargs = dict(name=self.competition_name, competition=self.competition, season=self.season)
+        if gameweek is None:
+            return SCHEDULE_URLS['league'].format(**kwargs)
+        return GAMEWEEK_URL.format(gameweek=int(gameweek), **kwargs)
+
+    def set_games(self, games):
+        games = games.reset_index(drop=True).copy()
+        games['gameweek'] = gameweek_numbers(games).astype('Int64')
+        self.games = games
+
+    def load(self):
+        '''
+        scrapes the whole season, done by the first poll if no games were given
+        '''
+        self.set_games(scrape_league_games(self.url()))
+        return self.games
+
+    def current_gameweek(self, now=None):
+        '''
+        the gameweek of the next unplayed fixture from a day before now on,
+        or the first gameweek with unplayed fixtures. None once all fixtures are played.
+        '''
+        if self.games is None:
+            self.load()
+        now = pd.Timestamp(datetime.now() if now is None else now)
+        games = self.games
+        unplayed = games.loc[games['Home_Goals'].isna() & games['gameweek'].notna()]
+        if len(unplayed) == 0:
+            return None
+        upcoming = unplayed.loc[unplayed['Date'] >= (now - pd.Timedelta(days=1)).normalize()]
+        if len(upcoming) > 0:
+            return int(upcoming.sort_values(['Date', 'gameweek'], kind='stable')['gameweek'].iloc[0])
+        return int(unplayed['gameweek'].min())
+
+    def poll(self, gameweek=None, now=None):
+        '''
+        fetches one gameweek if it changed since the last poll and merges it into the season
+
+        Parameters:
+        -----------
+        gameweek = None: the gameweek to poll, defaults to current_gameweek
+        now = None: the time polled at, defaults to now
+
+        Returns:
+        -----------
+        a DataFrame of the changed fixtures with their new values, the gameweek, polled_at
+        and changed (the names of the changed DELTA_COLUMNS, 'new' for fixtures not seen before).
+        Empty if nothing changed.
+        '''
+        if self.games is None:
+            self.load()
+        if gameweek is None:
+            gameweek = self.current_gameweek(now=now)
+        delta = self.games.iloc[:0].assign(polled_at=pd.Series(dtype='datetime64[ns]'),
+                                           changed=pd.Series(dtype='object'))
+        if gameweek is None:
+            return delta
+
+        self.polls += 1
+        url = self.url(gameweek)
+        response, self.validators[gameweek] = fetch_if_modified(url, self.validators.get(gameweek))
+        if response is None:
+            return delta
+
+        fresh = parse_league_games(response.content)
+        fresh['gameweek'] = gameweek_numbers(fresh).astype('Int64')
+        if fresh['gameweek'].isna().all():
+            fresh['gameweek'] = gameweek
+
+        fresh_keys = pd.MultiIndex.from_frame(fresh[FIXTURE_KEY].astype('str'))
+        games_keys = pd.MultiIndex.from_frame(self.games[FIXTURE_KEY].astype('str'))
+        positions = games_keys.get_indexer(fresh_keys)
+        known = positions >= 0
+
+        changed = np.full(len(fresh), '', dtype='object')
+        changed[~known] = 'new'
+        columns = [column for column in DELTA_COLUMNS if (column in fresh) and (column in self.games)]
+        for column in columns:
+            old = self.games[column].to_numpy()[positions[known]]
+            differs = np.zeros(len(fresh), dtype='bool')
+            differs[known] = _differs(old, fresh.loc[known, column])
+            changed[differs] = [f'{names},{column}' if names else column for names in changed[differs]]
+
+        update = known & (changed != '')
+        for column in columns:
+            self.games.loc[positions[update], column] = fresh.loc[update, column].to_numpy()
+        if (~known).any():
+            self.set_games(pd.concat([self.games, fresh.loc[~known]], ignore_index=True))
+
+        fresh['polled_at'] = pd.Timestamp(datetime.now() if now is None else now)
+        fresh['changed'] = changed
+        return fresh.loc[changed != ''].reset_index(drop=True)
+
+    def stream(self, interval=POLL_INTERVAL, max_polls=None, until=None):
+        '''
+        polls every interval seconds and yields the non-empty deltas of poll,
+        until all fixtures of the season are played, max_polls polls or the time until
+
+        Parameters:
+        -----------
+        interval = POLL_INTERVAL: seconds between two polls
+        max_polls = None: stop after this many polls
+        until = None: stop at this time, ie. the end of a matchday
+        '''
+        polls = 0
+        while (max_polls is None) or (polls < max_polls):
+            if (until is not None) and (pd.Timestamp(datetime.now()) >= pd.Timestamp(until)):
+                return
+            gameweek = self.current_gameweek()
+            if gameweek is None:
+                return
+            try:
+                delta = self.poll(gameweek)
+            except Exception as e:
+                print(f'live {self.competition}-{self.season} gameweek {gameweek} - poll failed: {type(e).__name__}: {e}')
+                delta = None
+            polls += 1
+            if (delta is not None) and (len(delta) > 0):
+                yield delta
+            if (max_polls is None) or (polls < max_polls):
+                time.sleep(interval)
+
+
+def poll_league_games(competition,
+                      season=None,
+                      interval=POLL_INTERVAL,
+                      max_polls=None,
+                      until=None,
+                      games=None):
+    '''
+    the polling mode of scrape_league_games for matchdays: yields DataFrames of the fixtures
+    that changed since the previous poll, see MatchdayPoller, ie.
+
+    for delta in poll_league_games('L1', until='2019-08-17 20:00'):
+        print(delta[['Home', 'Away', 'Result', 'changed']])
+    '''
+    poller = MatchdayPoller(competition, season=season, games=games)
+    return poller.stream(interval=interval, max_polls=max_polls, until=until)
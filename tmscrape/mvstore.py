@@ -0,0 +1,168 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .playerindex import PlayerIndex
+
+
+MV_STORE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape', 'market_values.parquet')
+MV_COLUMNS = ['player_id', 'Date', 'Market Value', 'Club', 'source']
+
+
+class MarketValueStore(PlayerIndex):
+    '''
+    a local time series store of player market values with vectorized as-of lookups,
+    ie. the market value of thousands of players on a list of dates in one call.
+
+    Observations are appended from get_player_mv_history and scrape_kaderdaten (see MV_STORE)
+    and kept in a playerindex.PlayerIndex sorted by player and date,
+    so a lookup is a binary search per query instead of a merge of per player frames.
+
+    Parameters:
+    -----------
+    path = None: snapshot to load on creation, if it exists
+    '''
+
+    COLUMNS = {'player_id': 'int64',
+               'Date': 'datetime64[ns]',
+               'Market Value': 'float',
+               'Club': 'object',
+               'source': 'object'}
+    DATE_COLUMN = 'Date'
+    DEDUP_COLUMNS = ['player_id', 'Date']
+    TEXT_COLUMNS = ['Club', 'source']
+    PATH = MV_STORE_PATH
+
+    def append(self, df):
+        '''
+        appends observations, a DataFrame with the MV_COLUMNS player_id, Date and Market Value
+        and optionally Club and source. Later observations of a player on the same day replace earlier ones.
+        '''
+        df = pd.DataFrame({'player_id': pd.to_numeric(df['player_id'], errors='coerce'),
+                           'Date': pd.to_datetime(df['Date']).to_numpy(dtype='datetime64[ns]'),
+                           'Market Value': pd.to_numeric(df['Market Value'], errors='coerce').astype('float'),
+                           'Club': df['Club'].to_numpy(dtype='object') if 'Club' in df else None,
+                           'source': df['source'].to_numpy(dtype='object') if 'source' in df else None})
+        self._append(df.dropna(subset=['Market Value']))
+
+    def add_history(self, player_id, df):
+        '''
+        appends the output of get_player_mv_history for player_id
+        '''
+        if len(df) == 0:
+            return
+        self.append(pd.DataFrame({'player_id': player_id,
+                                  'Date': df.index,
+                                  'Market Value': df['Market Value'].to_numpy(),
+                                  'Club': df['Club'].to_numpy(),
+                                  'source': 'history'}))
+
+    def add_squad(self, df, date=None, club=None):
+        '''
+        appends the market values of a scrape_kaderdaten DataFrame, observed on date (defaults to today).
+        Players without a market value are skipped.
+        '''
+        if len(df) == 0:
+            return
+        date = pd.Timestamp(datetime.now().date() if date is None else date)
+        values = pd.to_numeric(df['Market Value'], errors='coerce')
+        known = (values > 0).to_numpy()
+        self.append(pd.DataFrame({'player_id': df['player_id'].to_numpy()[known],
+                                  'Date': date,
+                                  'Market Value': values.to_numpy()[known],
+                                  'Club': club,
+                                  'source': 'kader'}))
+
+    def _prepare(self, data):
+        data['Date'] = data['Date'].dt.normalize()
+        return data
+
+    def asof(self, player_ids, dates, tolerance=None, columns=('Market Value',)):
+        '''
+        the latest market value of every player on or before a date, vectorized over all queries
+
+        Parameters:
+        -----------
+        player_ids: an array of player ids
+        dates: an array of dates of the same length, or a single date for all players
+        tolerance = None: only values at most this old, ie. pd.Timedelta(days=365)
+        columns = ('Market Value',): columns returned for each query, of 'Market Value', 'Date', 'Club' and 'source'
+
+        Returns:
+        -----------
+        a DataFrame with a row per query: player_id, date and the columns, NaN where no value is known
+        '''
+        lookup = self._lookup(player_ids, dates)
+        player_ids, dates, data = lookup['player_ids'], lookup['dates'], lookup['data']
+        position, found = lookup['position'], lookup['found']
+        if tolerance is not None:
+            observed = data['Date'].to_numpy()[np.maximum(position, 0)] if len(data) > 0 else dates
+            found &= (dates - observed) <= pd.Timedelta(tolerance).to_timedelta64()
+
+        result = pd.DataFrame({'player_id': player_ids, 'date': dates})
+        for column in columns:
+            values = data[column].to_numpy()
+            if column == 'Market Value':
+                out = np.full(len(player_ids), np.nan)
+            elif column == 'Date':
+                out = np.full(len(player_ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+            else:
+                out = np.full(len(player_ids), None, dtype='object')
+            out[found] = values[position[found]]
+            result['mv_date' if column == 'Date' else column] = out
+        return result
+
+    def merge_asof(self, df, player_col='player_id', date_col='Date', tolerance=None):
+        '''
+        adds the as-of 'Market Value' and its date 'mv_date' to every row of df
+        '''
+        values = self.asof(df[player_col].to_numpy(), df[date_col].to_numpy(),
+                           tolerance=tolerance, columns=('Market Value', 'Date'))
+        df = df.copy()
+        df['Market Value'] = values['Market Value'].to_numpy()
+        df['mv_date'] = values['mv_date'].to_numpy()
+        return df
+
+    def squad_values(self, squads, dates, group_col='club_id', player_col='player_id', tolerance=None):
+        '''
+        the total market value of squads on dates
+
+        Parameters:
+        -----------
+        squads: a DataFrame with a row per player and squad, ie. from scrape_squads_many
+        dates: a list of dates
+        group_col = 'club_id': the column (or list of columns) identifying a squad
+        player_col = 'player_id': the player id column
+
+        Returns:
+        -----------
+        a DataFrame of group_col x dates with the summed market values and the number of valued players
+        '''
+        group_cols = [group_col] if isinstance(group_col, str) else list(group_col)
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[ns]')
+
+        queries = squads[group_cols + [player_col]].drop_duplicates()
+        n = len(queries)
+        values = self.asof(np.tile(queries[player_col].to_numpy(), len(dates)),
+                           np.repeat(dates, n), tolerance=tolerance)
+
+        result = pd.concat([queries] * len(dates), ignore_index=True)
+        result['date'] = values['date'].to_numpy()
+        result['Market Value'] = values['Market Value'].to_numpy()
+        return (result.groupby(group_cols + ['date'])['Market Value']
+                      .agg(['sum', 'count'])
+                      .rename(columns={'sum': 'Squad Value', 'count': 'Valued Players'})
+                      .reset_index())
+
+
+MV_STORE = MarketValueStore()
+
+
+def save_mv_store(path=MV_STORE_PATH):
+    MV_STORE.save(path)
+
+
+def load_mv_store(path=MV_STORE_PATH):
+    MV_STORE.load(path)
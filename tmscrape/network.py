@@ -0,0 +1,319 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .registry import REGISTRY
+from .scrapers import current_season
+
+
+# the weights of the adjacency matrices: transfers, summed fees and market values, loans and loan returns
+NETWORK_WEIGHTS = ['count', 'fee', 'mv', 'loans', 'loan_returns']
+
+
+def season_start(seasons):
+    '''
+    the year a season began from transfermarkt season labels, ie. 2019 for '19/20', 1999 for '99/00' or 2019 for '2019'
+    '''
+    seasons = pd.Series(seasons).astype('str').str.strip()
+    first = pd.to_numeric(seasons.str.extract(r'^(\d+)', expand=False), errors='coerce')
+    short = first < 100
+    century = np.where(first <= (current_season() % 100) + 1, 2000, 1900)
+    return pd.Series(np.where(short, century + first, first), index=seasons.index).astype('Int64')
+
+
+class TransferNetwork(object):
+    '''
+    a club to club transfer network built from get_transfer_history frames, as sparse adjacency matrices:
+    entry [i, j] of a season slice sums the transfers from club i to club j in that season.
+    Clubs are numbered in the order they are first seen, see club_index / club_ids.
+
+    Frames are ingested incrementally with add, the per season CSR matrices are built on the first query
+    after an add, so aggregate queries are sparse row and column sums instead of groupbys over all transfers.
+
+    Parameters:
+    -----------
+    path = None: a snapshot to load on creation, if it exists (see save)
+    '''
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._club_ids = np.array([], dtype='int64')
+        self._club_index = pd.Index([], dtype='int64')
+        self._columns = {column: np.array([], dtype='float' if column in ['fee', 'mv'] else 'int64')
+                         for column in ['src', 'dst', 'season', 'fee', 'mv', 'loan', 'loan_return']}
+        self._pending = []
+        self._players = set()
+        self._slices = {}
+        self._totals = {}
+
+        if (path is not None) and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        with self._lock:
+            self._build()
+            return len(self._columns['src'])
+
+    @property
+    def club_ids(self):
+        '''
+        the transfermarkt club id of every matrix row and column
+        '''
+        with self._lock:
+            return self._club_ids.copy()
+
+    def _index_clubs(self, club_ids):
+        # maps club ids to matrix indices, numbering new clubs, called with the lock held
+        index = self._club_index.get_indexer(club_ids)
+        new = np.unique(club_ids[index < 0])
+        if len(new) > 0:
+            self._club_ids = np.concatenate([self._club_ids, new])
+            self._club_index = pd.Index(self._club_ids)
+            index = self._club_index.get_indexer(club_ids)
+        return index
+
+    def club_index(self, club_ids):
+        '''
+        the matrix indices of club ids, -1 for clubs not in the network
+        '''
+        club_ids = pd.to_numeric(pd.Series(club_ids), errors='coerce').fillna(-1).astype('int64').to_numpy()
+        with self._lock:
+            return self._club_index.get_indexer(club_ids)
+
+    def add(self, df, player_id=None):
+        '''
+        adds the transfers of get_transfer_history frames. The histories of players already added are skipped,
+        if the player is known from player_id or a player_id column of df.
+
+        Parameters:
+        -----------
+        df: a get_transfer_history DataFrame, or many concatenated ones with a player_id column
+        player_id = None: the player of df
+        '''
+        if len(df) == 0:
+            return 0
+        if player_id is not None:
+            players = pd.Series(str(player_id), index=df.index)
+        elif 'player_id' in df:
+            players = df['player_id'].astype('str')
+        else:
+            players = None
+
+        with self._lock:
+            if players is not None:
+                new = ~players.isin(self._players).to_numpy()
+                df = df.loc[new]
+                self._players.update(players[new].unique())
+
+            src = pd.to_numeric(df['old_club_id'], errors='coerce')
+            dst = pd.to_numeric(df['new_club_id'], errors='coerce')
+            season = season_start(df['Season']) if 'Season' in df else pd.Series(pd.NA, index=df.index, dtype='Int64')
+            known = (src.notna() & dst.notna() & season.notna()).to_numpy()
+
+            src = src.to_numpy()[known].astype('int64')
+            dst = dst.to_numpy()[known].astype('int64')
+            frame = {'src': self._index_clubs(src),
+                     'dst': self._index_clubs(dst),
+                     'season': season.to_numpy()[known].astype('int64'),
+                     'fee': pd.to_numeric(df['Transferfee'], errors='coerce').fillna(0).to_numpy(dtype='float')[known],
+                     'mv': pd.to_numeric(df['MV'], errors='coerce').fillna(0).to_numpy(dtype='float')[known],
+                     'loan': df['Leihe'].fillna(False).to_numpy(dtype='bool')[known].astype('int64')
+                             if 'Leihe' in df else np.zeros(known.sum(), dtype='int64'),
+                     'loan_return': df['Leihende'].fillna(False).to_numpy(dtype='bool')[known].astype('int64')
+                                    if 'Leihende' in df else np.zeros(known.sum(), dtype='int64')}
+            self._pending.append(frame)
+        return int(known.sum())
+
+    def _build(self):
+        # merges the pending frames and rebuilds the season slices, called with the lock held
+        if len(self._pending) == 0:
+            return
+        self._columns = {column: np.concatenate([self._columns[column]] + [frame[column] for frame in self._pending])
+                         for column in self._columns}
+        self._pending = []
+
+        n = len(self._club_ids)
+        columns = self._columns
+        weights = {'count': np.ones(len(columns['src'])),
+                   'fee': columns['fee'],
+                   'mv': columns['mv'],
+                   'loans': columns['loan'].astype('float'),
+                   'loan_returns': columns['loan_return'].astype('float')}
+
+        self._totals = {weight: sparse.csr_matrix((values, (columns['src'], columns['dst'])), shape=(n, n))
+                        for weight, values in weights.items()}
+
+        order = np.argsort(columns['season'], kind='stable')
+        seasons, starts = np.unique(columns['season'][order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self._slices = {}
+        for season, start, end in zip(seasons, bounds[:-1], bounds[1:]):
+            rows = order[start:end]
+            self._slices[int(season)] = {weight: sparse.csr_matrix((values[rows], (columns['src'][rows], columns['dst'][rows])),
+                                                                   shape=(n, n))
+                                         for weight, values in weights.items()}
+
+    @property
+    def seasons(self):
+        with self._lock:
+            self._build()
+            return sorted(self._slices)
+
+    def matrix(self, weight='count', seasons=None):
+        '''
+        the adjacency matrix of a weight, summed over seasons
+
+        Parameters:
+        -----------
+        weight = 'count': one of NETWORK_WEIGHTS
+        seasons = None: a season or list of seasons (the years they begin), all if None
+
+        Returns:
+        -----------
+        a scipy.sparse CSR matrix of clubs x clubs, rows are the old and columns the new clubs
+        '''
+        assert weight in NETWORK_WEIGHTS, f'weight must be in {NETWORK_WEIGHTS}'
+        with self._lock:
+            self._build()
+            n = len(self._club_ids)
+            if seasons is None:
+                return self._totals.get(weight, sparse.csr_matrix((n, n)))
+            if np.ndim(seasons) == 0:
+                seasons = [seasons]
+            parts = [self._slices[int(season)][weight].tocoo() for season in seasons if int(season) in self._slices]
+        if len(parts) == 1:
+            return parts[0].tocsr()
+        # one conversion of all slices, summing duplicates, instead of a new matrix per added slice
+        return sparse.csr_matrix((np.concatenate([part.data for part in parts] + [np.array([])]),
+                                  (np.concatenate([part.row for part in parts] + [np.array([], dtype='int32')]),
+                                   np.concatenate([part.col for part in parts] + [np.array([], dtype='int32')]))),
+                                 shape=(n, n))
+
+    def _clubs_frame(self, club_index):
+        club_ids = self._club_ids[club_index]
+        return pd.DataFrame({'club_id': club_ids,
+                             'club': [(REGISTRY.get('club', club_id) or {}).get('name') for club_id in club_ids]})
+
+    def net_spend(self, seasons=None):
+        '''
+        the transfer balance of every club
+
+        Returns:
+        -----------
+        a DataFrame of club_id, club, spent (fees paid for incoming players), received, net (spent - received),
+        n_in and n_out, sorted by net
+        '''
+        fees = self.matrix('fee', seasons)
+        counts = self.matrix('count', seasons)
+        df = self._clubs_frame(np.arange(fees.shape[0]))
+        df['spent'] = np.asarray(fees.sum(axis=0)).ravel()
+        df['received'] = np.asarray(fees.sum(axis=1)).ravel()
+        df['net'] = df['spent'] - df['received']
+        df['n_in'] = np.asarray(counts.sum(axis=0)).ravel().astype('int64')
+        df['n_out'] = np.asarray(counts.sum(axis=1)).ravel().astype('int64')
+        df = df.loc[(df['n_in'] > 0) | (df['n_out'] > 0)]
+        return df.sort_values('net', ascending=False, kind='stable').reset_index(drop=True)
+
+    def top_routes(self, n=20, weight='fee', seasons=None, club_id=None):
+        '''
+        the n largest club to club routes by weight
+
+        Parameters:
+        -----------
+        n = 20: number of routes
+        weight = 'fee': one of NETWORK_WEIGHTS
+        seasons = None: a season or list of seasons, all if None
+        club_id = None: only routes from or to this club
+
+        Returns:
+        -----------
+        a DataFrame of old_club_id, old_club, new_club_id, new_club, the weight and the number of transfers
+        '''
+        matrix = self.matrix(weight, seasons)
+        counts = matrix if weight == 'count' else self.matrix('count', seasons)
+        if club_id is None:
+            matrix = matrix.tocoo()
+            rows, cols, values = matrix.row, matrix.col, matrix.data
+        else:
+            index = self.club_index([club_id])[0]
+            if index < 0:
+                rows = cols = np.array([], dtype='int64')
+                values = np.array([])
+            else:
+                out = matrix.getrow(index).tocoo()
+                into = matrix.getcol(index).tocoo()
+                # a route from the club to itself is in both
+                into_other = into.row != index
+                rows = np.concatenate([np.full(out.nnz, index), into.row[into_other]])
+                cols = np.concatenate([out.col, np.full(into_other.sum(), index)])
+                values = np.concatenate([out.data, into.data[into_other]])
+        keep = values != 0
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+
+        if len(values) > n:
+            top = np.argpartition(-values, n)[:n]
+            rows, cols, values = rows[top], cols[top], values[top]
+        order = np.argsort(-values, kind='stable')
+        rows, cols, values = rows[order], cols[order], values[order]
+
+        old = self._clubs_frame(rows).add_prefix('old_')
+        new = self._clubs_frame(cols).add_prefix('new_')
+        df = pd.concat([old, new], axis=1)
+        df[weight] = values
+        df['count'] = np.asarray(counts[rows, cols]).ravel().astype('int64')
+        return df
+
+    def loan_flows(self, n=20, seasons=None, club_id=None):
+        '''
+        the n largest loan routes, see top_routes
+        '''
+        return self.top_routes(n=n, weight='loans', seasons=seasons, club_id=club_id)
+
+    def flows(self, club_id, weight='count', seasons=None):
+        '''
+        all incoming and outgoing routes of one club
+
+        Returns:
+        -----------
+        a DataFrame of other club_id, club, out (from club_id to the other club) and in, sorted by their sum
+        '''
+        index = self.club_index([club_id])[0]
+        if index < 0:
+            return pd.DataFrame(columns=['club_id', 'club', 'out', 'in'])
+        matrix = self.matrix(weight, seasons)
+        out = matrix.getrow(index).toarray().ravel()
+        into = matrix.getcol(index).toarray().ravel()
+        others = np.flatnonzero((out != 0) | (into != 0))
+        df = self._clubs_frame(others)
+        df['out'] = out[others]
+        df['in'] = into[others]
+        order = np.argsort(-(df['out'] + df['in']).to_numpy(), kind='stable')
+        return df.iloc[order].reset_index(drop=True)
+
+    def save(self, path):
+        '''
+        writes the club index and all ingested transfers as a compressed .npz file
+        '''
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+        with self._lock:
+            self._build()
+            np.savez_compressed(path, club_ids=self._club_ids, players=np.array(sorted(self._players), dtype='str'),
+                                **self._columns)
+
+    def load(self, path):
+        '''
+        adds the transfers of a snapshot written by save
+        '''
+        data = np.load(path)
+        with self._lock:
+            self._players.update(data['players'].tolist())
+            club_ids = data['club_ids']
+            frame = {column: data[column] for column in self._columns}
+            frame['src'] = self._index_clubs(club_ids[frame['src']])
+            frame['dst'] = self._index_clubs(club_ids[frame['dst']])
+            self._pending.append(frame)
@@ -0,0 +1,165 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+_EPOCH = np.datetime64('1900-01-01', 'D')
+# days since _EPOCH stay below this, so player rank * _DAYS + day is a sortable int64 key
+_DAYS = 1000000
+
+
+def days_since_epoch(dates):
+    '''
+    the days since _EPOCH of dates as int64, -1 for missing dates
+    '''
+    days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]')
+    return np.where(np.isnat(days), -1, (days - _EPOCH).astype('int64'))
+
+
+class PlayerIndex(object):
+    '''
+    the base of the player keyed time series stores (mvstore.MarketValueStore, injuries.InjuryIndex):
+    rows of many players kept as one frame sorted by player and date, with the start of every player's
+    block indexed and an int64 key of player rank * _DAYS + day per row, so a lookup of thousands of
+    (player, date) queries is one binary search per query.
+
+    Rows are appended as frames and merged into the sorted frame lazily, on the next query.
+    Subclasses set the class attributes and may extend _build_index.
+
+    Parameters:
+    -----------
+    path = None: snapshot to load on creation, if it exists
+    '''
+
+    # the columns and dtypes of the empty frame
+    COLUMNS = {'player_id': 'int64'}
+    # the date column rows are sorted and keyed by
+    DATE_COLUMN = None
+    # rows with the same values in these columns replace earlier ones
+    DEDUP_COLUMNS = None
+    # object columns written as strings in snapshots
+    TEXT_COLUMNS = []
+    # the default snapshot file
+    PATH = None
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._frames = []
+        self._data = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in self.COLUMNS.items()})
+        self._index = self._build_index(self._data, np.array([], dtype='int64'))
+        self._index['ids'] = np.array([], dtype='int64')
+        self._index['starts'] = np.array([0], dtype='int64')
+
+        if (path is not None) and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        with self._lock:
+            self._build()
+            return len(self._data)
+
+    def _append(self, df):
+        df = df.dropna(subset=['player_id', self.DATE_COLUMN])
+        df['player_id'] = df['player_id'].astype('int64')
+        with self._lock:
+            self._frames.append(df)
+
+    def _prepare(self, data):
+        # adjusts the merged rows before they are deduplicated and sorted
+        return data
+
+    def _build_index(self, data, ranks):
+        # the arrays of the index besides ids and starts, for the rows of data sorted by player and date
+        return {'keys': ranks * _DAYS + days_since_epoch(data[self.DATE_COLUMN])}
+
+    def _build(self):
+        # merges the appended frames into the sorted frame and index, called with the lock held
+        if len(self._frames) == 0:
+            return
+        data = self._prepare(pd.concat([self._data] + self._frames, ignore_index=True))
+        self._frames = []
+
+        data = (data.drop_duplicates(subset=self.DEDUP_COLUMNS, keep='last')
+                    .sort_values(['player_id', self.DATE_COLUMN], kind='stable')
+                    .reset_index(drop=True))
+
+        ids, starts = np.unique(data['player_id'].to_numpy(), return_index=True)
+        starts = np.append(starts, len(data))
+        ranks = np.repeat(np.arange(len(ids)), np.diff(starts))
+        index = self._build_index(data, ranks)
+        index['ids'] = ids
+        index['starts'] = starts
+        self._index = index
+        self._data = data
+
+    def _lookup(self, player_ids, dates):
+        '''
+        the last row of every player on or before a date, vectorized over all queries
+
+        Returns:
+        -----------
+        a dict with the queries (player_ids, dates, days), known (whether the player has rows), rank,
+        position (the row of the last key on or before the query, -1 for none), found (whether that row
+        is the player's) and the frame and index the positions refer to
+        '''
+        player_ids = np.asarray(pd.to_numeric(pd.Series(player_ids), errors='coerce').fillna(-1), dtype='int64')
+        if np.ndim(dates) == 0:
+            dates = np.repeat(pd.Timestamp(dates).to_datetime64(), len(player_ids))
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[ns]')
+        assert len(dates) == len(player_ids), 'player_ids and dates must have the same length'
+
+        with self._lock:
+            self._build()
+            data = self._data
+            index = self._index
+
+        ids, starts = index['ids'], index['starts']
+        rank = np.searchsorted(ids, player_ids)
+        known = rank < len(ids)
+        known[known] = ids[rank[known]] == player_ids[known]
+        rank = np.where(known, rank, 0)
+        days = days_since_epoch(dates)
+
+        position = np.searchsorted(index['keys'], rank * _DAYS + days, side='right') - 1
+        found = known & (days >= 0) & (position >= starts[rank])
+        return {'player_ids': player_ids, 'dates': dates, 'days': days, 'known': known, 'rank': rank,
+                'position': position, 'found': found, 'data': data, 'index': index}
+
+    def history(self, player_id):
+        '''
+        all rows of a player ordered by date
+        '''
+        with self._lock:
+            self._build()
+            ids, starts = self._index['ids'], self._index['starts']
+            rank = np.searchsorted(ids, int(player_id))
+            if (rank == len(ids)) or (ids[rank] != int(player_id)):
+                return self._data.iloc[:0].copy()
+            return self._data.iloc[starts[rank]:starts[rank + 1]].reset_index(drop=True)
+
+    def to_frame(self):
+        with self._lock:
+            self._build()
+            return self._data.copy()
+
+    def save(self, path=None):
+        '''
+        writes a snapshot of all rows as a Parquet file, to PATH by default
+        '''
+        path = self.PATH if path is None else path
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+        data = self.to_frame()
+        for column in self.TEXT_COLUMNS:
+            data[column] = data[column].astype('str').where(data[column].notna(), None)
+        data.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def load(self, path=None):
+        '''
+        appends the rows of a snapshot, from PATH by default
+        '''
+        self.append(pd.read_parquet(self.PATH if path is None else path))
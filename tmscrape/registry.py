@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+REGISTRY_KINDS = ['club', 'player', 'competition']
+REGISTRY_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape', 'registry.json')
+
+
+def normalize_name(name):
+    return ' '.join(str(name).split()).lower()
+
+
+class EntityRegistry(object):
+    '''
+    an in-memory index of transfermarkt clubs, players and competitions
+    with O(1) lookups by id, slug (ie. borussia-dortmund) and name.
+
+    The scrapers add every entity they parse to the module level REGISTRY,
+    so identifiers seen once never need to be resolved by a request again.
+    Snapshots are written to and read from a json file.
+
+    Parameters:
+    -----------
+    path = None: snapshot to load on creation, if it exists
+    '''
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._by_id = {kind: {} for kind in REGISTRY_KINDS}
+        self._by_slug = {kind: {} for kind in REGISTRY_KINDS}
+        self._by_name = {kind: {} for kind in REGISTRY_KINDS}
+        self._local = threading.local()
+
+        if (path is not None) and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        return sum(len(entities) for entities in self._by_id.values())
+
+    def _add(self, kind, entity_id, slug, name):
+        # ids parsed from DataFrame columns may be floats after a concat with missing values
+        if isinstance(entity_id, float):
+            entity_id = int(entity_id)
+        entity_id = str(entity_id)
+        for records in getattr(self._local, 'recordings', []):
+            records.append([kind, entity_id, slug, name])
+        entity = self._by_id[kind].setdefault(entity_id, {'id': entity_id, 'slug': None, 'name': None})
+
+        # a renamed entity must not be found under its previous slug or name
+        if slug and (slug != entity['slug']):
+            if self._by_slug[kind].get(entity['slug']) == entity_id:
+                del self._by_slug[kind][entity['slug']]
+            entity['slug'] = slug
+            self._by_slug[kind][slug] = entity_id
+
+        if name and (name != entity['name']):
+            if entity['name'] is not None:
+                previous = normalize_name(entity['name'])
+                ids = self._by_name[kind].get(previous, [])
+                if entity_id in ids:
+                    ids.remove(entity_id)
+                if len(ids) == 0:
+                    self._by_name[kind].pop(previous, None)
+            entity['name'] = name
+            ids = self._by_name[kind].setdefault(normalize_name(name), [])
+            if entity_id not in ids:
+                ids.append(entity_id)
+
+    def add(self, kind, entity_id, slug=None, name=None):
+        '''
+        adds or updates one entity. Empty ids are ignored.
+
+        Parameters:
+        -----------
+        kind: one of REGISTRY_KINDS
+        entity_id: the transfermarkt id, ie. 16
+        slug = None: the transfermarkt name string, ie. borussia-dortmund
+        name = None: the display name, ie. Borussia Dortmund
+        '''
+        assert kind in REGISTRY_KINDS, f'kind must be in {REGISTRY_KINDS}'
+        if (entity_id is None) or (str(entity_id) in ['', 'nan', 'None']):
+            return
+        with self._lock:
+            self._add(kind, entity_id, slug, name)
+
+    def add_many(self, kind, entity_ids, slugs=None, names=None):
+        '''
+        adds or updates several entities at once from parallel iterables
+        '''
+        assert kind in REGISTRY_KINDS, f'kind must be in {REGISTRY_KINDS}'
+        entity_ids = list(entity_ids)
+        slugs = [None] * len(entity_ids) if slugs is None else list(slugs)
+        names = [None] * len(entity_ids) if names is None else list(names)
+
+        with self._lock:
+            for entity_id, slug, name in zip(entity_ids, slugs, names):
+                if (entity_id is None) or (str(entity_id) in ['', 'nan', 'None']):
+                    continue
+                self._add(kind, entity_id,
+                          slug if isinstance(slug, str) else None,
+                          name if isinstance(name, str) else None)
+
+    def add_frame(self, kind, df, id_col, slug_col=None, name_col=None):
+        '''
+        adds the entities of a scraped DataFrame, ie. the player_id and player_string columns
+        of scrape_kaderdaten. Missing columns are skipped.
+        '''
+        if (df is None) or (id_col not in df.columns):
+            return
+        self.add_many(kind,
+                      df[id_col],
+                      None if slug_col not in df.columns else df[slug_col],
+                      None if name_col not in df.columns else df[name_col])
+
+    @contextmanager
+    def recording(self):
+        '''
+        collects the entities added by the current thread within the block as [kind, id, slug, name] lists,
+        ie. to store them with a cached parse result and replay them with add_records on a cache hit
+
+        with REGISTRY.recording() as records:
+            df = parse_kaderdaten(content)
+        '''
+        records = []
+        recordings = getattr(self._local, 'recordings', None)
+        if recordings is None:
+            recordings = self._local.recordings = []
+        recordings.append(records)
+        try:
+            yield records
+        finally:
+            recordings.remove(records)
+
+    def add_records(self, records):
+        '''
+        adds the entities collected by recording
+        '''
+        with self._lock:
+            for kind, entity_id, slug, name in records:
+                self._add(kind, entity_id, slug, name)
+
+    def get(self, kind, entity_id=None, slug=None):
+        '''
+        looks up an entity by id or slug
+
+        Returns:
+        -----------
+        a dict with id, slug and name or None if unknown
+        '''
+        if entity_id is not None:
+            return self._by_id[kind].get(str(entity_id))
+        if slug is not None:
+            entity_id = self._by_slug[kind].get(slug)
+            return None if entity_id is None else self._by_id[kind][entity_id]
+        return None
+
+    def find(self, kind, name):
+        '''
+        looks up entities by display name, case and whitespace insensitive
+
+        Returns:
+        -----------
+        a list of dicts with id, slug and name, as names are not unique
+        '''
+        return [self._by_id[kind][entity_id] for entity_id in self._by_name[kind].get(normalize_name(name), [])]
+
+    def get_slug(self, kind, entity_id, default=None):
+        entity = self.get(kind, entity_id=entity_id)
+        if (entity is None) or (entity['slug'] is None):
+            return default
+        return entity['slug']
+
+    def get_id(self, kind, slug, default=None):
+        entity = self.get(kind, slug=slug)
+        if entity is None:
+            return default
+        return entity['id']
+
+    def save(self, path=REGISTRY_PATH):
+        '''
+        writes a json snapshot of the registry, replacing path atomically
+        '''
+        with self._lock:
+            snapshot = {kind: [[e['id'], e['slug'], e['name']] for e in self._by_id[kind].values()]
+                        for kind in REGISTRY_KINDS}
+
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path=REGISTRY_PATH):
+        '''
+        merges a json snapshot into the registry
+        '''
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        for kind, entities in snapshot.items():
+            if (kind in REGISTRY_KINDS) and (len(entities) > 0):
+                entity_ids, slugs, names = zip(*entities)
+                self.add_many(kind, entity_ids, slugs, names)
+
+
+REGISTRY = EntityRegistry()
+
+
+def save_registry(path=REGISTRY_PATH):
+    REGISTRY.save(path)
+
+
+def load_registry(path=REGISTRY_PATH):
+    REGISTRY.load(path)
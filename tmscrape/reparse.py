@@ -0,0 +1,280 @@
+import inspect
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .archive import read_record
+from .dateparse import parse_dates
+from .injuries import INJURY_INDEX
+from .mvstore import MV_STORE
+from .registry import REGISTRY
+from .scrapers import (parse_competition_page, clean_competition_list, parse_clubnames_league, parse_club_colors,
+                       parse_team_league_placements, parse_leistungsdaten, parse_kaderdaten,
+                       parse_player_mv_history, parse_transfer_history, parse_verletzungshistorie,
+                       parse_league_table, parse_gameweek_table, parse_league_games, parse_cup_games,
+                       parse_player_leistungsdaten, parse_team_schedule, parse_national_team_page,
+                       get_detailed_pos_table)
+from .sinks import to_frame
+
+
+def parse_competition_list_page(content):
+    '''
+    parses and cleans one page of a competition overview, see get_competition_list
+    '''
+    return clean_competition_list(parse_competition_page(content))
+
+
+def parse_national_team_history_page(content, domain='de'):
+    '''
+    parses and cleans the games of one team of a 'Nationalmannschaft' page, see get_national_team_history
+    '''
+    df = parse_national_team_page(content)
+    if df is None:
+        return pd.DataFrame()
+    df = df[-1::-1].reset_index(drop=True)
+    df.loc[(df['Position'] == 'ohne Einsatz im Kader') | (df['Position'] == 'on the bench'), 'Minutes'] = 0
+    df['Date'] = parse_dates(df['Date'], domain=domain, name='Date')
+    return df
+
+
+def parse_detailed_pos_page(content, player_id=None):
+    '''
+    parses one position filtered 'Leistungsdatendetails' page, see scrape_gameinfo_by_pos with detailed=True.
+    The position is only known by its id, the pos key.
+    '''
+    table = get_detailed_pos_table(content)
+    if player_id is not None:
+        table['player_id'] = player_id
+    return table
+
+
+# scraper name: (patterns matching the normalized urls of its pages, parse function).
+# Named groups of the patterns are passed to the parse function if it takes them
+# and are added as key columns otherwise.
+REPARSERS = {
+    'get_competition_list': ([r'/wettbewerbe/(?P<region>[^/?]+)(?:\?page=(?P<page>\d+))?$'],
+                             parse_competition_list_page),
+    'get_clubnames_league': ([r'/startseite/wettbewerb/(?P<league_abbrev>[^/?]+)(?:/plus)?(?:\?saison_id=(?P<season>\d+))?$'],
+                             parse_clubnames_league),
+    'get_club_colors': ([r'/(?P<club>[^/]+)/datenfakten/verein/(?P<club_id>\d+)'],
+                        parse_club_colors),
+    'scrape_team_league_placements': ([r'/(?P<club_name>[^/]+)/platzierungen/verein/(?P<club_id>\d+)$'],
+                                      parse_team_league_placements),
+    'scrape_leistungsdaten': ([r'/(?P<club>[^/]+)/leistungsdaten/verein/(?P<club_id>\d+)/reldata/%26(?P<season>\d+)',
+                               r'/(?P<club>[^/]+)/leistungsdaten/verein/(?P<club_id>\d+)/plus/1\?reldata=(?P<league_abbrev>[^%&]+)%26(?P<season>\d+)'],
+                              parse_leistungsdaten),
+    'scrape_kaderdaten': ([r'/(?P<club>[^/]+)/kader/verein/(?P<club_id>\d+)/saison_id/(?P<season>\d+)'],
+                          parse_kaderdaten),
+    'get_player_mv_history': ([r'/marktwertverlauf/spieler/(?P<player_id>\d+)'],
+                              parse_player_mv_history),
+    'get_transfer_history': ([r'/transfers/spieler/(?P<player_id>\d+)'],
+                             parse_transfer_history),
+    'get_spieler_verletzungshistorie': ([r'/verletzungen/spieler/(?P<player_id>\d+)'],
+                                        parse_verletzungshistorie),
+    'get_player_leistungsdaten': ([r'/leistungsdatendetails/spieler/(?P<player_id>\d+)/saison//verein/0/liga/0/wettbewerb//pos/0/'],
+                                  parse_player_leistungsdaten),
+    'get_league_table': ([r'/tabelle/wettbewerb/(?P<league_abbrev>[^/?]+)/saison_id/(?P<season>\d+)'],
+                         parse_league_table),
+    'get_gameweek_table': ([r'/spieltagtabelle/wettbewerb/(?P<league_abbrev>[^/?]+)\?saison_id=(?P<season>\d+)&spieltag=(?P<gameweek>\d+)'],
+                           parse_gameweek_table),
+    'scrape_league_games': ([r'/gesamtspielplan/wettbewerb/(?P<league_abbrev>[^/?]+)(?:\?saison_id=(?P<season>\d+))?$'],
+                            parse_league_games),
+    'scrape_cup_games': ([r'/startseite/pokalwettbewerb/(?P<cup_abbrev>[^/?]+)(?:\?saison_id=(?P<season>\d+))?$'],
+                         parse_cup_games),
+    'get_team_schedule': ([r'/spielplandatum/verein/(?P<team_id>\d+)'],
+                          parse_team_schedule),
+    'get_national_team_history': ([r'transfermarkt\.(?P<domain>de|com|co\.uk)/[^/]+/nationalmannschaft/spieler/(?P<player_id>\d+)(?:/plus/0/verein_id/(?P<team_id>\d+))?$'],
+                                  parse_national_team_history_page),
+    'scrape_gameinfo_by_pos': ([r'/leistungsdatendetails/spieler/(?P<player_id>\d+)/plus/1\?.*\bpos=(?P<pos>\d+)'],
+                               parse_detailed_pos_page),
+}
+
+# scraper name: the job name prefix of its results, the one of batch jobs where there is one (see batch.PLAYER_PAGES),
+# so reparsed results land in the same sink tables (see sinks.job_table) and warehouse tables (see store.JOB_TABLES)
+REPARSE_JOBS = {'get_competition_list': 'competitions',
+                'get_clubnames_league': 'clubs',
+                'get_club_colors': 'colors',
+                'scrape_team_league_placements': 'placements',
+                'scrape_leistungsdaten': 'leistungsdaten',
+                'scrape_kaderdaten': 'kader',
+                'get_player_mv_history': 'mv',
+                'get_transfer_history': 'transfers',
+                'get_spieler_verletzungshistorie': 'injuries',
+                'get_player_leistungsdaten': 'performance',
+                'get_league_table': 'table',
+                'get_gameweek_table': 'gameweektable',
+                'scrape_league_games': 'schedule',
+                'scrape_cup_games': 'schedule',
+                'get_team_schedule': 'schedule',
+                'get_national_team_history': 'national',
+                'scrape_gameinfo_by_pos': 'positions'}
+
+
+def job_name(scraper, keys):
+    '''
+    the name of the result of a page of scraper with the keys parsed from its url, as batch names its jobs,
+    ie. mv_12345 or kader__2019_borussia-dortmund (the league is not part of a 'Kaderdaten' url)
+    '''
+    prefix = REPARSE_JOBS[scraper]
+    if prefix in ['kader', 'leistungsdaten']:
+        parts = [keys.get('league_abbrev', ''), keys['season'], keys['club']]
+    elif prefix in ['mv', 'transfers', 'injuries', 'performance']:
+        parts = [keys['player_id']]
+    else:
+        parts = [value for key, value in keys.items() if key != 'domain']
+    return '_'.join([prefix] + parts)
+
+
+# the entities the parse functions add to the REGISTRY, as (kind, id, slug and name column) of their results.
+# The parse functions run in worker processes, so reparse adds them to the REGISTRY of the calling process.
+REGISTRY_COLUMNS = [('player', 'player_id', 'player_string', 'Name'),
+                    ('club', 'club_id', 'club_name', 'Club'),
+                    ('club', 'club_id', 'club', None),
+                    ('club', 'old_club_id', 'old_club_string', 'Old_Club'),
+                    ('club', 'new_club_id', 'new_club_string', 'New_Club'),
+                    ('club', 'Home_id', None, 'Home'),
+                    ('club', 'Away_id', None, 'Away')]
+
+
+def update_stores(scraper, df, keys):
+    '''
+    applies the side effects a scraper has besides its result to this process:
+    adds the entities of df to the REGISTRY, and market value and injury histories to MV_STORE and INJURY_INDEX.
+    The market values of squads (see scrape_kaderdaten) are not added, as they would be dated today.
+    '''
+    for kind, id_col, slug_col, name_col in REGISTRY_COLUMNS:
+        if id_col in df.columns:
+            REGISTRY.add_frame(kind, df.loc[df[id_col].notna()], id_col, slug_col, name_col)
+    if ('player_id' in keys) and (len(df) > 0):
+        if scraper == 'get_player_mv_history':
+            MV_STORE.add_history(keys['player_id'], df.drop(columns=list(keys), errors='ignore'))
+        elif scraper == 'get_spieler_verletzungshistorie':
+            INJURY_INDEX.add_history(keys['player_id'], df)
+
+
+def match_url(scraper, url):
+    '''
+    matches a normalized url against the page patterns of scraper
+
+    Returns:
+    -----------
+    a dict of the named groups, or None if the url is not a page of scraper
+    '''
+    for pattern in REPARSERS[scraper][0]:
+        match = re.search(pattern, url)
+        if match is not None:
+            return {key: value for key, value in match.groupdict().items() if value is not None}
+    return None
+
+
+def parse_record(scraper, archive_path, record, keys, add_keys=True):
+    '''
+    reads one archived page and runs the parse and clean step of scraper on it.
+    Runs in the worker processes of reparse.
+
+    Returns:
+    -----------
+    a DataFrame
+    '''
+    parse = REPARSERS[scraper][1]
+    content = read_record(archive_path, record)
+
+    params = inspect.signature(parse).parameters
+    df = to_frame(parse(content, **{key: value for key, value in keys.items() if key in params}))
+
+    if add_keys:
+        for key, value in keys.items():
+            if key not in df.columns:
+                df[key] = value
+    return df
+
+
+def _parse_task(task):
+    scraper, archive_path, record, keys, add_keys = task
+    try:
+        return record, keys, parse_record(scraper, archive_path, record, keys, add_keys), None
+    except Exception as e:
+        return record, keys, None, f'{type(e).__name__}: {e}'
+
+
+def reparse(archive,
+            scraper,
+            workers=None,
+            sink=None,
+            url_like=None,
+            latest=True,
+            since=None,
+            until=None,
+            add_keys=True,
+            chunksize=8,
+            progress=True,
+            stream=sys.stderr):
+    '''
+    reruns the parse and clean step of a scraper over all its pages in a PageArchive on a process pool,
+    ie. to rebuild a dataset after fixing a cleaning bug without fetching anything.
+    The results are parsed page by page, ie. one frame per team of get_national_team_history.
+    The REGISTRY, MV_STORE and INJURY_INDEX of the calling process are updated from the results, see update_stores.
+
+    Parameters:
+    -----------
+    archive: an archive.PageArchive
+    scraper: a key of REPARSERS, ie. 'scrape_kaderdaten'
+    workers = None: number of processes, defaults to the number of cpus
+    sink = None: a sink with a write(name, result) method, ie. DirectorySink. If None the results are returned.
+    url_like = None: an additional SQL LIKE filter on the archived urls
+    latest = True: only parse the latest fetch of every url, otherwise every archived version
+    since, until = None: only pages fetched in this range of unix times
+    add_keys = True: add the ids parsed from the url (ie. club_id and season) as columns
+    chunksize = 8: pages sent to a worker process at once
+    progress = True: whether to print progress
+    stream = sys.stderr: where progress is printed to
+
+    Returns:
+    -----------
+    results, failures: a dict of DataFrames by job name (see job_name, empty if a sink is given)
+                       and a list of [job name, error] for the pages that failed to parse
+    '''
+    assert scraper in REPARSERS, f'scraper must be in {sorted(REPARSERS)}'
+
+    tasks = []
+    names = {}
+    for record in archive.records(url_like=url_like, since=since, until=until, latest=latest):
+        if record['status'] not in [None, 200]:
+            continue
+        keys = match_url(scraper, record['url'])
+        if keys is None:
+            continue
+        name = job_name(scraper, keys)
+        if not latest:
+            name += f'_{int(record["fetched_at"])}'
+        names[(record['segment'], record['offset'])] = name
+        tasks.append((scraper, archive.path, record, keys, add_keys))
+
+    results = {}
+    failures = []
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for i, (record, keys, df, error) in enumerate(executor.map(_parse_task, tasks, chunksize=chunksize), 1):
+            name = names[(record['segment'], record['offset'])]
+            if error is not None:
+                failures.append([name, error])
+            else:
+                update_stores(scraper, df, keys)
+                if sink is not None:
+                    sink.write(name, df)
+                else:
+                    results[name] = df
+
+            if progress and ((i % 100 == 0) or (i == len(tasks))):
+                print(f'[{i}/{len(tasks)}] {i / (time.time() - start):.1f} pages/s, {len(failures)} failed',
+                      file=stream)
+
+    if sink is not None:
+        sink.close()
+
+    return results, failures
@@ -0,0 +1,239 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from .registry import REGISTRY
+from .tracing import span
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# bump PARSER_VERSION when the output of the parsers changes to invalidate all cached results,
+# or set a version per parse function, ie. PARSER_VERSIONS['parse_kaderdaten'] = 2
+PARSER_VERSION = 1
+PARSER_VERSIONS = {}
+
+RESULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape', 'results')
+RESULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+_result_cache = {'cache': None}
+
+
+def parser_version(parse):
+    return str(PARSER_VERSIONS.get(parse.__name__, PARSER_VERSION))
+
+
+def result_key(parse, content, args=(), kwargs=None):
+    '''
+    the cache key of a parse call: the parse function, its arguments,
+    the sha1 of the page content and the parser version
+    '''
+    if not isinstance(content, bytes):
+        content = str(content).encode('utf-8')
+    arguments = json.dumps([list(args), sorted((kwargs or {}).items())], default=str)
+    key = '\n'.join([parse.__name__, arguments, hashlib.sha1(content).hexdigest(), parser_version(parse)])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _dumps(result):
+    if isinstance(result, pd.DataFrame) and (pyarrow is not None):
+        try:
+            buffer = io.BytesIO()
+            result.to_parquet(buffer)
+            return buffer.getvalue(), 'parquet'
+        except Exception:
+            # mixed object columns arrow can not type, stored as a pickle instead
+            pass
+    return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), 'pickle'
+
+
+def _loads(data, fmt):
+    if fmt == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    return pickle.loads(data)
+
+
+class ResultCache(object):
+    '''
+    a size bounded on-disk cache of parsed results, so rerunning a scraper on an unchanged page
+    skips the parse and clean step.
+
+    Results are keyed by the parse function, its arguments, the hash of the page content and the parser version
+    (see PARSER_VERSION). DataFrames are stored as Parquet files if pyarrow is installed, other results as pickles.
+    The entities a parse added to the REGISTRY are stored with its result, so a hit adds them again.
+    Entries of other parser versions are dropped when the cache is opened, the least recently used entries
+    when the cache grows beyond max_bytes.
+
+    Parameters:
+    -----------
+    path = RESULT_CACHE_DIR: the cache directory, created if it does not exist
+    max_bytes = RESULT_CACHE_BYTES: the size the cache is evicted down to
+    '''
+
+    def __init__(self, path=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.isdir(path) == False:
+            os.makedirs(path)
+
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS results (
+                               key TEXT PRIMARY KEY,
+                               parser TEXT NOT NULL,
+                               version TEXT NOT NULL,
+                               file TEXT NOT NULL,
+                               format TEXT NOT NULL,
+                               bytes INTEGER NOT NULL,
+                               last_access REAL NOT NULL,
+                               entities TEXT)''')
+            con.execute('CREATE INDEX IF NOT EXISTS results_access ON results (last_access)')
+            # caches created before the entities were stored
+            if 'entities' not in [row[1] for row in con.execute('PRAGMA table_info(results)')]:
+                con.execute('ALTER TABLE results ADD COLUMN entities TEXT')
+
+        self.invalidate_stale()
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _remove(self, con, rows):
+        con.executemany('DELETE FROM results WHERE key = ?', [(key,) for key, _ in rows])
+        for _, file in rows:
+            try:
+                os.remove(os.path.join(self.path, file))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, entities=False):
+        '''
+        the cached result of key, or None.
+        With entities, a tuple of the result and the REGISTRY records stored with it (None if unknown).
+        '''
+        with self._lock:
+            with self._connect() as con:
+                row = con.execute('SELECT file, format, entities FROM results WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return (None, None) if entities else None
+                try:
+                    with open(os.path.join(self.path, row[0]), 'rb') as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    self._remove(con, [(key, row[0])])
+                    self.misses += 1
+                    return (None, None) if entities else None
+                con.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+        if entities:
+            return _loads(data, row[1]), (None if row[2] is None else json.loads(row[2]))
+        return _loads(data, row[1])
+
+    def put(self, key, parse, result, entities=None):
+        '''
+        stores result under key and evicts the least recently used entries if the cache is too large
+
+        Parameters:
+        -----------
+        entities = None: the REGISTRY records of the parse, see EntityRegistry.recording
+        '''
+        data, fmt = _dumps(result)
+        entities = None if entities is None else json.dumps(entities, ensure_ascii=False, default=str)
+        file = f'{key}.{fmt}'
+        with self._lock:
+            with open(os.path.join(self.path, file), 'wb') as f:
+                f.write(data)
+            with self._connect() as con:
+                con.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (key, parse.__name__, parser_version(parse), file, fmt, len(data), time.time(),
+                             entities))
+                self._evict(con)
+
+    def _evict(self, con):
+        total = con.execute('SELECT COALESCE(SUM(bytes), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = []
+        for key, file, size in con.execute('SELECT key, file, bytes FROM results ORDER BY last_access'):
+            if total <= self.max_bytes:
+                break
+            rows.append((key, file))
+            total -= size
+        self._remove(con, rows)
+
+    def invalidate_stale(self):
+        '''
+        drops the entries of parser versions other than the current ones
+
+        Returns:
+        -----------
+        the number of dropped entries
+        '''
+        with self._lock:
+            with self._connect() as con:
+                rows = con.execute('SELECT key, file, parser, version FROM results').fetchall()
+                stale = [(key, file) for key, file, parser, version in rows
+                         if version != str(PARSER_VERSIONS.get(parser, PARSER_VERSION))]
+                self._remove(con, stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            with self._connect() as con:
+                self._remove(con, con.execute('SELECT key, file FROM results').fetchall())
+
+    def size(self):
+        with self._connect() as con:
+            return con.execute('SELECT COALESCE(SUM(bytes), 0) FROM results').fetchone()[0]
+
+
+def set_result_cache(cache=None):
+    '''
+    caches the results of all parse steps in cache, ie. a ResultCache, None to stop caching
+    '''
+    _result_cache['cache'] = cache
+
+
+def cached_parse(parse, content, *args, **kwargs):
+    '''
+    runs parse(content, *args, **kwargs), or returns its cached result if a result cache is set
+    and the same page was parsed with the same arguments and parser version before.
+    The entities the parse function added to the REGISTRY are added again on a hit,
+    entries cached without them are parsed again.
+    '''
+    with span(parse.__name__, cat='parse', bytes=len(content)) as attrs:
+        cache = _result_cache['cache']
+        if cache is None:
+            return parse(content, *args, **kwargs)
+
+        key = result_key(parse, content, args, kwargs)
+        result, entities = cache.get(key, entities=True)
+        attrs['cached'] = entities is not None
+        if entities is not None:
+            REGISTRY.add_records(entities)
+            return result
+
+        with REGISTRY.recording() as entities:
+            result = parse(content, *args, **kwargs)
+        cache.put(key, parse, result, entities=entities)
+        return result
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .batch import PLAYER_PAGES, player_jobs
+from .scrapers import current_season
+from .sinks import to_frame
+
+
+DAY = 60 * 60 * 24
+
+# the expected changes per day of a page type, the prior of its change rate
+PAGE_RATES = {'mv': 3 / 365,
+              'transfers': 1 / 365,
+              'injuries': 2 / 365,
+              'performance': 1 / 7,
+              'national': 1 / 60,
+              'positions': 1 / 7,
+              'kader': 1 / 30,
+              'leistungsdaten': 1 / 7,
+              'schedule': 1 / 7,
+              'competitions': 1 / 90,
+              'media': 1 / 365}
+DEFAULT_RATE = 1 / 30
+
+# the expected requests of a page type, ie. a detailed positions page fetches the player page and one per position,
+# a national team page the page of every national team (U17, U19, U21, ...) the player played for
+PAGE_COSTS = {'positions': 4,
+              'national': 4}
+DEFAULT_COST = 1
+
+# the change rate of a page is estimated from its changes within this window, so it follows pages that change
+# more or less often than they used to, ie. players moving to a bigger club
+RATE_WINDOW = 365 * DAY
+
+# pages of a season, which do not change once the season is over
+SEASON_PAGES = ['kader', 'leistungsdaten', 'schedule']
+# a player without a new market value for this long is taken as retired and their pages as frozen
+RETIRED_AFTER = 3 * 365 * DAY
+
+
+def mv_signal(df, now):
+    if len(df) == 0:
+        return {}
+    last = pd.Timestamp(df.index.max()).timestamp()
+    return {'retired': (now - last) > RETIRED_AFTER}
+
+
+def kader_signal(df, now):
+    if 'Contract Expires' not in df:
+        return {}
+    expires = pd.to_datetime(df['Contract Expires'], errors='coerce').dropna()
+    expires = expires[expires > pd.Timestamp.fromtimestamp(now)]
+    if len(expires) == 0:
+        return {}
+    return {'next_change': expires.min().timestamp()}
+
+
+# page type: function(result, now) returning change signals of a result:
+# 'next_change' a unix time the page is known to change at, 'retired' whether the player is retired
+SIGNALS = {'mv': mv_signal,
+           'kader': kader_signal}
+
+
+def result_digest(result):
+    '''
+    a hash of the content of a scraper result, to detect changes between fetches
+    '''
+    df = to_frame(result)
+    try:
+        return str(int(pd.util.hash_pandas_object(df.astype('str'), index=True).sum() % (1 << 63)))
+    except TypeError:
+        return hashlib.sha1(df.to_csv().encode('utf-8')).hexdigest()
+
+
+class RecrawlScheduler(object):
+    '''
+    tracks when every (entity, page type) was fetched and when its content changed,
+    and plans recrawls under a request budget by the probability that a page changed since its last fetch.
+
+    The change rate of a page is estimated from its changes within the last RATE_WINDOW with PAGE_RATES as prior
+    (one prior change per 1 / rate days), and the probability of a change since the last fetch
+    is 1 - exp(-rate * age). Signals from the results override it: a page with a known upcoming
+    change (ie. the next expiring contract of a squad) is due when that date has passed, pages of
+    retired players and of past seasons are frozen.
+
+    Parameters:
+    -----------
+    path: the SQLite database file, created if it does not exist
+    page_rates = PAGE_RATES: the prior change rates per day by page type
+    page_costs = PAGE_COSTS: the requests a fetch of a page type costs, DEFAULT_COST if missing
+    '''
+
+    def __init__(self, path, page_rates=PAGE_RATES, page_costs=PAGE_COSTS):
+        self.path = path
+        self.page_rates = page_rates
+        self.page_costs = page_costs
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS pages (
+                               entity TEXT NOT NULL,
+                               page TEXT NOT NULL,
+                               first_fetch REAL NOT NULL,
+                               last_fetch REAL NOT NULL,
+                               last_change REAL NOT NULL,
+                               fetches INTEGER NOT NULL,
+                               changes INTEGER NOT NULL,
+                               digest TEXT,
+                               next_change REAL,
+                               retired INTEGER NOT NULL DEFAULT 0,
+                               PRIMARY KEY (entity, page))''')
+            con.execute('''CREATE TABLE IF NOT EXISTS changes (
+                               entity TEXT NOT NULL,
+                               page TEXT NOT NULL,
+                               changed_at REAL NOT NULL)''')
+            con.execute('CREATE INDEX IF NOT EXISTS changes_page ON changes (entity, page, changed_at)')
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def record(self, entity, page, result, fetched_at=None):
+        '''
+        records a fetch of a page and whether its content changed since the last fetch
+
+        Parameters:
+        -----------
+        entity: the entity the page belongs to, ie. a player id
+        page: the page type, ie. 'mv' or a key of PAGE_RATES
+        result: the scraper result of the fetch
+        fetched_at = None: unix time of the fetch, defaults to now
+
+        Returns:
+        -----------
+        whether the content changed, True for the first fetch
+        '''
+        entity = str(entity)
+        now = time.time() if fetched_at is None else fetched_at
+        digest = result_digest(result)
+        signal = SIGNALS[page](to_frame(result), now) if page in SIGNALS else {}
+
+        with self._lock:
+            with self._connect() as con:
+                row = con.execute('SELECT digest FROM pages WHERE entity = ? AND page = ?', (entity, page)).fetchone()
+                changed = (row is None) or (row[0] != digest)
+                if row is None:
+                    con.execute('INSERT INTO pages VALUES (?, ?, ?, ?, ?, 1, 0, ?, ?, ?)',
+                                (entity, page, now, now, now, digest, signal.get('next_change'),
+                                 int(signal.get('retired', False))))
+                else:
+                    con.execute('''UPDATE pages SET last_fetch = ?, fetches = fetches + 1, digest = ?,
+                                                    changes = changes + ?,
+                                                    last_change = CASE WHEN ? THEN ? ELSE last_change END,
+                                                    next_change = ?, retired = ?
+                                   WHERE entity = ? AND page = ?''',
+                                (now, digest, int(changed), int(changed), now, signal.get('next_change'),
+                                 int(signal.get('retired', False)), entity, page))
+                if changed:
+                    con.execute('INSERT INTO changes VALUES (?, ?, ?)', (entity, page, now))
+        return changed
+
+    def record_job(self, name, result, fetched_at=None):
+        '''
+        records a batch job result, the page type and entity are taken from the job name, ie. mv_12345
+        '''
+        page, _, entity = name.partition('_')
+        return self.record(entity, page, result, fetched_at=fetched_at)
+
+    def history(self, entity=None, page=None):
+        '''
+        the tracked pages and their statistics as a DataFrame
+        '''
+        with self._connect() as con:
+            df = pd.read_sql_query('SELECT * FROM pages', con)
+        if entity is not None:
+            df = df.loc[df['entity'] == str(entity)]
+        if page is not None:
+            df = df.loc[df['page'] == page]
+        return df.reset_index(drop=True)
+
+    def staleness(self, now=None):
+        '''
+        the probability that every tracked page changed since its last fetch
+
+        Returns:
+        -----------
+        the pages of history with the additional columns rate (changes per day), frozen and p_changed
+        '''
+        now = time.time() if now is None else now
+        since = now - RATE_WINDOW
+        with self._connect() as con:
+            df = pd.read_sql_query('''SELECT pages.*, COUNT(changes.changed_at) AS recent_changes
+                                      FROM pages LEFT JOIN changes
+                                        ON changes.entity = pages.entity AND changes.page = pages.page
+                                       AND changes.changed_at > pages.first_fetch AND changes.changed_at >= ?
+                                     GROUP BY pages.entity, pages.page''', con, params=(since,))
+        if len(df) == 0:
+            return df.assign(rate=pd.Series(dtype='float'), frozen=pd.Series(dtype='bool'),
+                             p_changed=pd.Series(dtype='float'))
+
+        prior = df['page'].map(self.page_rates).fillna(DEFAULT_RATE).to_numpy()
+        # the first fetch is recorded in changes as well, but is no change
+        observed_days = (df['last_fetch'] - np.maximum(df['first_fetch'], since)).clip(lower=0).to_numpy() / DAY
+        df['rate'] = (df['recent_changes'].to_numpy() + 1) / (observed_days + 1 / prior)
+        df = df.drop(columns='recent_changes')
+
+        retired = df.loc[df['retired'] == 1, 'entity'].unique()
+        seasons = pd.to_numeric(df['entity'].str.extract(r'(?:^|_)(\d{4})(?:_|$)', expand=False), errors='coerce')
+        past_season = df['page'].isin(SEASON_PAGES) & (seasons < current_season()).to_numpy()
+        player_page = df['page'].isin(list(PLAYER_PAGES))
+        df['frozen'] = (player_page & df['entity'].isin(retired)) | past_season
+
+        age_days = (now - df['last_fetch'].to_numpy()) / DAY
+        p_changed = 1 - np.exp(-df['rate'].to_numpy() * age_days)
+        p_changed = np.where(df['next_change'].notna() & (df['next_change'].fillna(np.inf) <= now), 1.0, p_changed)
+        df['p_changed'] = np.where(df['frozen'], 0.0, p_changed)
+        return df
+
+    def plan(self, budget, now=None, candidates=None, weights=None):
+        '''
+        the pages most likely to have changed per request, up to a request budget.
+        Page types fetching several pages count with their PAGE_COSTS.
+
+        Parameters:
+        -----------
+        budget: the number of requests available, ie. per day
+        now = None: unix time to plan for, defaults to now
+        candidates = None: a list of (entity, page) pairs to consider besides the tracked pages,
+                           ie. newly discovered players. Pages never fetched are due with probability 1.
+        weights = None: a dict of page type: importance the probabilities are multiplied with, default 1
+
+        Returns:
+        -----------
+        a DataFrame of entity, page, p_changed, cost and priority (the weighted p_changed per request),
+        in crawl order
+        '''
+        df = self.staleness(now)[['entity', 'page', 'p_changed', 'last_fetch']]
+        if candidates:
+            new = pd.DataFrame([[str(entity), page] for entity, page in candidates], columns=['entity', 'page'])
+            new = new.merge(df[['entity', 'page']], how='left', indicator=True)
+            new = new.loc[new['_merge'] == 'left_only', ['entity', 'page']].assign(p_changed=1.0, last_fetch=0.0)
+            df = pd.concat([df, new], ignore_index=True)
+
+        weights = weights or {}
+        df['cost'] = df['page'].map(self.page_costs).fillna(DEFAULT_COST)
+        df['priority'] = df['p_changed'] * df['page'].map(weights).fillna(1.0) / df['cost']
+        df = df.loc[df['priority'] > 0]
+        df = df.sort_values(['priority', 'last_fetch'], ascending=[False, True], kind='stable')
+        return (df.loc[df['cost'].cumsum() <= budget]
+                  .drop(columns='last_fetch')
+                  .reset_index(drop=True))
+
+    def sink(self, sink=None):
+        '''
+        a sink for batch.run_jobs or workqueue.run_worker that records every job result
+        (see record_job) and passes it on to sink, if given
+        '''
+        return SchedulerSink(self, sink)
+
+
+class SchedulerSink(object):
+    def __init__(self, scheduler, sink=None):
+        self.scheduler = scheduler
+        self.inner = sink
+
+    def write(self, name, result):
+        self.scheduler.record_job(name, result)
+        if self.inner is not None:
+            return self.inner.write(name, result)
+        return None
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+def plan_to_jobs(plan):
+    '''
+    converts the player pages of a crawl plan into batch jobs, see batch.player_jobs.
+    Other page types are returned as the remaining plan rows.
+
+    Returns:
+    -----------
+    jobs, rest
+    '''
+    jobs = []
+    player = plan['page'].isin(list(PLAYER_PAGES)).to_numpy()
+    for page, entities in plan.loc[player].groupby('page', sort=False)['entity']:
+        jobs += player_jobs(list(entities), pages=[page])
+    return jobs, plan.loc[~player].reset_index(drop=True)
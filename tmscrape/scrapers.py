@@ -1,16 +1,32 @@
 import matplotlib.pyplot as plt
 from bs4 import BeautifulSoup
-import requests
 import os
 import pandas as pd
 import numpy as np
 import re
 import time
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from .dateparse import parse_dates
+from .fetcher import HEADERS, fetch
+from .injuries import INJURY_INDEX
+from .mvstore import MV_STORE
+from .registry import REGISTRY
+from .resultcache import cached_parse
+from .tracing import carry, span, traced
+
+try:
+    import pyarrow
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
 
 
-HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
 DELAY = 2
+MAX_WORKERS = 8
 
 
 POSITION_NAMES = ['Torwart',
@@ -71,11 +87,106 @@ POSITION_ABBREV_ENG = ['GK',
 
 
 def get_page_tree_and_soup(url, headers=HEADERS):
-    pageTree = requests.get(url, headers=headers)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    pageTree = fetch(url, headers=headers)
+    soup = make_soup(pageTree.content)
     return pageTree, soup
 
 
+def make_soup(content):
+    '''
+    parses raw page content (bytes or str) into a BeautifulSoup. An existing soup is returned as is,
+    so the parse_* functions accept either raw content or an already parsed page.
+    '''
+    if isinstance(content, BeautifulSoup):
+        return content
+    with span('parse', bytes=len(content)):
+        return BeautifulSoup(content, 'html.parser')
+
+
+def get_page_trees_and_soups(urls, headers=HEADERS, max_workers=MAX_WORKERS):
+    '''
+    fetches several pages concurrently
+
+    Parameters:
+    -----------
+    urls: an iterable of urls
+    headers: requests.get headers
+    max_workers: number of pages fetched at the same time
+
+    Returns:
+    -----------
+    a list of (pageTree, soup) tuples in the order of urls
+    '''
+    urls = list(urls)
+    if len(urls) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(carry(lambda url: get_page_tree_and_soup(url, headers=headers)), urls))
+
+
+def iter_soups(urls, headers=HEADERS, max_workers=MAX_WORKERS):
+    '''
+    fetches pages concurrently and yields their soups one at a time, in the order of urls.
+    A page is only parsed when it is consumed and its tree is decomposed as soon as the next page is asked for,
+    so at most max_workers raw pages and a single tree are held however many pages there are.
+    Extract what is needed from a soup before advancing, and keep no references to its tags.
+
+    Parameters:
+    -----------
+    urls: an iterable of urls, consumed lazily
+    headers: requests.get headers
+    max_workers: number of pages fetched ahead at the same time
+
+    Yields:
+    -----------
+    a BeautifulSoup per url
+    '''
+    urls = iter(urls)
+    fetch_url = carry(lambda url: fetch(url, headers=headers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(executor.submit(fetch_url, url) for url in islice(urls, max_workers))
+        try:
+            while pending:
+                content = pending.popleft().result().content
+                pending.extend(executor.submit(fetch_url, url) for url in islice(urls, 1))
+                soup = make_soup(content)
+                del content
+                try:
+                    yield soup
+                finally:
+                    soup.decompose()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def current_season():
+    '''
+    the year the current season began, seasons start in July
+    '''
+    now = datetime.now()
+    return now.year if now.month >= 7 else now.year - 1
+
+
+def resolve_club(club, club_id):
+    '''
+    completes a club name / club id pair from the REGISTRY, so either one can be None
+    if the club has been seen by any scraper before.
+
+    Returns:
+    -----------
+    club, club_id
+    '''
+    if club_id is None:
+        club_id = REGISTRY.get_id('club', club)
+        if club_id is None:
+            raise ValueError(f'club_id of {club} is unknown, pass it explicitly')
+    if club is None:
+        # transfermarkt redirects any name string to the club, so a placeholder works as well
+        club = REGISTRY.get_slug('club', club_id, default='verein')
+    return club, club_id
+
+
 def get_table_columns(thead):
     '''
     parses an html tablehead (thead) into a list of column names
@@ -83,33 +194,255 @@ def get_table_columns(thead):
     return [t.text for t in thead.find_all('th')]
 
 
+TABLE_ATTRS = ['href', 'img', 'title']
+TABLE_OUTPUTS = ['pandas', 'arrow']
+
+
+def _cell_attr(cell, kind):
+    if kind == 'href':
+        element = cell.find('a', href=True)
+        return None if element is None else element['href']
+    if kind == 'img':
+        element = cell.find('img')
+        if element is None:
+            return None
+        return element.get('data-src') or element.get('src')
+    if kind == 'title':
+        if cell.get('title'):
+            return cell['title']
+        element = cell.find(title=True)
+        return None if element is None else element['title']
+    raise ValueError(f'attrs must be in {TABLE_ATTRS}')
+
+
+def _cast_column(values, dtype, name=None):
+    if dtype in ['int', 'Int64', 'float']:
+        values = pd.to_numeric(values.str.replace('.', '', regex=False)
+                                     .str.replace(',', '.', regex=False)
+                                     .replace(['-', ''], np.nan),
+                               errors='coerce')
+        if dtype == 'int':
+            return values.fillna(0).astype('int')
+        return values.astype(dtype)
+    if dtype == 'datetime':
+        return parse_dates(values, name=name)
+    return values.astype(dtype)
+
+
+def _arrow_type(dtype):
+    if dtype in ['int', 'Int64']:
+        return pyarrow.int64()
+    if dtype == 'float':
+        return pyarrow.float64()
+    if dtype == 'datetime':
+        return pyarrow.timestamp('ns')
+    if dtype == 'category':
+        return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    if dtype == 'bool':
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+
+def table_schema(columns, attrs=None, dtypes=None):
+    '''
+    the pyarrow schema of an extract_table(..., output='arrow') table: a string column per column
+    and attribute column, and the dtypes columns as int64 ('int' not null), float64, timestamp[ns],
+    dictionary ('category') or bool
+
+    Parameters:
+    -----------
+    columns: a list of column names, positions are named '0', '1', ...
+    attrs = None, dtypes = None: as for extract_table
+    '''
+    if pyarrow is None:
+        raise ImportError("output='arrow' requires the pyarrow package")
+    attrs = attrs or {}
+    dtypes = dtypes or {}
+    fields = [pyarrow.field(str(column), _arrow_type(dtypes.get(column)), nullable=dtypes.get(column) != 'int')
+              for column in columns]
+    fields += [pyarrow.field(f'{column}_{kind}', pyarrow.string()) for column in attrs for kind in attrs[column]]
+    return pyarrow.schema(fields)
+
+
+def _arrow_column(values, field):
+    # builds a column of a declared type straight from the extracted cell texts
+    array = pyarrow.array(values, type=pyarrow.string())
+    if pyarrow.types.is_string(field.type):
+        return array
+    if pyarrow.types.is_dictionary(field.type):
+        return array.dictionary_encode()
+    if pyarrow.types.is_timestamp(field.type):
+        dates = parse_dates(pd.Series(values, dtype='object'), name=field.name)
+        return pyarrow.array(dates.to_numpy(dtype='datetime64[ns]'), type=field.type, from_pandas=True)
+
+    # German number formats: '.' groups thousands, ',' is the decimal separator, anything else is missing
+    numbers = pyarrow.compute.replace_substring(array, '.', '')
+    numbers = pyarrow.compute.replace_substring(numbers, ',', '.')
+    numbers = pyarrow.compute.utf8_trim_whitespace(numbers)
+    valid = pyarrow.compute.match_substring_regex(numbers, r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+    numbers = pyarrow.compute.if_else(valid, numbers, pyarrow.scalar(None, pyarrow.string()))
+    numbers = pyarrow.compute.cast(numbers, pyarrow.float64())
+    if not field.nullable:
+        numbers = pyarrow.compute.fill_null(numbers, 0.0)
+    if pyarrow.types.is_integer(field.type):
+        return pyarrow.compute.cast(numbers, field.type, safe=False)
+    return numbers
+
+
+def to_arrow(df, columns, dtypes=None):
+    '''
+    converts a cleaned scraper DataFrame to a pyarrow Table with the declared table_schema(columns, dtypes=dtypes),
+    the output='arrow' of the scrapers whose tables are cleaned in pandas.
+    Columns missing from df (ie. of a page without data) are null and other columns are dropped,
+    so the results of all pages of a scraper share one schema.
+    '''
+    schema = table_schema(columns, dtypes=dtypes)
+    arrays = []
+    for field in schema:
+        if field.name not in df:
+            array = pyarrow.nulls(len(df), type=field.type)
+        elif pyarrow.types.is_string(field.type) or pyarrow.types.is_dictionary(field.type):
+            values = df[field.name]
+            array = pyarrow.array(values.astype('str').where(values.notna(), None), type=pyarrow.string(),
+                                  from_pandas=True)
+            if pyarrow.types.is_dictionary(field.type):
+                array = array.dictionary_encode()
+        else:
+            array = pyarrow.compute.cast(pyarrow.array(df[field.name], from_pandas=True), field.type)
+        if not field.nullable:
+            array = pyarrow.compute.fill_null(array, pyarrow.scalar(0, field.type))
+        arrays.append(array)
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+@traced('extract')
+def extract_table(tbody,
+                  columns=None,
+                  strip=True,
+                  attrs=None,
+                  dtypes=None,
+                  nested=False,
+                  output='pandas'):
+    '''
+    parses an html table into a DataFrame in a single pass over its rows.
+    Cells keep their position, so an empty cell stays an empty string in its column
+    and short rows are padded with None instead of shifting the columns that follow.
+
+    Parameters:
+    -----------
+    tbody: an html tbody (or table) element
+    columns = None: a list of column names, defaults to positions 0..n.
+                    Rows with more cells than columns are cut off.
+    strip = True: strip whitespace from the cell texts
+    attrs = None: a dict of column: list of TABLE_ATTRS to collect in the same pass,
+                  ie. {'Club': ['href', 'title']}, stored in the columns 'Club_href' and 'Club_title'.
+                  'href' is the first link of the cell, 'img' the first image source,
+                  'title' the title of the cell or its first element that has one.
+    dtypes = None: a dict of column: dtype to convert columns to, 'int', 'Int64' and 'float' are parsed
+                   from German number formats ('-' is missing), 'datetime' with parse_dates
+    nested = False: whether rows and cells of tables nested in cells are included, as get_table_from_tbody does
+    output = 'pandas': 'arrow' builds a pyarrow Table with the declared table_schema directly from the cell texts,
+                       without a DataFrame in between, ie. for zero-copy handoff to Polars or DuckDB
+
+    Returns:
+    ----------
+    a DataFrame, or a pyarrow Table if output is 'arrow'
+    '''
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+    attrs = attrs or {}
+    dtypes = dtypes or {}
+
+    if nested:
+        rows = tbody.find_all('tr')
+    else:
+        rows = [row for row in tbody.children if getattr(row, 'name', None) == 'tr']
+
+    cells = []
+    for row in rows:
+        if nested:
+            cells.append(row.find_all('td'))
+        else:
+            cells.append([cell for cell in row.children if getattr(cell, 'name', None) == 'td'])
+
+    width = len(columns) if columns is not None else max([len(row) for row in cells], default=0)
+    names = list(columns) if columns is not None else list(range(width))
+    positions = {name: i for i, name in enumerate(names)}
+
+    texts = [[] for _ in range(width)]
+    extras = {(column, kind): [] for column in attrs for kind in attrs[column]}
+    for row in cells:
+        for i in range(width):
+            if i < len(row):
+                text = row[i].text
+                texts[i].append(text.strip() if strip else text)
+            else:
+                texts[i].append(None)
+        for column, kind in extras:
+            i = positions[column]
+            extras[(column, kind)].append(_cell_attr(row[i], kind) if i < len(row) else None)
+
+    if output == 'arrow':
+        schema = table_schema(names, attrs, dtypes)
+        columns = texts + list(extras.values())
+        return pyarrow.Table.from_arrays([_arrow_column(values, field) for values, field in zip(columns, schema)],
+                                         schema=schema)
+
+    data = {}
+    for name, values in zip(names, texts):
+        data[name] = pd.Series(values, dtype='object')
+    for (column, kind), values in extras.items():
+        data[f'{column}_{kind}'] = pd.Series(values, dtype='object')
+    df = pd.DataFrame(data, columns=list(data))
+
+    for column, dtype in dtypes.items():
+        df[column] = _cast_column(df[column], dtype, name=column)
+    return df
+
+
 def get_table_from_tbody(tbody,
                          columns=None,
                          strip=False,
-                         rid_empty=True):
+                         rid_empty=True,
+                         output='pandas'):
     '''
-    parses an html table into a DataFrame
+    parses an html table into a DataFrame, including the cells of nested tables
     
     Parameters:
     ----------
     tbody: an html tbody element
+    columns = None: a list of column names
+    strip = False: strip whitespace from the cell texts
+    rid_empty = True: drop empty cells, which moves the following cells of the row one column to the left.
+                      The column lists of the competition overviews, historic league placements, league fixtures
+                      and the games by position of a player were written against the compacted rows,
+                      where cells without text (ie. logos and flags) are not counted as columns.
+                      False extracts the cells by position with extract_table.
+    output = 'pandas': 'arrow' for a pyarrow Table of strings, see extract_table
 
     Returns:
     ----------
-    a DataFrame
+    a DataFrame, or a pyarrow Table if output is 'arrow'
     '''
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+    if not rid_empty:
+        return extract_table(tbody, columns=columns, strip=strip, nested=True, output=output)
+
     data = []
-    rows = tbody.find_all('tr')
-    for row in rows:
-        cols = row.find_all('td')
-        cols = [element.text for element in cols]
+    for row in tbody.find_all('tr'):
         if strip:
-            cols = [element.strip() for element in cols]
-        if rid_empty:
-            data.append([element for element in cols if element]) # Get rid of empty values
+            cols = [element.text.strip() for element in row.find_all('td')]
         else:
-            data.append([element for element in cols])
-        
+            cols = [element.text for element in row.find_all('td')]
+        data.append([element for element in cols if element]) # Get rid of empty values
+
+    if output == 'arrow':
+        width = len(columns) if columns is not None else max([len(row) for row in data], default=0)
+        names = list(columns) if columns is not None else list(range(width))
+        schema = table_schema(names)
+        return pyarrow.Table.from_arrays([pyarrow.array([row[i] if i < len(row) else None for row in data],
+                                                        type=pyarrow.string()) for i in range(width)],
+                                         schema=schema)
+
     if columns is not None:
         return pd.DataFrame(data, columns = columns)
     else:
@@ -130,89 +463,83 @@ def clean_market_vals(series):
     return series
 
 
-def get_competition_list(competition_string):
-    """
-    get all competitions listed on transfermarkt
-
-    str competition_string: one of ['europa', 'asien', 'afrika', 'amerika', 'europaJugend']
-
-    Returns:
-    --------
-    DataFrame with columns:
-        ['League_Name', 'n_clubs', 'n_players', 'avg_age', 'pct_legionary',
-         'Market_Value', 'League_Type', 'competition_string', 'Country']
-
-        League_Type: ie 1st Division, Cup ...
+COMPETITION_REGIONS = ['europa', 'asien', 'afrika', 'amerika', 'europaJugend']
+COMPETITION_INDEX_TTL = 60 * 60 * 24 * 90
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape')
 
-    """
-    assert competition_string in ['europa', 'asien', 'afrika', 'amerika', 'europaJugend'], "competition_string must be in ['europa', 'asien', 'afrika', 'amerika', 'europaJugend']"
+_competition_index = {'fetched': None, 'table': None}
 
-    base_url = 'https://www.transfermarkt.de'
-    url = f'https://www.transfermarkt.de/wettbewerbe/{competition_string}'
-
-    pageTree, soup = get_page_tree_and_soup(url)
 
+def get_competition_pager_urls(soup, base_url='https://www.transfermarkt.de'):
+    '''
+    parses the pager of a competition overview page into the urls of pages 2 to n
+    '''
     avail_pages = soup.find_all('div', {'class': 'pager'})
 
     try:
         affix, last_page = avail_pages[0].find_all('li')[-1].find('a')['href'].split('=')
         affix += '='
 
-        pages = [base_url + affix + str(nr) for nr in range(2, int(last_page)+1)]
+        return [base_url + affix + str(nr) for nr in range(2, int(last_page)+1)]
     except:
-        pages = []
+        return []
 
-    def get_competition_list(soup):
-        tbody = soup.find_all('tbody')[0]
 
-        table = get_table_from_tbody(tbody, strip=True)
-
-        mask = pd.isna(table.iloc[:, 1:]).all(axis=1)
+def parse_competition_page(content):
+    '''
+    parses one page of a competition overview (ie. /wettbewerbe/europa) into a raw DataFrame,
+    see clean_competition_list
+    '''
+    soup = make_soup(content)
+    tbody = soup.find_all('tbody')[0]
 
-        ligen = pd.Series(index=table.index)
-        ligen.loc[mask & (table[0] != table[0].shift(1))] = table.loc[mask & (table[0] != table[0].shift(1)), 0]
+    # compacted, so the section headers (ie. 'Erste Liga') are the rows with only a first cell, which mask finds
+    table = get_table_from_tbody(tbody, strip=True, rid_empty=True)
 
-        ligen = ligen.fillna(method='ffill')
-        table['League_Type'] = ligen
+    mask = pd.isna(table.iloc[:, 1:]).all(axis=1)
 
-        table = table.iloc[:, 1:]
+    ligen = pd.Series(index=table.index, dtype='object')
+    ligen.loc[mask & (table[0] != table[0].shift(1))] = table.loc[mask & (table[0] != table[0].shift(1)), 0]
 
-        table = table.loc[~mask]
+    ligen = ligen.ffill()
+    table['League_Type'] = ligen
 
-        comp_links = [a['href'].split('/')[-1] for a in tbody.find_all('a')
-                      if 'startseite/wettbewerb' in a['href']][1::2]
+    table = table.iloc[:, 1:]
 
-        table.columns = ['League_Name', 'n_clubs', 'n_players', 'avg_age', 'pct_legionary', 'Market_Value', 'League_Type']
+    table = table.loc[~mask]
 
-        table = table.reset_index(drop=True)
-        table['competition_string'] = comp_links
+    comp_hrefs = [a['href'] for a in tbody.find_all('a')
+                  if 'startseite/wettbewerb' in a['href']][1::2]
+    comp_links = [href.split('/')[-1] for href in comp_hrefs]
 
-        countries = [img['title'] for img in tbody.find_all('img', {'class': "flaggenrahmen"})]
-        table['Country'] = countries
+    table.columns = ['League_Name', 'n_clubs', 'n_players', 'avg_age', 'pct_legionary', 'Market_Value', 'League_Type']
 
-        return table
+    table = table.reset_index(drop=True)
+    table['competition_string'] = comp_links
 
-    table = get_competition_list(soup)
+    countries = [img['title'] for img in tbody.find_all('img', {'class': "flaggenrahmen"})]
+    table['Country'] = countries
 
-    dfs = [table]
+    REGISTRY.add_many('competition', comp_links, [href.split('/')[1] for href in comp_hrefs], table['League_Name'])
 
-    for page in pages:
-        _, soup = get_page_tree_and_soup(page)
-        table = get_competition_list(soup)
-        dfs.append(table)
+    return table
 
-    competitions = pd.concat(dfs).reset_index(drop=True)
 
-    competitions.dtypes
+@traced('clean')
+def clean_competition_list(competitions):
+    '''
+    converts the columns of concatenated parse_competition_page tables to numbers
+    '''
+    competitions = competitions.reset_index(drop=True)
 
     competitions['n_clubs'] = competitions['n_clubs'].astype('int')
-    competitions['n_players'] = competitions['n_players'].str.replace('.', '').astype('int')
+    competitions['n_players'] = competitions['n_players'].str.replace('.', '', regex=False).astype('int')
 
-    competitions['avg_age'] = competitions['avg_age'].str.replace(',', '.').astype('float')
+    competitions['avg_age'] = competitions['avg_age'].str.replace(',', '.', regex=False).astype('float')
     competitions['pct_legionary'] = pd.to_numeric(competitions['pct_legionary']
-                                                    .str.replace(',', '.')
-                                                    .str.replace(' %', '')
-                                                    .str.replace('%', ''), errors='coerce')
+                                                    .str.replace(',', '.', regex=False)
+                                                    .str.replace(' %', '', regex=False)
+                                                    .str.replace('%', '', regex=False), errors='coerce')
 
     def clean_market_val(series):
         base, mmm, _ = series.str.split(' ', expand=True).values.T
@@ -234,6 +561,112 @@ def get_competition_list(competition_string):
     return competitions
 
 
+def get_competition_list(competition_string):
+    """
+    get all competitions listed on transfermarkt
+
+    str competition_string: one of ['europa', 'asien', 'afrika', 'amerika', 'europaJugend']
+
+    Returns:
+    --------
+    DataFrame with columns:
+        ['League_Name', 'n_clubs', 'n_players', 'avg_age', 'pct_legionary',
+         'Market_Value', 'League_Type', 'competition_string', 'Country']
+
+        League_Type: ie 1st Division, Cup ...
+
+    """
+    assert competition_string in COMPETITION_REGIONS, f"competition_string must be in {COMPETITION_REGIONS}"
+
+    url = f'https://www.transfermarkt.de/wettbewerbe/{competition_string}'
+
+    _, soup = get_page_tree_and_soup(url)
+    pages = get_competition_pager_urls(soup)
+    dfs = [parse_competition_page(soup)]
+    soup.decompose()
+
+    for soup in iter_soups(pages):
+        dfs.append(parse_competition_page(soup))
+
+    return clean_competition_list(pd.concat(dfs))
+
+
+def get_all_competitions(refresh=False,
+                         ttl=COMPETITION_INDEX_TTL,
+                         cache_dir=CACHE_DIR,
+                         max_workers=MAX_WORKERS):
+    """
+    get all competitions of all regions listed on transfermarkt as one index.
+    The first page of every region is fetched concurrently, then all remaining pager pages.
+
+    The index is cached in memory and as a pickle in cache_dir for ttl seconds,
+    as the competition list rarely changes during a season.
+
+    Parameters:
+    -----------
+    refresh = False: ignore the cache and scrape the competitions again
+    ttl = COMPETITION_INDEX_TTL: maximum age of a cached index in seconds
+    cache_dir = CACHE_DIR: directory of the on-disk cache, None to only cache in memory
+    max_workers = MAX_WORKERS: number of pages fetched at the same time
+
+    Returns:
+    --------
+    DataFrame indexed by competition_string with columns:
+        ['League_Name', 'n_clubs', 'n_players', 'avg_age', 'pct_legionary',
+         'Market_Value', 'League_Type', 'Country', 'Region']
+
+        League_Type, Country and Region are categoricals
+    """
+    now = time.time()
+    cache_file = None if cache_dir is None else os.path.join(cache_dir, 'competitions.pkl')
+
+    if not refresh:
+        if (_competition_index['table'] is not None) and (now - _competition_index['fetched'] < ttl):
+            return _competition_index['table']
+
+        if (cache_file is not None) and os.path.isfile(cache_file) and (now - os.path.getmtime(cache_file) < ttl):
+            _competition_index['table'] = pd.read_pickle(cache_file)
+            _competition_index['fetched'] = os.path.getmtime(cache_file)
+            return _competition_index['table']
+
+    urls = [f'https://www.transfermarkt.de/wettbewerbe/{region}' for region in COMPETITION_REGIONS]
+
+    dfs = []
+    regions = []
+    pages = []
+    for region, soup in zip(COMPETITION_REGIONS, iter_soups(urls, max_workers=max_workers)):
+        for page in get_competition_pager_urls(soup):
+            regions.append(region)
+            pages.append(page)
+        dfs.append(parse_competition_page(soup).assign(Region=region))
+
+    for region, soup in zip(regions, iter_soups(pages, max_workers=max_workers)):
+        dfs.append(parse_competition_page(soup).assign(Region=region))
+
+    competitions = clean_competition_list(pd.concat(dfs))
+    competitions = (competitions.drop_duplicates('competition_string')
+                                .set_index('competition_string'))
+    competitions = competitions.astype({'League_Name': 'object',
+                                        'n_clubs': 'int64',
+                                        'n_players': 'int64',
+                                        'avg_age': 'float64',
+                                        'pct_legionary': 'float64',
+                                        'Market_Value': 'float64',
+                                        'League_Type': 'category',
+                                        'Country': 'category',
+                                        'Region': 'category'})
+
+    if cache_file is not None:
+        if os.path.isdir(cache_dir) == False:
+            os.makedirs(cache_dir)
+        competitions.to_pickle(cache_file)
+
+    _competition_index['table'] = competitions
+    _competition_index['fetched'] = now
+
+    return competitions
+
+
 def get_clubnames_league(league_abbrev,
                          league_name=None,
                          season_id=None,
@@ -247,7 +680,7 @@ def get_clubnames_league(league_abbrev,
     -----------
 
     league_abbrev:    ie: for the premier league: GB1
-    league_name: tm league name ie.: premier-league
+    league_name: tm league name ie.: premier-league, looked up in the REGISTRY if None
     season_id: season, ie.: 2018 for 2018/19
 
     Returns:
@@ -259,18 +692,28 @@ def get_clubnames_league(league_abbrev,
 
     """
 
+    if league_name is None:
+        league_name = REGISTRY.get_slug('competition', league_abbrev)
+
     if (league_name is None) and (season_id is None):
-        pageTree = requests.get(f'https://www.transfermarkt.de/jumplist/startseite/wettbewerb/{league_abbrev}',
+        pageTree = fetch(f'https://www.transfermarkt.de/jumplist/startseite/wettbewerb/{league_abbrev}',
                                 headers=headers)
     else:
         if season_id is None:
-            pageTree = requests.get(f'https://www.transfermarkt.de/{league_name}/startseite/wettbewerb/{league_abbrev}/',
+            pageTree = fetch(f'https://www.transfermarkt.de/{league_name}/startseite/wettbewerb/{league_abbrev}/',
                                     headers=headers)
         else:    
-            pageTree = requests.get(f'https://www.transfermarkt.de/{league_name}/startseite/wettbewerb/{league_abbrev}/plus/?saison_id={season_id}',
+            pageTree = fetch(f'https://www.transfermarkt.de/{league_name}/startseite/wettbewerb/{league_abbrev}/plus/?saison_id={season_id}',
                                     headers=headers)
 
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    return cached_parse(parse_clubnames_league, pageTree.content)
+
+
+def parse_clubnames_league(content):
+    '''
+    parses a league overview page into an N x 2 array of club names and club ids, see get_clubnames_league
+    '''
+    soup = make_soup(content)
 
     links = soup.find_all('a',  {"class": "vereinprofil_tooltip"})
     links = [link['href'] for link in links]
@@ -280,6 +723,8 @@ def get_clubnames_league(league_abbrev,
     clean_links = pd.Series(links).value_counts().index[mask]    
 
     club_names_ids = np.array([[link.split('/')[1], link.split('/')[4]] for link in clean_links])
+    if len(club_names_ids) > 0:
+        REGISTRY.add_many('club', club_names_ids[:, 1], club_names_ids[:, 0])
     return club_names_ids
 
 
@@ -295,14 +740,23 @@ def get_club_colors(club,
     -----------
     club_id: the transfermarkt club specific id, ie 16
     club: the transfermarkt club name, ie. borussia-dortmund
+    either one may be None if the club is in the REGISTRY
 
     Returns:
     -----------
     farben: a list of club colors
     '''
+    club, club_id = resolve_club(club, club_id)
     vereinsfarben_link = f'https://www.transfermarkt.de/{club}/datenfakten/verein/{club_id}'
-    pageTree = requests.get(vereinsfarben_link, headers=headers)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    pageTree = fetch(vereinsfarben_link, headers=headers)
+    return cached_parse(parse_club_colors, pageTree.content)
+
+
+def parse_club_colors(content):
+    '''
+    parses a "Daten&Fakten - Vereinsportrait" page into a list of club colors, see get_club_colors
+    '''
+    soup = make_soup(content)
     farben = soup.find_all("p", {"class": "vereinsfarbe"})
 
     # There are teams for which there are no club colors specified
@@ -343,6 +797,7 @@ def scrape_team_league_placements(club_name,
     -----------
     club_id: the transfermarkt club specific id, ie 16
     club: the transfermarkt club name, ie. borussia-dortmund
+    either one may be None if the club is in the REGISTRY
     save: whether to save the DataFrame to a 'league_placements/' folder
     headers: requests.get headers
 
@@ -351,13 +806,29 @@ def scrape_team_league_placements(club_name,
     df: a DataFrame of historic league placement data
     '''
 
+    club_name, club_id = resolve_club(club_name, club_id)
     url = f'https://www.transfermarkt.de/{club_name}/platzierungen/verein/{club_id}'
     print('scraping ', url)
-    pageTree = requests.get(url, headers=headers)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    pageTree = fetch(url, headers=headers)
+    df = cached_parse(parse_team_league_placements, pageTree.content)
+
+    if save:
+        if os.path.isdir('league_placements') == False:
+            os.makedirs('league_placements')
+        df.to_csv(f'league_placements/{club}_league_placements.csv')    
+
+    return df
+
+
+def parse_team_league_placements(content):
+    '''
+    parses a 'Historische Platzierungen' page into a DataFrame, see scrape_team_league_placements
+    '''
+    soup = make_soup(content)
     table_body = soup.find_all('tbody')[1]
     platzierungen_columns = ['Saison', 'Liga', 'Ligahöhe', 'W', 'D', 'L', 'Tore', 'GD', 'Punkte', 'Platz', 'Trainer']
-    df = get_table_from_tbody(table_body, columns = platzierungen_columns)
+    # platzierungen_columns name the compacted cells
+    df = get_table_from_tbody(table_body, columns = platzierungen_columns, rid_empty=True)
     df[['GF', 'GA']] = pd.DataFrame(df['Tore'].str.split(':').tolist(), columns = ['GF', 'GA'])
     df[['W', 'D', 'L', 'GD', 'Platz', 'GF', 'GA']] =\
         pd.DataFrame([df[col].astype('int')
@@ -370,11 +841,6 @@ def scrape_team_league_placements(club_name,
 
     df['Liga Image Links'] = liga_img_links
 
-    if save:
-        if os.path.isdir('league_placements') == False:
-            os.makedirs('league_placements')
-        df.to_csv(f'league_placements/{club}_league_placements.csv')    
-
     return df
 
 
@@ -387,7 +853,8 @@ def scrape_gameweek_placements(club_name,
                'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}):
     '''
     scrape the 'Historische Platzierungen' page from tm to attain league, placement, coach, points etc
-    - for each gameweek.
+    - for each gameweek. standings.gameweek_placements computes the placements of a season
+    from its results instead of one request per gameweek.
 
     Parameters:
     -----------
@@ -415,8 +882,8 @@ def scrape_gameweek_placements(club_name,
         # scrape the page
         page = link.format(club_name, club_id, spieltag)
 
-        pageTree = requests.get(page, headers=headers)
-        soup = BeautifulSoup(pageTree.content, 'html.parser')
+        pageTree = fetch(page, headers=headers)
+        soup = make_soup(pageTree.content)
         body = soup.find_all('tbody')[1]
         trs = body.find_all('tr')
 
@@ -481,6 +948,7 @@ def get_club_data(club,
     -----------
     club: the transfermarkt club name, ie. borussia-dortmund
     club_id: the transfermarkt club specific id
+    either one may be None if the club is in the REGISTRY
     season: the year the season begins, ie: 2019
     league_abbrev = None: the transfermarkt specific league abbreviation
                           ie: L1 for the Bundesliga, L2 for 2. Bundesliga, GB_ for England, ES_ for Spain etc
@@ -511,7 +979,8 @@ def scrape_leistungsdaten(club,
                           league_abbrev=None,
                           save=False,
                           headers={'User-Agent': 
-           'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
+           'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'},
+                          output='pandas'
                    ):
     '''
     scrapes the 'Leistungsdaten' from Transfermarkt for one team and one season
@@ -520,17 +989,22 @@ def scrape_leistungsdaten(club,
     -----------
     club: the transfermarkt club name, ie. borussia-dortmund
     club_id: the transfermarkt club specific id
+    either one may be None if the club is in the REGISTRY
     season: the year the season begins, ie: 2019
     league_abbrev = None: the transfermarkt specific league abbreviation
                           ie: L1 for the Bundesliga, L2 for 2. Bundesliga, GB_ for England, ES_ for Spain etc
             if None, scrapes data for all matches, if not none only for the league
     save = False: whether to save the returned dataframe
     headers: headers for requests.get 
+    output = 'pandas': 'arrow' for a pyarrow Table with the LEISTUNGSDATEN_DTYPES, see to_arrow
     
     Returns:
     -----------
-    a DataFrame with the scraped data
+    a DataFrame with the scraped data, or a pyarrow Table if output is 'arrow'
     '''
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+    club, club_id = resolve_club(club, club_id)
+
     if league_abbrev is not None:
         team_leistungsdaten_link = f'https://www.transfermarkt.de/{club}/leistungsdaten/verein/{club_id}/plus/1?reldata={league_abbrev}%26{season}'
     else:
@@ -539,9 +1013,56 @@ def scrape_leistungsdaten(club,
     print('scraping ', team_leistungsdaten_link)
 
     url = team_leistungsdaten_link
-    pageTree = requests.get(url, headers=headers)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
-    tables = soup.find_all("div", {"class": "responsive-table"})
+    pageTree = fetch(url, headers=headers)
+    df = cached_parse(parse_leistungsdaten, pageTree.content, club, club_id)
+
+    if save:
+        if os.path.isdir('Kader-Leistungsdaten') == False:
+            os.makedirs('Kader-Leistungsdaten')
+
+        df.to_csv(f'Kader-Leistungsdaten/{club}_Leistungsdaten_{season}.csv')
+        print(f'Leistungsdaten {club}-{season} - saved to Kader-Leistungsdaten/{club}_Leistungsdaten_{season}.csv')
+    else:   
+        print(f'Leistungsdaten {club}-{season} - retrieved')
+
+    if output == 'arrow':
+        return to_arrow(df, LEISTUNGSDATEN_COLUMNS + ['Scorer', 'Minutes per Appearance'], LEISTUNGSDATEN_DTYPES)
+    return df
+
+
+LEISTUNGSDATEN_COLUMNS = ['Shirt Number', 'Name', 'Last Name', 'Position', 'Age',
+                          'In Squad', 'Games Played', 'Goals', 'Assists', 'Yellow', 'Second Yellow',
+                          'Red', 'Substituted On', 'Substituted Off', 'PPM', 'Minutes Played',
+                          'player_id', 'player_string']
+
+KADER_COLUMNS = ['Shirt Number', 'Name', 'Last Name', 'Position', 'Date of Birth',
+                 'Height', 'Footedness', 'At Club Since', 'Contract Expires', 'Market Value',
+                 'Image Link', 'player_id', 'player_string']
+
+# the columns added by scrape_squads_many
+SQUAD_COLUMNS = ['club', 'club_id', 'season']
+
+# the column types of the output='arrow' tables (see to_arrow), other columns are strings
+LEISTUNGSDATEN_DTYPES = dict({column: 'int' for column in LEISTUNGSDATEN_COLUMNS[4:14]},
+                             **{'PPM': 'float', 'Minutes Played': 'int', 'season': 'int',
+                                'Scorer': 'int', 'Minutes per Appearance': 'int'})
+
+KADER_DTYPES = {'Shirt Number': 'int', 'Date of Birth': 'datetime', 'Height': 'float',
+                'At Club Since': 'datetime', 'Contract Expires': 'datetime', 'Market Value': 'Int64',
+                'season': 'int', 'Age': 'float', 'Days at Club': 'float'}
+
+
+@traced('extract')
+def extract_squad_rows(content, image_link=False):
+    '''
+    extracts the raw player rows of a 'Kaderdaten' or 'Leistungsdaten' page,
+    each with the player_id and player_string (and the image link) appended
+
+    Returns:
+    -----------
+    a list of lists of cell texts
+    '''
+    soup = make_soup(content)
 
     data = []
     table = soup.find_all("div", {"class": "responsive-table"})[0]
@@ -557,65 +1078,102 @@ def scrape_leistungsdaten(club,
         except:
             player_id = ''
             player_string = ''
-        
+        if image_link:
+            img_link = row.find_next('img', {"class": "bilderrahmen-fixed"})
+            if img_link is not None:
+                img_link = img_link['src'].replace('small', 'big')
+            cols = cols+[img_link]
         cols = cols+[player_id, player_string]
-        
         data.append([element for element in cols if element]) # Get rid of empty values
 
-    leistungsdaten_columns = ['Shirt Number', 'Name', 'Last Name', 'Position', 'Age',
-                                    'In Squad', 'Games Played', 'Goals', 'Assists', 'Yellow', 'Second Yellow',
-                                    'Red', 'Substituted On', 'Substituted Off', 'PPM', 'Minutes Played',
-                                    'player_id', 'player_string']
-    df = pd.DataFrame(data[::3])
-    df = (df.iloc[:, :len(leistungsdaten_columns)]
-            .rename(columns = dict(zip(df.iloc[:, :len(leistungsdaten_columns)], leistungsdaten_columns))))
-
-    df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-        (df['Last Name'].str.contains(' ', regex=False)), 'Name'] =\
-        (df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-            (df['Last Name'].str.contains(' ', regex=False)), 'Last Name']
-            .apply(lambda x: x.split(' ')[0] + ' ' + x.split(' ')[-1])
-        )
-
-    df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-        (~df['Last Name'].str.contains(' ', regex=False)), 'Name'] =\
-    (df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-        (~df['Last Name'].str.contains(' ', regex=False)), 'Last Name']
-        .str.replace(r"([A-Z])", r" \1")
-        .apply(lambda x: x.split(' ')[-1])
-    )
-
-    df.loc[df['Last Name'].str.contains('.', regex=False), 'Name'] =\
-        df.loc[df['Last Name'].str.contains('.', regex=False), 'Last Name'].apply(lambda x: x.split('.')[0][:-1])
-
-    df['Name'] = df['Name'].str.strip()
-
-    df['Last Name'] = (df['Last Name']
-                    .str.replace('.', '')
-                    .str.strip()
-                    .apply(lambda x: x.split(' ')[-1]
-                    .strip()))
-    df['Age'] = df.Age.str.replace('†', '').str.replace('-', '25').astype('int')
-    for column in df.columns[5:-4]:
-        df.loc[:, column] = pd.to_numeric(df.loc[:, column], errors = 'coerce').fillna(0).astype('int')
-    df['PPM'] = df['PPM'].str.replace(',', '.').str.replace('-', 'NaN').astype('float')
+    # every player row is followed by the two rows of its nested name table
+    return data[::3]
+
+
+def clean_player_names(last_names):
+    '''
+    derives the short player name ('First Last') from the raw name cells of squad tables
+
+    Returns:
+    -----------
+    a Series of names
+    '''
+    last_names = last_names.fillna('')
+    has_dot = last_names.str.contains('.', regex=False).to_numpy()
+    has_space = last_names.str.contains(' ', regex=False).to_numpy()
+
+    words = last_names.str.split(' ')
+    abbreviated = last_names.str.split('.', n=1).str[0].str[:-1]
+    first_last = words.str[0] + ' ' + words.str[-1]
+    last_camelcase = last_names.str.replace(r"([A-Z])", r" \1", regex=True).str.split(' ').str[-1]
+
+    names = np.select([has_dot, has_space], [abbreviated, first_last], default=last_camelcase)
+    return pd.Series(names, index=last_names.index).str.strip()
+
+
+def extract_leistungsdaten(content):
+    '''
+    extracts the raw, uncleaned table of a team 'Leistungsdaten' page, see clean_leistungsdaten
+
+    Returns:
+    -----------
+    a DataFrame of strings with LEISTUNGSDATEN_COLUMNS
+    '''
+    df = pd.DataFrame(extract_squad_rows(content))
+    df = df.iloc[:, :len(LEISTUNGSDATEN_COLUMNS)]
+    df.columns = LEISTUNGSDATEN_COLUMNS[:df.shape[1]]
+    return df
+
+
+@traced('clean')
+def clean_leistungsdaten(df):
+    '''
+    cleans raw extract_leistungsdaten tables, which may be the concatenated tables of many clubs and seasons.
+    All columns are converted column-wise.
+    '''
+    df = df.copy()
+    last_names = df['Last Name'].fillna('')
+
+    df['Name'] = clean_player_names(last_names)
+    df['Last Name'] = (last_names.str.replace('.', '', regex=False)
+                                 .str.strip()
+                                 .str.split(' ').str[-1]
+                                 .str.strip())
+    df['Age'] = (df['Age'].str.replace('†', '', regex=False)
+                          .str.replace('-', '25', regex=False)
+                          .astype('int'))
+
+    count_columns = LEISTUNGSDATEN_COLUMNS[5:14]
+    df[count_columns] = df[count_columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int')
+
+    df['PPM'] = (df['PPM'].str.replace(',', '.', regex=False)
+                          .str.replace('-', 'NaN', regex=False)
+                          .astype('float'))
     df['Minutes Played'] = (df['Minutes Played']
-                            .str.replace("'", "")
-                            .str.replace('.', '')
-                            .str.replace('-', '0')
+                            .str.replace("'", "", regex=False)
+                            .str.replace('.', '', regex=False)
+                            .str.replace('-', '0', regex=False)
                             .astype('int'))
     df['Scorer'] = df.Goals + df.Assists
     df['Minutes per Appearance'] = (df['Minutes Played'] / df['Games Played']).fillna(0).astype('int')
+    return df
 
-    if save:
-        if os.path.isdir('Kader-Leistungsdaten') == False:
-            os.makedirs('Kader-Leistungsdaten')
 
-        df.to_csv(f'Kader-Leistungsdaten/{club}_Leistungsdaten_{season}.csv')
-        print(f'Leistungsdaten {club}-{season} - saved to Kader-Leistungsdaten/{club}_Leistungsdaten_{season}.csv')
-    else:   
-        print(f'Leistungsdaten {club}-{season} - retrieved')
-        
+def parse_leistungsdaten(content, club=None, club_id=None):
+    '''
+    parses a team 'Leistungsdaten' page into a DataFrame, see scrape_leistungsdaten
+
+    Parameters:
+    -----------
+    content: the raw page
+    club = None, club_id = None: the club of the page, added to the REGISTRY if given
+    '''
+    df = clean_leistungsdaten(extract_leistungsdaten(content))
+
+    if club_id is not None:
+        REGISTRY.add('club', club_id, club)
+    REGISTRY.add_frame('player', df, 'player_id', 'player_string', 'Name')
+
     return df
 
 
@@ -624,106 +1182,36 @@ def scrape_kaderdaten(club,
                       season,
                       save = False,
                       headers={'User-Agent': 
-           'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
+           'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'},
+                      output='pandas'
                     ):   
     '''
-    scrapes the 'Kaderdaten' containing contract duration etc from Transfermarkt for one team and one season
+    scrapes the 'Kaderdaten' containing contract duration etc from Transfermarkt for one team and one season.
+    The market values of the current season are appended to the market value store MV_STORE, dated today.
     
     Parameters:
     -----------
     club: the transfermarkt club name, ie. borussia-dortmund
     club_id: the transfermarkt club specific id
+    either one may be None if the club is in the REGISTRY
     season: the year the season begins, ie: 2019  
     save = False: whether to save the returned dataframe
     headers: headers for requests.get 
+    output = 'pandas': 'arrow' for a pyarrow Table with the KADER_DTYPES, see to_arrow
     
     Returns:
     -----------
-    a DataFrame with the scraped data
+    a DataFrame with the scraped data, or a pyarrow Table if output is 'arrow'
     '''
-        
-    def clean_df(df):
-        df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-            (df['Last Name'].str.contains(' ', regex=False)), 'Name'] =\
-            (df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-                (df['Last Name'].str.contains(' ', regex=False)), 'Last Name']
-                .apply(lambda x: x.split(' ')[0] + ' ' + x.split(' ')[-1])
-            )
-
-        df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-            (~df['Last Name'].str.contains(' ', regex=False)), 'Name'] =\
-        (df.loc[(~df['Last Name'].str.contains('.', regex=False))&
-            (~df['Last Name'].str.contains(' ', regex=False)), 'Last Name']
-            .str.replace(r"([A-Z])", r" \1")
-            .apply(lambda x: x.split(' ')[-1])
-        )
-
-        df.loc[df['Last Name'].str.contains('.', regex=False), 'Name'] =\
-            df.loc[df['Last Name'].str.contains('.', regex=False), 'Last Name'].apply(lambda x: x.split('.')[0][:-1])
-
-        df['Name'] = df['Name'].str.strip()
-        df['Last Name'] = df['Name'].apply(lambda x: x.split(' ')[-1].strip())
-
-        df['Age'] = df['Date of Birth'].str.replace('†', '').apply(lambda x: x.split('(')[1].split(')')[0])
-
-
-        df['Date of Birth'] = pd.to_datetime(df['Date of Birth'].apply(lambda x: x.split('(')[0].strip()),
-                                                errors = 'coerce', dayfirst=True)
-
-        df['Height'] = (df['Height'].str.replace('k. A.', '')
-                        .apply(lambda x: (x.split('m')[0].strip().replace(',', '.')))
-                        .replace('', np.nan)
-                        .astype('float'))
-
-        df['At Club Since'] = pd.to_datetime(df['At Club Since'].replace('-', np.nan), dayfirst=True, errors = 'coerce')
-        df['Contract Expires'] = pd.to_datetime(df['Contract Expires'].replace('-', np.nan), dayfirst=True, errors = 'coerce')
-        df['Age'] = pd.to_numeric(df['Age'], errors='coerce')
-        df['Shirt Number'] = df['Shirt Number'].replace('-', 0).astype('int')
-        df['Days at Club'] = (datetime.now() - df['At Club Since']).dt.days
-        mvdf = (df['Market Value'].str.split(' ', expand = True))
-        mvdf[0] = mvdf[0].str.replace('-', '0')
-        if mvdf.shape[1] > 1:
-            mvdf[1] = mvdf[1].str.replace('Tsd.', '1000').replace('Mio.', '1000000').astype('float')
-            df['Market Value'] = (mvdf[0].str.replace(',', '.').astype('float') * mvdf[1].fillna(0)).astype('int')
-        return df
-
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+    club, club_id = resolve_club(club, club_id)
     kader_link = f'https://www.transfermarkt.de/{club}/kader/verein/{club_id}/saison_id/{season}/plus/1'
     print('scraping ', kader_link)
 
-    pageTree = requests.get(kader_link, headers=HEADERS)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
-    tables = soup.find_all("div", {"class": "responsive-table"})
-
-    ##### Read the HTML Table into lists
-    data = []
-    table = soup.find_all("div", {"class": "responsive-table"})[0]
-    table_body = table.find('tbody')
-
-    rows = table_body.find_all('tr')
-    for row in rows:
-        cols = row.find_all('td')
-        cols = [element.text for element in cols]
-        try:
-            player_id = row.find_next('span').find_next('a', {'class': "spielprofil_tooltip"})['id']
-            player_string = row.find_next('span').find_next('a', {'class': "spielprofil_tooltip"})['href'].split('/')[1]
-        except:
-            player_id = ''
-            player_string = ''
-        img_link = row.find_next('img', {"class": "bilderrahmen-fixed"})
-        if img_link is not None:
-            img_link = img_link['src'].replace('small', 'big')
-        cols = cols+[img_link]+[player_id, player_string]
-        data.append([element for element in cols if element]) # Get rid of empty values
-
-    kader_columns = ['Shirt Number', 'Name', 'Last Name', 'Position', 'Date of Birth',
-                        'Height', 'Footedness', 'At Club Since', 'Contract Expires', 'Market Value',
-                    'Image Link', 'player_id', 'player_string']
-    df = pd.DataFrame(data[::3])
-    df = (df.iloc[:, :len(kader_columns)].
-            rename(columns = dict(zip(df.iloc[:, :len(kader_columns)], kader_columns))))
-
-    df = clean_df(df)
-            
+    pageTree = fetch(kader_link, headers=HEADERS)
+    df = cached_parse(parse_kaderdaten, pageTree.content, club, club_id)
+    if int(season) >= current_season():
+        MV_STORE.add_squad(df, club=club)
 
     if save:
         if os.path.isdir('Kader-Leistungsdaten') == False:
@@ -732,11 +1220,153 @@ def scrape_kaderdaten(club,
         print(f'Kaderdaten {club}-{season} - saved to Kader-Leistungsdaten/{club}_Kader_{season}.csv')
     else:
         print(f'Kaderdaten {club}-{season} - retrieved')
-        
+
+    if output == 'arrow':
+        return to_arrow(df, KADER_COLUMNS + ['Age', 'Days at Club'], KADER_DTYPES)
     return df
 
 
-def get_player_mv_history(player_id, player_string=None):
+def extract_kaderdaten(content):
+    '''
+    extracts the raw, uncleaned table of a 'Kaderdaten' page, see clean_kaderdaten
+
+    Returns:
+    -----------
+    a DataFrame of strings with KADER_COLUMNS
+    '''
+    df = pd.DataFrame(extract_squad_rows(content, image_link=True))
+    df = df.iloc[:, :len(KADER_COLUMNS)]
+    df.columns = KADER_COLUMNS[:df.shape[1]]
+    return df
+
+
+@traced('clean')
+def clean_kaderdaten(df):
+    '''
+    cleans raw extract_kaderdaten tables, which may be the concatenated tables of many clubs and seasons.
+    All columns are converted column-wise.
+    '''
+    df = df.copy()
+
+    df['Name'] = clean_player_names(df['Last Name'])
+    df['Last Name'] = df['Name'].str.split(' ').str[-1].str.strip()
+
+    date_of_birth = df['Date of Birth'].fillna('').str.replace('†', '', regex=False)
+    df['Age'] = pd.to_numeric(date_of_birth.str.extract(r'\(([^)]*)\)', expand=False), errors='coerce')
+    df['Date of Birth'] = parse_dates(date_of_birth.str.split('(', n=1).str[0], name='Date of Birth')
+
+    df['Height'] = (df['Height'].str.replace('k. A.', '', regex=False)
+                    .str.split('m', n=1).str[0]
+                    .str.strip()
+                    .str.replace(',', '.', regex=False)
+                    .replace('', np.nan)
+                    .astype('float'))
+
+    df['At Club Since'] = parse_dates(df['At Club Since'], name='At Club Since')
+    df['Contract Expires'] = parse_dates(df['Contract Expires'], name='Contract Expires')
+    df['Shirt Number'] = df['Shirt Number'].replace('-', 0).astype('int')
+    df['Days at Club'] = (datetime.now() - df['At Club Since']).dt.days
+    df['Market Value'] = clean_market_vals(df['Market Value'].fillna('-'))
+    return df
+
+
+def parse_kaderdaten(content, club=None, club_id=None):
+    '''
+    parses a 'Kaderdaten' page into a DataFrame, see scrape_kaderdaten
+
+    Parameters:
+    -----------
+    content: the raw page
+    club = None, club_id = None: the club of the page, added to the REGISTRY if given
+    '''
+    df = clean_kaderdaten(extract_kaderdaten(content))
+
+    if club_id is not None:
+        REGISTRY.add('club', club_id, club)
+    REGISTRY.add_frame('player', df, 'player_id', 'player_string', 'Name')
+
+    return df
+
+
+def scrape_squads_many(clubs,
+                       seasons,
+                       kind='kader',
+                       league_abbrev=None,
+                       max_workers=MAX_WORKERS,
+                       output='pandas'):
+    '''
+    scrapes the 'Kaderdaten' or 'Leistungsdaten' of many clubs and seasons at once.
+    All pages are fetched concurrently, the raw tables are concatenated
+    and cleaned in a single pass instead of once per squad.
+
+    Parameters:
+    -----------
+    clubs: a list of [club, club_id] pairs, ie. from get_clubnames_league
+    seasons: a list of years the seasons begin, ie: [2018, 2019]
+    kind = 'kader': 'kader' for scrape_kaderdaten or 'leistungsdaten' for scrape_leistungsdaten
+    league_abbrev = None: only for 'leistungsdaten', see scrape_leistungsdaten
+    max_workers = MAX_WORKERS: number of pages fetched at the same time
+    output = 'pandas': 'arrow' for a pyarrow Table with the KADER_DTYPES or LEISTUNGSDATEN_DTYPES, see to_arrow
+
+    Returns:
+    -----------
+    a DataFrame of all squads with additional club, club_id and season columns,
+    or a pyarrow Table if output is 'arrow'
+    '''
+    assert kind in ['kader', 'leistungsdaten'], "kind must be in ['kader', 'leistungsdaten']"
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+
+    jobs = [[club, club_id, season] for club, club_id in clubs for season in seasons]
+
+    urls = []
+    for club, club_id, season in jobs:
+        if kind == 'kader':
+            urls.append(f'https://www.transfermarkt.de/{club}/kader/verein/{club_id}/saison_id/{season}/plus/1')
+        elif league_abbrev is not None:
+            urls.append(f'https://www.transfermarkt.de/{club}/leistungsdaten/verein/{club_id}/plus/1?reldata={league_abbrev}%26{season}')
+        else:
+            urls.append(f'https://www.transfermarkt.de/{club}/leistungsdaten/verein/{club_id}/reldata/%26{season}/plus/1')
+
+    extract = extract_kaderdaten if kind == 'kader' else extract_leistungsdaten
+    clean = clean_kaderdaten if kind == 'kader' else clean_leistungsdaten
+
+    raws = []
+    for (club, club_id, season), soup in zip(jobs, iter_soups(urls, max_workers=max_workers)):
+        try:
+            raw = extract(soup)
+        except Exception as e:
+            print(f'{kind} {club}-{season} - could not be extracted: {type(e).__name__}: {e}')
+            continue
+        raw['club'] = club
+        raw['club_id'] = club_id
+        raw['season'] = season
+        raws.append(raw)
+
+    if kind == 'kader':
+        columns, dtypes = KADER_COLUMNS + SQUAD_COLUMNS + ['Age', 'Days at Club'], KADER_DTYPES
+    else:
+        columns, dtypes = LEISTUNGSDATEN_COLUMNS + SQUAD_COLUMNS + ['Scorer', 'Minutes per Appearance'], LEISTUNGSDATEN_DTYPES
+
+    if len(raws) == 0:
+        return to_arrow(pd.DataFrame(), columns, dtypes) if output == 'arrow' else pd.DataFrame()
+
+    df = clean(pd.concat(raws, ignore_index=True))
+    if kind == 'kader':
+        MV_STORE.add_squad(df.loc[df['season'].astype('int') >= current_season()])
+
+    REGISTRY.add_many('club', [club_id for _, club_id in clubs], [club for club, _ in clubs])
+    REGISTRY.add_frame('player', df, 'player_id', 'player_string', 'Name')
+
+    if output == 'arrow':
+        return to_arrow(df, columns, dtypes)
+    return df
+
+
+MV_HISTORY_COLUMNS = ['Date', 'Market Value', 'Club', 'Age']
+MV_HISTORY_DTYPES = {'Date': 'datetime', 'Market Value': 'int', 'Age': 'int'}
+
+
+def get_player_mv_history(player_id, player_string=None, output='pandas'):
     """
     get the market value history including:
     date of market value, club and age at the time
@@ -745,22 +1375,36 @@ def get_player_mv_history(player_id, player_string=None):
     Parameters:
     ___________
     int player_id: transfermarkt player specific id
+    str output='pandas': 'arrow' for a pyarrow Table of the MV_HISTORY_COLUMNS, see to_arrow
     
     
     Returns:
     –––––––
     a DataFrame with datetime index and ['Market Value', 'Club', 'Age'] Columns
+    (a pyarrow Table with the dates as a Date column if output is 'arrow'),
+    also appended to the market value store MV_STORE
     """
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
 
     if player_string is None:
-        player_string = 'player'
+        player_string = REGISTRY.get_slug('player', player_id, default='player')
 
     url = f'https://www.transfermarkt.de/{player_string}/marktwertverlauf/spieler/{player_id}'
     
-    pageTree = requests.get(url, headers=HEADERS)
-    
+    pageTree = fetch(url, headers=HEADERS)
+    df = cached_parse(parse_player_mv_history, pageTree.content)
+    MV_STORE.add_history(player_id, df)
+    if output == 'arrow':
+        return to_arrow(df.rename_axis('Date').reset_index(), MV_HISTORY_COLUMNS, MV_HISTORY_DTYPES)
+    return df
+
+
+def parse_player_mv_history(content):
+    '''
+    parses a raw 'Marktwertverlauf' page into a DataFrame, see get_player_mv_history
+    '''
     # we need to decode to get rid of unicode and hexcode character strings like \x20
-    soup = BeautifulSoup(pageTree.content.decode('unicode-escape'), 'html.parser')
+    soup = make_soup(content.decode('unicode-escape'))
     
     # search the page content for the content we need
     result = re.search(r"series(.*?)]}", str(soup))
@@ -792,7 +1436,7 @@ def get_player_mv_history(player_id, player_string=None):
                 list_.append(val)
 
         df = pd.DataFrame(columns, index=column_names).T.set_index('Date')
-        df.index = pd.to_datetime(df.index, dayfirst=True)
+        df.index = parse_dates(df.index, name='market value dates')
 
         df['Club'] = df.Club.str.replace("'", "")
 
@@ -802,29 +1446,48 @@ def get_player_mv_history(player_id, player_string=None):
         return df
 
 
+TRANSFER_COLUMNS = ['Season', 'Date', 'Old_Club', 'New_Club', 'MV', 'Transferfee', 'Leihende', 'Leihe',
+                    'fee_unknown', 'old_club_string', 'old_club_id', 'new_club_string', 'new_club_id']
+TRANSFER_DTYPES = {'MV': 'Int64', 'Transferfee': 'Int64', 'Leihende': 'bool', 'Leihe': 'bool', 'fee_unknown': 'bool'}
+
+
 def get_transfer_history(player_id,
-                         player_string=None):
+                         player_string=None,
+                         output='pandas'):
     """
     Parameters:
     ___________
     
     int player_id: transfermarkt player specific id
     str player_string=None:  transfermarkt player string
+    str output='pandas': 'arrow' for a pyarrow Table of the TRANSFER_COLUMNS, see to_arrow
     
     
     Returns:
     –––––––
     a DataFrame with Columns ['Season', 'Date', 'Old_Club', 'New_Club', 'MV', 'Transferfee',
                                'old_club_string', 'old_club_id', 'new_club_sring', 'new_club_id'] 
-    
+    or a pyarrow Table if output is 'arrow'
     
     """
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
     if player_string is None:
-        player_string = 'player'
+        player_string = REGISTRY.get_slug('player', player_id, default='player')
     
     transfer_history_url = f'https://www.transfermarkt.de/{player_string}/transfers/spieler/{player_id}'
 
-    _, soup = get_page_tree_and_soup(transfer_history_url)
+    pageTree = fetch(transfer_history_url)
+    df = cached_parse(parse_transfer_history, pageTree.content)
+    if output == 'arrow':
+        return to_arrow(df, TRANSFER_COLUMNS, TRANSFER_DTYPES)
+    return df
+
+
+def parse_transfer_history(content):
+    '''
+    parses a 'Transfers' page into a DataFrame, see get_transfer_history
+    '''
+    soup = make_soup(content)
 
     try:
         tbody = soup.find_all('tbody')[0]
@@ -896,37 +1559,87 @@ def get_transfer_history(player_id,
 
         table = pd.concat([table, clubs_df], axis=1)
 
+        REGISTRY.add_frame('club', table, 'old_club_id', 'old_club_string', 'Old_Club')
+        REGISTRY.add_frame('club', table, 'new_club_id', 'new_club_string', 'New_Club')
+
         return table
     
     except:
         return pd.DataFrame()
 
 
+VERLETZUNG_COLUMNS = ['Saison', 'Verletzung', 'von', 'bis', 'Tage', 'Verpasste Spiele']
+VERLETZUNG_DTYPES = {'von': 'datetime', 'bis': 'datetime', 'Tage': 'int', 'Verpasste Spiele': 'int'}
+
+
 def get_spieler_verletzungshistorie(player_id,
-                                    player_string=None):
+                                    player_string=None,
+                                    output='pandas'):
+    '''
+    scrapes the injury history of a player, also appended to the injury index INJURY_INDEX
+
+    Parameters:
+    -----------
+    player_id: transfermarkt player specific id
+    player_string = None: transfermarkt player string
+    output = 'pandas': 'arrow' for a pyarrow Table built directly from the cells, see parse_verletzungshistorie
 
+    Returns:
+    -----------
+    a DataFrame of the VERLETZUNG_COLUMNS, or a pyarrow Table if output is 'arrow'
+    '''
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
     if player_string is None:
-        player_string = 'player'
+        player_string = REGISTRY.get_slug('player', player_id, default='player')
     
     url = f'https://www.transfermarkt.de/{player_string}/verletzungen/spieler/{player_id}'
 
-    pageTree, soup = get_page_tree_and_soup(url)
+    pageTree = fetch(url)
+    if output == 'arrow':
+        table = cached_parse(parse_verletzungshistorie, pageTree.content, output='arrow')
+        INJURY_INDEX.add_history(player_id, table.to_pandas())
+        return table
+
+    df = cached_parse(parse_verletzungshistorie, pageTree.content)
+    INJURY_INDEX.add_history(player_id, df)
+    return df
+
+
+def parse_verletzungshistorie(content, output='pandas'):
+    '''
+    parses a 'Verletzungen' page into a DataFrame, see get_spieler_verletzungshistorie.
+    With output 'arrow' the pyarrow Table is built from the cell texts and cleaned with pyarrow.compute,
+    without a DataFrame in between, a page without injuries is an empty table of the VERLETZUNG_COLUMNS.
+    '''
+    soup = make_soup(content)
 
     theads = soup.find_all('thead')
     tbodies = soup.find_all('tbody')
 
     try:
         columns = get_table_columns(theads[0])
-        table = get_table_from_tbody(tbodies[0], columns=columns)
+        if output == 'arrow':
+            table = extract_table(tbodies[0], columns=columns, strip=False,
+                                  dtypes={'von': 'datetime', 'bis': 'datetime'}, output='arrow')
+            for column, pattern, replacement in [('Tage', ' Tage', ''), ('Verpasste Spiele', '-', '0')]:
+                values = pyarrow.compute.replace_substring(table[column], pattern, replacement)
+                values = pyarrow.compute.utf8_trim_whitespace(values)
+                table = table.set_column(table.schema.get_field_index(column),
+                                         pyarrow.field(column, pyarrow.int64(), nullable=False),
+                                         pyarrow.compute.cast(values, pyarrow.int64()))
+            return table
+
+        table = extract_table(tbodies[0], columns=columns, strip=False,
+                              dtypes={'von': 'datetime', 'bis': 'datetime'})
 
-        table['von'] = pd.to_datetime(table['von'], dayfirst=True)
-        table['bis'] = pd.to_datetime(table['bis'], dayfirst=True)
         table['Tage'] = table['Tage'].str.replace(' Tage', '').astype('int')
         table['Verpasste Spiele'] = table['Verpasste Spiele'].str.replace('-', '0').astype('int')
 
         return table
     
     except:
+        if output == 'arrow':
+            return table_schema(VERLETZUNG_COLUMNS, dtypes=VERLETZUNG_DTYPES).empty_table()
         return pd.DataFrame()
 
 
@@ -952,9 +1665,16 @@ def get_league_table(league_abbrev,
     '''
 
     table_url = f'https://www.transfermarkt.de/superligaen/tabelle/wettbewerb/{league_abbrev}/saison_id/{season}'
-    pageTree = requests.get(table_url, headers=headers)
+    pageTree = fetch(table_url, headers=headers)
+    return cached_parse(parse_league_table, pageTree.content)
+
+
+def parse_league_table(content):
+    '''
+    parses a raw 'Tabelle' page into a DataFrame, see get_league_table
+    '''
 
-    tables = pd.read_html(pageTree.content)
+    tables = pd.read_html(content)
     table = tables[3].drop('Verein', axis=1).rename(columns={'#': 'Rank',
                                                              'Verein.1': 'Club',
                                                              'SpieleS': 'Played',
@@ -965,7 +1685,7 @@ def get_league_table(league_abbrev,
                                                              '+/-': 'GD',
                                                              'Pkt.P': 'Pts'})
     
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    soup = make_soup(content)
     tds = soup.find_all('td', {'class': "zentriert no-border-rechts"})
 
     club_names = [item for td in tds for i, item in enumerate(td.find_next('a', {'class': "vereinprofil_tooltip"})['href'].split('/')) if i in [1]]
@@ -977,8 +1697,11 @@ def get_league_table(league_abbrev,
     table['club_name'] = club_names[:len(table)]
     table['club_id'] = club_ids[:len(table)]
 
+    REGISTRY.add_frame('club', table, 'club_id', 'club_name', 'Club')
+
     return table
 
+
 def get_gameweek_table(league_abbrev,
                        season,
                        gameweek,
@@ -987,7 +1710,9 @@ def get_gameweek_table(league_abbrev,
                    ):
     '''
     
-    scrapes the table from Transfermarkt for one gameweek of one season for a given league
+    scrapes the table from Transfermarkt for one gameweek of one season for a given league.
+    To get the tables of all gameweeks use standings.compute_standings on the scrape_league_games results,
+    which needs a single request per season.
     
     Parameters:
     -----------
@@ -1004,9 +1729,16 @@ def get_gameweek_table(league_abbrev,
     '''
 
     table_url = f'https://www.transfermarkt.de/league-name/spieltagtabelle/wettbewerb/{league_abbrev}?saison_id={season}&spieltag={gameweek}'
-    pageTree = requests.get(table_url, headers=HEADERS)
+    pageTree = fetch(table_url, headers=HEADERS)
+    return cached_parse(parse_gameweek_table, pageTree.content)
+
 
-    tables = pd.read_html(pageTree.content)
+def parse_gameweek_table(content):
+    '''
+    parses a raw 'Spieltagtabelle' page into a DataFrame, see get_gameweek_table
+    '''
+
+    tables = pd.read_html(content)
 
     table = tables[4].drop('Verein', axis=1).rename(columns={'#': 'Rank',
                                                              'Verein.1': 'Club',
@@ -1018,7 +1750,7 @@ def get_gameweek_table(league_abbrev,
                                                              '+/-': 'GD',
                                                              'Pkt.': 'Pts'})
 
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    soup = make_soup(content)
     tds = soup.find_all('td', {'class': "zentriert no-border-rechts"})
 
     table['GF'] = table['Goals'].apply(lambda x: x.split(':')[0]).astype('int')
@@ -1030,8 +1762,11 @@ def get_gameweek_table(league_abbrev,
     table['club_name'] = club_names[:len(table)]
     table['club_id'] = club_ids[:len(table)]
 
+    REGISTRY.add_frame('club', table, 'club_id', 'club_name', 'Club')
+
     return table
 
+
 def scrape_league_games(url,
                         year=None):
     """
@@ -1047,75 +1782,94 @@ def scrape_league_games(url,
     --------
     
     DataFrame:
-    columns: 'Home', 'Result', 'Away', 'Home_Rank', 'Away_Rank', 'Date', 'Spieltag',
-             'Report_Link', 'Home_Link', 'Away_Link', 'Home_Goals', 'Away_Goals'
+    columns: 'Home', 'Result', 'Away', 'Spieltag', 'Report_Link', 'Home_Link', 'Away_Link', 'Date',
+             'Home_Rank', 'Away_Rank', 'Period', 'Home_Goals', 'Away_Goals', 'Home_id', 'Away_id'
+    
+    see scrape_schedules for many seasons at once and live.poll_league_games to follow a running matchday
     
     """
     if year is not None:
         url = "".join([url, f'?saison_id={year}'])
     
-    pageTree, soup = get_page_tree_and_soup(url)
+    pageTree = fetch(url)
+    return cached_parse(parse_league_games, pageTree.content)
+
+
+@traced('clean')
+def clean_fixtures(df):
+    '''
+    the cleaning shared by league and cup schedules, column-wise on the raw strings:
+    splits results into goals and period (ie. n.V. or i.E.), parses the dates,
+    derives the club ids from the links and adds the clubs to the REGISTRY
+    '''
+    result = df['Result'].fillna('').astype('str').str.strip()
+    goals = result.str.extract(r'^(\d+):(\d+)')
+    df['Period'] = result.str.extract(r'^\S+\s+(.+)$', expand=False)
+    df['Result'] = result.str.split(' ', n=1).str[0].replace('', np.nan)
+    df['Home_Goals'] = goals[0].astype('float')
+    df['Away_Goals'] = goals[1].astype('float')
+
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = parse_dates(df['Date'], name='Date')
+
+    for side in ['Home', 'Away']:
+        links = df[f'{side}_Link'].fillna('').astype('str')
+        df[f'{side}_id'] = pd.to_numeric(links.str.extract(r'/verein/(\d+)', expand=False), errors='coerce').astype('Int64')
+        known = df[f'{side}_id'].notna().to_numpy()
+        REGISTRY.add_many('club',
+                          df.loc[known, f'{side}_id'].astype('int'),
+                          links[known].str.split('/').str[1],
+                          df.loc[known, side])
+    return df
+
+
+def parse_league_games(content):
+    '''
+    parses a 'Gesamtspielplan' page into a DataFrame, see scrape_league_games
+    '''
+    soup = make_soup(content)
     tbodies = soup.find_all('tbody')
 
     spieltage = [el.text for el in soup.find_all('div', {'class': 'table-header'})]
 
     gameday_dfs = []
-    team_hrefs = []
-    reports = []
 
     for spieltag, table in zip(spieltage, tbodies[1:]):
         spieltag_team_hrefs = [el['href'] for el in table.find_all('a', {'class': 'vereinprofil_tooltip'})[::2]]
-        #report = table.find('a', {'class': "ergebnis-link"})['href']
         n_spiele = len(spieltag_team_hrefs[::2])
-        reports = np.full(n_spiele, np.nan).astype('<U64')
-        try:
-            reports[:n_spiele] = [el['href'] for el in table.find_all('a', {'class': "ergebnis-link"})]
-        except:
-            pass
-
-        team_hrefs.append(spieltag_team_hrefs)
-
-        table = get_table_from_tbody(table)
+        reports = [el['href'] for el in table.find_all('a', {'class': "ergebnis-link"})]
+        if len(reports) != n_spiele:
+            reports = [np.nan] * n_spiele
 
-        idx = table.dropna().index
-        table = table.loc[idx]
-
-        days = []
-        for idx, row in (table[0]
-                            .replace(r'\n',' ', regex=True)
-                            .replace(r'\t',' ', regex=True)
-                            .str.strip()
-                            .str.split(' ', expand=True)
-                        ).iterrows():
-            current_day = row.loc[row != ''].iloc[1]    
-            days.append(current_day)
-
-        dates = pd.to_datetime(pd.Series(days).fillna(method='ffill'))
+        # columns 0, 2, 3 and 4 and the dropna of incomplete rows rely on the compacted cells
+        table = get_table_from_tbody(table, rid_empty=True)
+        table = table.dropna().reset_index(drop=True)
 
+        days = table[0]
         table = table.loc[:, 2:].rename(columns = {2: 'Home', 3: 'Result', 4: 'Away'})
-        try:
-            table['Away_Rank'] = table['Away'].str.split('(', expand=True).iloc[:, 1].str.replace(')', '')
-            table['Home_Rank'] = table['Home'].str.split(')', expand=True).iloc[:, 0].str.replace('(', '')
-            table['Away'] = table['Away'].str.split('(', expand=True).iloc[:, 0].str.strip()
-            table['Home'] = table['Home'].str.split(')', expand=True).iloc[:, 1].str.strip()
-        except:
-            pass
-        table = table.reset_index(drop=True)
-        table['Date'] = dates
+        table['Day'] = days
         table['Spieltag'] = spieltag
         table['Report_Link'] = reports
+        table['Home_Link'] = spieltag_team_hrefs[0::2]
+        table['Away_Link'] = spieltag_team_hrefs[1::2]
         gameday_dfs.append(table)
 
-    gameday_df = pd.concat(gameday_dfs)
+    gameday_df = pd.concat(gameday_dfs, ignore_index=True)
 
-    home_links, away_links = np.concatenate(team_hrefs).reshape(-1, 2).T
+    # the day is the second word of the first cell, rows of matches played
+    # on the same day as the previous row carry no date
+    gameday_df['Date'] = gameday_df.pop('Day').str.split().str[1]
+    gameday_df['Date'] = parse_dates(gameday_df['Date'], errors='coerce').groupby(gameday_df['Spieltag'], sort=False).ffill()
+
+    if gameday_df['Away'].str.contains('(', regex=False).any():
+        for side in ['Home', 'Away']:
+            gameday_df[f'{side}_Rank'] = pd.to_numeric(gameday_df[side].str.extract(r'\((\d+)\.?\)', expand=False),
+                                                       errors='coerce').astype('Int64')
+        gameday_df['Away'] = gameday_df['Away'].str.split('(', n=1).str[0].str.strip()
+        gameday_df['Home'] = gameday_df['Home'].str.split(')', n=1).str[-1].str.strip()
+
+    return clean_fixtures(gameday_df)
 
-    gameday_df['Home_Link'] = home_links
-    gameday_df['Away_Link'] = away_links
-    
-    gameday_df['Home_Goals'], gameday_df['Away_Goals'] = gameday_df['Result'].str.split(':', expand=True)
-    
-    return gameday_df
 
 def scrape_cup_games(url,
                      year=None):
@@ -1133,128 +1887,297 @@ def scrape_cup_games(url,
     
     DataFrame:
     columns: Round, Date, Home, Away, Result, Home_Link, Away_Link, Report_Link,
-             Period (ie overtime or penalty shootout), Home_Goals, Away_Goals
+             Period (ie overtime or penalty shootout), Home_Goals, Away_Goals, Home_id, Away_id
+    
+    see scrape_schedules for many seasons at once
     
     """
     if year is not None:
         url = "".join([url, f'?saison_id={year}'])
-    pageTree, soup = get_page_tree_and_soup(url)
+    pageTree = fetch(url)
+    return cached_parse(parse_cup_games, pageTree.content)
+
+
+CUP_COLUMNS = ['Round', 'Date', 'Home', 'Away', 'Result', 'Home_Link', 'Away_Link', 'Report_Link']
+
+
+def parse_cup_games(content):
+    '''
+    parses a cup overview page into a DataFrame, see scrape_cup_games
+    '''
+    soup = make_soup(content)
 
     table = soup.find_all('tbody')[1]
 
     entries = table.find_all('tr', {'class': ['rundenzeile', 'begegnungZeile']})
 
-    teams = []
-    team_names = []
-    rounds = []
-    results = []
-    spielberichte = []
-    dates = []
-
+    rows = []
+    current_round = None
+    current_date = None
     for entry in entries:
         if entry['class'] == ['rundenzeile']:
-            current_round = entries[0].find_next('td', {'class': 'zeit ac'}).text
+            current_round = entry.find_next('td', {'class': 'zeit ac'}).text
         elif entry['class'] == ['begegnungZeile']:
-            rounds.append(current_round)
-            team_entries = entry.find_all('a', {'class': "vereinprofil_tooltip"})
-            team_name_entries = entry.find_all('img')
-            for team_entry in team_entries[::2]:
-                teams.append(team_entry['href'])
-            for team_name_entry in team_name_entries:
-                team_names.append(team_name_entry['alt'])
-            try:
-                if "matchresult finished" in str(entry):
-                    result = entry.find_next('span', {'class': "matchresult finished"}).text
-                    results.append(result)
-                else:
-                    results.append(np.nan)
-            except:
-                pass
-            try:
-                if 'Spielbericht' in str(entry):
-                    spielbericht = entry.find_next('a', {'title': 'Spielbericht'})['href']
-                    spielberichte.append(spielbericht)
-                else:
-                    spielberichte.append(np.nan)
-            except:
-                pass
+            team_links = [team_entry['href'] for team_entry in entry.find_all('a', {'class': "vereinprofil_tooltip"})[::2]]
+            team_names = [team_name_entry.get('alt') for team_name_entry in entry.find_all('img')]
+            team_links = (team_links + [None, None])[:2]
+            team_names = (team_names + [None, None])[:2]
 
-            if (entry.find_next('a').text.strip() != '')&(('Datum' in entry.find_next('a')['href'])
-                                                          |('datum' in entry.find_next('a')['href'])):
-                current_date = entry.find_next('a').text.strip()
+            result = entry.find('span', {'class': "matchresult finished"})
+            report = entry.find('a', {'title': 'Spielbericht'})
 
-            dates.append(current_date)
+            date_link = entry.find_next('a')
+            if (date_link is not None) and (date_link.text.strip() != '') and ('datum' in date_link.get('href', '').lower()):
+                current_date = date_link.text.strip()
 
-    df = pd.concat([pd.Series(rounds),
-                pd.Series(dates),
-                pd.DataFrame(np.array(team_names).reshape(-1, 2)),
-                pd.Series(results),
-                pd.DataFrame(np.array(teams).reshape(-1, 2)),
-                pd.Series(spielberichte)], axis=1)
-    df.columns = ['Round', 'Date', 'Home', 'Away', 'Result', 'Home_Link', 'Away_Link', 'Report_Link']
+            rows.append([current_round, current_date] + team_names +
+                        [np.nan if result is None else result.text] + team_links +
+                        [np.nan if report is None else report['href']])
 
-    df['Period'] = df['Result'].str.split(' ', expand=True)[1]
-    df['Result'] = df['Result'].str.split(' ', expand=True)[0]
-    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
+    df = pd.DataFrame(rows, columns=CUP_COLUMNS)
+    return clean_fixtures(df)
 
-    df['Home_Goals'] = df['Result'].str.split(':', expand=True)[0].astype('float')
-    df['Away_Goals'] = df['Result'].str.split(':', expand=True)[1].astype('float')
 
-    return df
+SCHEDULE_URLS = {'league': 'https://www.transfermarkt.de/{name}/gesamtspielplan/wettbewerb/{competition}?saison_id={season}',
+                 'cup': 'https://www.transfermarkt.de/{name}/startseite/pokalwettbewerb/{competition}?saison_id={season}'}
 
 
-def get_player_leistungsdaten(player_id,
-                              player_string=None):
-    
-    def get_detailed_table(soup):    
-        tbodies = soup.find_all('tbody')
-        
-        try:
-            tbody = tbodies[1]
+def scrape_schedules(competition,
+                     seasons,
+                     kind='league',
+                     competition_name=None,
+                     max_workers=MAX_WORKERS):
+    '''
+    scrapes the schedules of many seasons of a league or cup at once, ie. to backfill historical fixtures.
+    All seasons are fetched concurrently and parsed with scrape_league_games or scrape_cup_games.
 
-            table = get_table_from_tbody(tbody, rid_empty=False)
-            columns = ['Season', '', 'Competition', '', 'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals', 
-                       'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals', 'Minutes per Goal', 'Minutes']
-            table.columns = columns
-            table = table.drop('', axis=1)
+    Parameters:
+    -----------
+    competition: the transfermarkt competition abbreviation, ie. L1 or DFB
+    seasons: the years the seasons begin, ie. range(1990, 2020)
+    kind = 'league': 'league' or 'cup'
+    competition_name = None: the transfermarkt competition name, looked up in the REGISTRY if None
+    max_workers = MAX_WORKERS: number of pages fetched at the same time
 
-            for col in table.columns[2:]:
-                table[col] = pd.to_numeric(table[col]
-                                .str.replace('.', '')
-                                .str.replace('-', '0')
-                                .str.replace("'", '')
-                                .str.replace(',', '.'))
+    Returns:
+    -----------
+    a DataFrame of all fixtures with a season column, sorted by season and date
+    '''
+    assert kind in SCHEDULE_URLS, f'kind must be in {sorted(SCHEDULE_URLS)}'
+    if competition_name is None:
+        competition_name = REGISTRY.get_slug('competition', competition, default='wettbewerb')
 
-            competition_strings = [a['href'].split('/')[-3] for a in tbody.find_all('a')][::3]    
-            table.insert(2, 'competition_string', competition_strings)
+    seasons = list(seasons)
+    urls = [SCHEDULE_URLS[kind].format(name=competition_name, competition=competition, season=season)
+            for season in seasons]
+    parse = parse_league_games if kind == 'league' else parse_cup_games
 
-            club_names = [img['alt'] for img in tbody.find_all('img')][1::2]
-            table.insert(3, 'Club', club_names)
+    dfs = []
+    for season, soup in zip(seasons, iter_soups(urls, max_workers=max_workers)):
+        try:
+            df = parse(soup)
+        except Exception as e:
+            print(f'{kind} schedule {competition}-{season} - could not be parsed: {type(e).__name__}: {e}')
+            continue
+        df.insert(0, 'season', season)
+        dfs.append(df)
+
+    if len(dfs) == 0:
+        return pd.DataFrame()
 
-            club_strings = [a['href'].split('/')[-3] for a in tbody.find_all('a')][1::3]
-            table.insert(4, 'club_string', club_strings)
-            
-        except:
-            # when there is no performance history return empty DataFrame
-            table = pd.DataFrame(columns = ['Season', 'Competition', 'competition_string', 'Club', 'club_string',
-                                            'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals', 
-                                            'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals',
-                                            'Minutes per Goal', 'Minutes'])
+    df = pd.concat(dfs, ignore_index=True)
+    df['season'] = df['season'].astype('int')
+    round_column = 'Spieltag' if kind == 'league' else 'Round'
+    df[round_column] = df[round_column].astype('category')
+    return df.sort_values(['season', 'Date'], kind='stable').reset_index(drop=True)
 
-        return table
 
+def get_player_details_url(player_id,
+                           player_string=None,
+                           domain='de'):
+    '''
+    the url of the unfiltered 'Leistungsdatendetails' page of a player.
+    It is shared by get_player_leistungsdaten and scrape_gameinfo_by_pos(detailed=True),
+    so the page only needs to be fetched once for both.
+    '''
     if player_string is None:
-        player_string = 'player'
-        
-    url = f'https://www.transfermarkt.de/{player_string}/leistungsdatendetails/spieler/{player_id}/saison//verein/0/liga/0/wettbewerb//pos/0/trainer_id/0/plus/1'
-    _, soup = get_page_tree_and_soup(url)
-    
-    table = get_detailed_table(soup)
-    table['player_id'] = player_id
+        player_string = REGISTRY.get_slug('player', player_id, default='player')
+    return f'https://www.transfermarkt.{domain}/{player_string}/leistungsdatendetails/spieler/{player_id}/saison//verein/0/liga/0/wettbewerb//pos/0/trainer_id/0/plus/1'
+
+
+PLAYER_LEISTUNGSDATEN_COLUMNS = ['Season', 'Competition', 'competition_string', 'Club', 'club_string',
+                                 'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals',
+                                 'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals',
+                                 'Minutes per Goal', 'Minutes', 'player_id']
+PLAYER_LEISTUNGSDATEN_DTYPES = dict({column: 'Int64' for column in PLAYER_LEISTUNGSDATEN_COLUMNS[5:]},
+                                    PPG='float')
+
+
+def get_player_leistungsdaten(player_id,
+                              player_string=None,
+                              soup=None,
+                              output='pandas'):
+    '''
+    scrapes the detailed performance history of a player by season and competition
+
+    Parameters:
+    -----------
+    player_id: transfermarkt player specific id
+    player_string=None: transfermarkt player string
+    soup=None: the already fetched page (raw or parsed) from get_player_details_url, fetched if None
+    output='pandas': 'arrow' for a pyarrow Table of the PLAYER_LEISTUNGSDATEN_COLUMNS, see to_arrow
+
+    Returns:
+    -----------
+    a DataFrame, or a pyarrow Table if output is 'arrow'
+    '''
+    assert output in TABLE_OUTPUTS, f'output must be in {TABLE_OUTPUTS}'
+    
+    if soup is None:
+        pageTree = fetch(get_player_details_url(player_id, player_string))
+        df = cached_parse(parse_player_leistungsdaten, pageTree.content, player_id)
+    elif isinstance(soup, BeautifulSoup):
+        # an already parsed page has no raw content to key the result cache with
+        df = parse_player_leistungsdaten(soup, player_id)
+    else:
+        df = cached_parse(parse_player_leistungsdaten, soup, player_id)
+    if output == 'arrow':
+        return to_arrow(df, PLAYER_LEISTUNGSDATEN_COLUMNS, PLAYER_LEISTUNGSDATEN_DTYPES)
+    return df
+
+
+def parse_player_leistungsdaten(content, player_id=None):
+    '''
+    parses a player 'Leistungsdatendetails' page into a DataFrame, see get_player_leistungsdaten
+    '''
+    soup = make_soup(content)
+    tbodies = soup.find_all('tbody')
     
+    try:
+        tbody = tbodies[1]
+
+        table = get_table_from_tbody(tbody, rid_empty=False)
+        columns = ['Season', '', 'Competition', '', 'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals', 
+                   'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals', 'Minutes per Goal', 'Minutes']
+        table.columns = columns
+        table = table.drop('', axis=1)
+
+        for col in table.columns[2:]:
+            table[col] = pd.to_numeric(table[col]
+                            .str.replace('.', '')
+                            .str.replace('-', '0')
+                            .str.replace("'", '')
+                            .str.replace(',', '.'))
+
+        competition_strings = [a['href'].split('/')[-3] for a in tbody.find_all('a')][::3]    
+        table.insert(2, 'competition_string', competition_strings)
+
+        club_names = [img['alt'] for img in tbody.find_all('img')][1::2]
+        table.insert(3, 'Club', club_names)
+
+        club_strings = [a['href'].split('/')[-3] for a in tbody.find_all('a')][1::3]
+        table.insert(4, 'club_string', club_strings)
+        
+    except:
+        # when there is no performance history return empty DataFrame
+        table = pd.DataFrame(columns=PLAYER_LEISTUNGSDATEN_COLUMNS[:-1])
+
+    if player_id is not None:
+        table['player_id'] = player_id
+
     return table
 
 
+def parse_national_team_page(soup):
+    '''
+    parses the games of one team of a player's 'Nationalmannschaft' page, see get_national_team_history
+
+    Returns:
+    -----------
+    a DataFrame or None if the page lists no games
+    '''
+    soup = make_soup(soup)
+    tbodies = soup.find_all('tbody')
+
+    debut_table = tbodies[0]
+    game_table = tbodies[-1]
+
+    table = get_table_from_tbody(game_table, rid_empty=False)
+    if len(table) > 1:
+
+        table_rows = game_table.find_all('tr')
+
+        game_report_ids = []
+        team_ids_and_year = []
+        competitions = []
+        game_outcomes = []
+        team_names = []
+
+        for tr in table_rows:
+            try:
+                game_report_ids.append(tr.find('a', {'class': "ergebnis-link"})['id'])
+                team_info = tr.find_all('a', {'class': 'vereinprofil_tooltip'})[:2]
+                for ti in team_info:
+                    team_ids_and_year.append([ti['id'], ti['href'].split('/')[-1]])
+                competitions.append(None)
+
+                outcome = tr.select('span')[-1]['class']
+                if len(outcome) == 0:
+                    outcome = 'D'
+                elif outcome[0] == 'redtext':
+                    outcome = 'L'
+                elif outcome[0] == 'greentext':
+                    outcome = 'W'           
+                game_outcomes.append(outcome)
+                team_names.append(tr.find_next('img')['alt'])
+
+            except:
+
+                try:
+                    game_report_ids.append(None)
+                    team_ids_and_year.append([None, None])
+                    team_ids_and_year.append([None, None])
+                    game_outcomes.append(None)
+                    team_names.append(None)
+                    try:
+                        competitions.append(tr.find_all('a')[-1].text.strip())
+                    except:
+                        competitions.append(None)
+                except:
+                    pass
+
+        table = pd.concat([table, pd.DataFrame(np.array(team_ids_and_year).reshape(-1, 4),
+                                columns=['team_id', 'team_year', 'opponent_id', 'opponent_year'])], axis=1)
+        table['game_id'] = game_report_ids
+        table['competition'] = competitions
+        table['competition'] = table['competition'].ffill()
+        table['game_outcome'] = game_outcomes
+        table['Team'] = team_names
+
+        table.columns = np.concatenate([['', '', 'Date', 'Ground', '', '', 'Opponent', 'Result',
+                                         'Position', 'Goals', 'Assists', 'Yellow', '2ndYellow', 'Red', 'Minutes'],
+                                        table.columns[15:]])
+
+        table = table.loc[pd.notna(table['Opponent'])].iloc[:, 2:]
+
+        table['Goals'] = pd.to_numeric(table['Goals'])
+        table['Assists'] = pd.to_numeric(table['Assists'])
+        table['Yellow'] = pd.to_numeric(table['Yellow'].str.replace("'", ''))
+        table['2ndYellow'] = pd.to_numeric(table['2ndYellow'].str.replace("'", ''))
+        table['Red'] = pd.to_numeric(table['Red'].str.replace("'", ''))
+        table['Minutes'] = pd.to_numeric(table['Minutes'].str.replace("'", ''))
+
+        table = table.drop('', axis=1)
+
+        table = table[['Date', 'Ground', 'Team', 'Opponent', 'Result', 'game_outcome', 'competition', 'game_id',
+                       'team_id', 'team_year', 'opponent_id', 'opponent_year',
+                         'Position', 'Goals', 'Assists', 'Yellow', '2ndYellow', 'Red', 'Minutes'
+                         ]]
+
+        return table
+    return None
+
+
 def get_national_team_history(player_id,
                               player_string=None,
                               domain='de'):
@@ -1279,7 +2202,7 @@ def get_national_team_history(player_id,
     assert domain in ['de', 'com', 'co.uk'], 'Choose a domain of ["de", "com", "co.uk"]'
     
     if player_string is None:
-        player_string = 'player-name'
+        player_string = REGISTRY.get_slug('player', player_id, default='player-name')
     url = f'https://www.transfermarkt.{domain}/{player_string}/nationalmannschaft/spieler/{player_id}'
 
     pageTree, soup = get_page_tree_and_soup(url)
@@ -1300,93 +2223,14 @@ def get_national_team_history(player_id,
         
         selectable_teams = [[opt['value'], opt.text] for opt in year_select.find_all('option')]
 
-        soups = [soup]
-        for team_string, team_name in selectable_teams[1:]:
-            url_comp = f'https://www.transfermarkt.de/{player_string}/nationalmannschaft/spieler/{player_id}/plus/0/verein_id/{team_string}'
-            _, soup_ = get_page_tree_and_soup(url_comp)
-            soups.append(soup_)
-
-        dfs = []
-
-        for soup, (team_string, team_name) in zip(soups[-1::-1], selectable_teams[-1::-1]):
-            tbodies = soup.find_all('tbody')
-
-            debut_table = tbodies[0]
-            game_table = tbodies[-1]
-
-            table = get_table_from_tbody(game_table, rid_empty=False)
-            if len(table) > 1:
-
-                table_rows = game_table.find_all('tr')
-
-                game_report_ids = []
-                team_ids_and_year = []
-                competitions = []
-                game_outcomes = []
-                team_names = []
-
-                for tr in table_rows:
-                    try:
-                        game_report_ids.append(tr.find('a', {'class': "ergebnis-link"})['id'])
-                        team_info = tr.find_all('a', {'class': 'vereinprofil_tooltip'})[:2]
-                        for ti in team_info:
-                            team_ids_and_year.append([ti['id'], ti['href'].split('/')[-1]])
-                        competitions.append(None)
-
-                        outcome = tr.select('span')[-1]['class']
-                        if len(outcome) == 0:
-                            outcome = 'D'
-                        elif outcome[0] == 'redtext':
-                            outcome = 'L'
-                        elif outcome[0] == 'greentext':
-                            outcome = 'W'           
-                        game_outcomes.append(outcome)
-                        team_names.append(tr.find_next('img')['alt'])
-
-                    except:
-
-                        try:
-                            game_report_ids.append(None)
-                            team_ids_and_year.append([None, None])
-                            team_ids_and_year.append([None, None])
-                            game_outcomes.append(None)
-                            team_names.append(None)
-                            try:
-                                competitions.append(tr.find_all('a')[-1].text.strip())
-                            except:
-                                competitions.append(None)
-                        except:
-                            pass
-
-                table = pd.concat([table, pd.DataFrame(np.array(team_ids_and_year).reshape(-1, 4),
-                                        columns=['team_id', 'team_year', 'opponent_id', 'opponent_year'])], axis=1)
-                table['game_id'] = game_report_ids
-                table['competition'] = competitions
-                table['competition'] = table['competition'].fillna(method='ffill')
-                table['game_outcome'] = game_outcomes
-                table['Team'] = team_names
-
-                table.columns = np.concatenate([['', '', 'Date', 'Ground', '', '', 'Opponent', 'Result',
-                                                 'Position', 'Goals', 'Assists', 'Yellow', '2ndYellow', 'Red', 'Minutes'],
-                                                table.columns[15:]])
-
-                table = table.loc[pd.notna(table['Opponent'])].iloc[:, 2:]
-
-                table['Goals'] = pd.to_numeric(table['Goals'])
-                table['Assists'] = pd.to_numeric(table['Assists'])
-                table['Yellow'] = pd.to_numeric(table['Yellow'].str.replace("'", ''))
-                table['2ndYellow'] = pd.to_numeric(table['2ndYellow'].str.replace("'", ''))
-                table['Red'] = pd.to_numeric(table['Red'].str.replace("'", ''))
-                table['Minutes'] = pd.to_numeric(table['Minutes'].str.replace("'", ''))
-
-                table = table.drop('', axis=1)
-
-                table = table[['Date', 'Ground', 'Team', 'Opponent', 'Result', 'game_outcome', 'competition', 'game_id',
-                               'team_id', 'team_year', 'opponent_id', 'opponent_year',
-                                 'Position', 'Goals', 'Assists', 'Yellow', '2ndYellow', 'Red', 'Minutes'
-                                 ]]
-
-                dfs.append(table)
+        # the pages of the other teams are fetched ahead, but parsed and discarded one at a time
+        dfs = [parse_national_team_page(soup)]
+        soup.decompose()
+        urls = [f'https://www.transfermarkt.de/{player_string}/nationalmannschaft/spieler/{player_id}/plus/0/verein_id/{team_string}'
+                for team_string, _ in selectable_teams[1:]]
+        for soup in iter_soups(urls):
+            dfs.append(parse_national_team_page(soup))
+        dfs = [table for table in dfs[::-1] if table is not None]
 
         if len(dfs) == 0:
             return pd.DataFrame()
@@ -1397,19 +2241,69 @@ def get_national_team_history(player_id,
                    (df['Position'] == 'on the bench'), 'Minutes'] = 0
             df = df.reset_index(drop=True)
 
-            if domain == 'de':
-                df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
-            elif domain in ['com', 'co.uk']:
-                df['Date'] = pd.to_datetime(df['Date'], dayfirst=False)
+            df['Date'] = parse_dates(df['Date'], domain=domain, name='Date')
 
         return df
 
 
+def get_detailed_pos_url(player_id,
+                         player_name='player-name',
+                         domain='de',
+                         saison='',
+                         verein='',
+                         liga='',
+                         wettbewerb='',
+                         pos='11',
+                         trainer_id=''):
+    '''
+    the url of the 'Leistungsdatendetails' page of a player filtered by position
+    '''
+    url = f'https://www.transfermarkt.{domain}/{player_name}/leistungsdatendetails/spieler/{player_id}/plus/1?saison={saison}&verein={verein}&liga={liga}&wettbewerb={wettbewerb}&pos={pos}&trainer_id={trainer_id}'
+    return url
+
+
+def get_position_options(soup, domain='de'):
+    '''
+    parses the position select of a 'Leistungsdatendetails' page into a list of [value, position name]
+    '''
+    if domain == 'de':
+        data_placeholder = 'Position auswählen'
+    elif domain in ['com', 'co.uk']:
+        data_placeholder = 'Filter by position'
+
+    pos_select = soup.find('select', {'data-placeholder': data_placeholder})
+    return [[option['value'], option.text] for option in pos_select.find_all('option')[1:]]
+
+
+def get_detailed_pos_table(soup):
+    '''
+    parses a position filtered 'Leistungsdatendetails' page into a DataFrame
+    '''
+    soup = make_soup(soup)
+    tbodies = soup.find_all('tbody')
+
+    table = get_table_from_tbody(tbodies[1], rid_empty=False)
+    columns = ['Season', '', 'Competition', '', 'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals', 
+               'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals', 'Minutes per Goal', 'Minutes']
+    table.columns = columns
+    table = table.drop('', axis=1)
+
+    for col in table.columns[2:]:
+        table[col] = pd.to_numeric(table[col]
+                        .str.replace('.', '')
+                        .str.replace('-', '0')
+                        .str.replace("'", '')
+                        .str.replace(',', '.'))
+    return table
+
+
 def scrape_gameinfo_by_pos(player_id,
                             player_name='player-name',
                             domain='de',
                             year='curr',
-                            detailed=False):
+                            detailed=False,
+                            soup=None,
+                            max_workers=MAX_WORKERS):
     """
     scrape the amount of games played by position for a player_id
     
@@ -1420,6 +2314,9 @@ def scrape_gameinfo_by_pos(player_id,
     domain = 'de'
     year = 'curr', 'curr' for current year or 'all' for all years
     detailed = False; if True get minutes played and additional information by position for all years
+    soup = None: only used if detailed. The already fetched page from get_player_details_url,
+                 ie. to share it with get_player_leistungsdaten
+    max_workers = MAX_WORKERS: number of position pages fetched at the same time if detailed
 
     Returns:
     ----------
@@ -1429,7 +2326,8 @@ def scrape_gameinfo_by_pos(player_id,
     
     def get_games_by_pos(soup):
         tbodies = soup.find_all('tbody')
-        table = get_table_from_tbody(tbodies[-4])
+        # the four columns name the compacted cells
+        table = get_table_from_tbody(tbodies[-4], rid_empty=True)
         table.columns = ['Position', 'Games Played', 'Goals', 'Assists']
 
         for col in table.columns[1:]:
@@ -1437,82 +2335,101 @@ def scrape_gameinfo_by_pos(player_id,
         table.iloc[:, 1:] = table.iloc[:, 1:].astype('int')
         table = table.set_index('Position')
         return table
-
-    
-    def get_detailed_url(player_id,
-                player_name = 'player-name',
-                domain = 'de',
-                saison = '',
-                verein = '',
-                liga = '',
-                wettbewerb = '',
-                pos = '11',
-                trainer_id = ''):
-
-        url = f'https://www.transfermarkt.{domain}/{player_name}/leistungsdatendetails/spieler/{player_id}/plus/1?saison={saison}&verein={verein}&liga={liga}&wettbewerb={wettbewerb}&pos={pos}&trainer_id={trainer_id}'
-        return url
-
-    def get_detailed_table(soup):    
-
-        tbodies = soup.find_all('tbody')
-
-        table = get_table_from_tbody(tbodies[1], rid_empty=False)
-        columns = ['Season', '', 'Competition', '', 'In Squad', 'Games Played', 'PPG', 'Goals', 'Assists', 'Own Goals', 
-                   'Subbed In', 'Subbed Out', 'Yellow', '2nd Yellow', 'Red', 'Penalty Goals', 'Minutes per Goal', 'Minutes']
-        table.columns = columns
-        table = table.drop('', axis=1)
-
-        for col in table.columns[2:]:
-            table[col] = pd.to_numeric(table[col]
-                            .str.replace('.', '')
-                            .str.replace('-', '0')
-                            .str.replace("'", '')
-                            .str.replace(',', '.'))
-        return table
     
     assert year in ['curr', 'all'], 'Choose "curr" or "all" for Parameter year'
     assert isinstance(detailed, bool), 'Parameter detailed must be True of False'
     
-    if domain == 'de':
-        data_placeholder = 'Position auswählen'
-    elif domain in ['com', 'co.uk']:
-        data_placeholder = 'Filter by position'
-    
     if detailed == False:
         if year == 'curr':
             url_current_season = f'https://www.transfermarkt.{domain}/{player_name}/leistungsdaten/spieler/{player_id}'
             _, soup_curr = get_page_tree_and_soup(url_current_season)
             table = get_games_by_pos(soup_curr)
+            soup_curr.decompose()
             
         elif year == 'all':    
             url_all_seasons = f'https://www.transfermarkt.{domain}/{player_name}/leistungsdatendetails/spieler/{player_id}'
             _, soup = get_page_tree_and_soup(url_all_seasons)
             table = get_games_by_pos(soup)
+            soup.decompose()
             
     elif detailed == True:
-        url_detailed = f'https://www.transfermarkt.{domain}/{player_name}/leistungsdatendetails/spieler/{player_id}/saison//verein/0/liga/0/wettbewerb//pos/0/trainer_id/0/plus/1'
-        _, soup_detailed = get_page_tree_and_soup(url_detailed)
-        
-        pos_select = soup_detailed.find('select', {'data-placeholder': data_placeholder})
-        options = [[option['value'], option.text] for option in pos_select.find_all('option')[1:]]
-        
-        tables = []
-        for option in options:
-            url = get_detailed_url(player_id=player_id,
-                                   domain=domain,
-                                   pos=option[0])
-            print(url)
-            _, soup_detailed_pos = get_page_tree_and_soup(url)
-            table = get_detailed_table(soup_detailed_pos)
-            table['Position'] = option[1]
-            tables.append(table)
-
-        table = pd.concat(tables)
+        return scrape_gameinfo_by_pos_many([player_id],
+                                           player_names=[player_name],
+                                           domain=domain,
+                                           soups=None if soup is None else [soup],
+                                           max_workers=max_workers)
         
     table['player_id'] = player_id
     
     return table
 
+
+def scrape_gameinfo_by_pos_many(player_ids,
+                                player_names=None,
+                                domain='de',
+                                soups=None,
+                                leistungsdaten=False,
+                                max_workers=MAX_WORKERS):
+    """
+    scrape the detailed games played by position for many player_ids at once.
+    The unfiltered detail pages of all players are fetched concurrently first,
+    then all position pages of all players are fetched concurrently.
+
+    Parameters:
+    ----------
+    player_ids: a list of transfermarkt specific player ids
+    player_names = None: a list of the player specific transfermarkt player name strings
+    domain = 'de'
+    soups = None: a list of the already fetched pages from get_player_details_url, fetched if None
+    leistungsdaten = False: if True also return get_player_leistungsdaten for all players,
+                            parsed from the same detail pages
+    max_workers = MAX_WORKERS: number of pages fetched at the same time
+
+    Returns:
+    ----------
+    a DataFrame with the position tables of all players,
+    or a tuple of (by position, leistungsdaten) DataFrames if leistungsdaten
+    
+    """
+    player_ids = list(player_ids)
+    if player_names is None:
+        player_names = ['player-name'] * len(player_ids)
+
+    if soups is None:
+        urls = [get_player_details_url(player_id, player_name, domain)
+                for player_id, player_name in zip(player_ids, player_names)]
+        soups = iter_soups(urls, max_workers=max_workers)
+
+    # the detail and position pages are parsed one at a time and discarded once their rows are extracted
+    jobs = []
+    performance = []
+    for player_id, player_name, soup in zip(player_ids, player_names, soups):
+        for value, position in get_position_options(soup, domain):
+            url = get_detailed_pos_url(player_id=player_id,
+                                       player_name=player_name,
+                                       domain=domain,
+                                       pos=value)
+            jobs.append([player_id, position, url])
+        if leistungsdaten:
+            performance.append(get_player_leistungsdaten(player_id, player_name, soup=soup))
+
+    tables = []
+    for (player_id, position, _), soup_pos in zip(jobs, iter_soups([url for _, _, url in jobs], max_workers=max_workers)):
+        table = get_detailed_pos_table(soup_pos)
+        table['Position'] = position
+        table['player_id'] = player_id
+        tables.append(table)
+
+    table = pd.concat(tables) if len(tables) > 0 else pd.DataFrame()
+
+    if leistungsdaten:
+        if len(performance) == 0:
+            return table, pd.DataFrame(columns=PLAYER_LEISTUNGSDATEN_COLUMNS)
+        return table, pd.concat(performance)
+
+    return table
+
+
 def get_team_schedule(team_id,
                        headers = {'User-Agent': 
                'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36'}
@@ -1534,10 +2451,17 @@ def get_team_schedule(team_id,
 
     url = f'https://www.transfermarkt.de/teamname/spielplandatum/verein/{team_id}'
     
-    pageTree = requests.get(url, headers=HEADERS)
-    soup = BeautifulSoup(pageTree.content, 'html.parser')
+    pageTree = fetch(url, headers=HEADERS)
+    return cached_parse(parse_team_schedule, pageTree.content)
+
+
+def parse_team_schedule(content):
+    '''
+    parses a raw 'Spielplan nach Datum' page into a DataFrame, see get_team_schedule
+    '''
+    soup = make_soup(content)
 
-    dfs = pd.read_html(pageTree.content)
+    dfs = pd.read_html(content)
 
     df = dfs[1]
     df['Gegner'] = df['Gegner'].fillna(method='ffill')
@@ -1554,7 +2478,7 @@ def get_team_schedule(team_id,
     df['Day'] = df['Datum'].apply(lambda x: x.split(' ', maxsplit=1)[0])
     df['Datum'] = df['Datum'].apply(lambda x: x.split(' ', maxsplit=1)[1])
 
-    df['Datum'] = pd.to_datetime(df['Datum'])
+    df['Datum'] = parse_dates(df['Datum'], name='Datum')
 
     df = df.rename(columns={'Spieltag': 'Gameweek',
                             'Datum':'Date',
@@ -1575,5 +2499,7 @@ def get_team_schedule(team_id,
 
     df['club_string'] = club_names
     df['club_id'] = club_ids
+
+    REGISTRY.add_frame('club', df, 'club_id', 'club_string', 'Opponent')
     
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,320 @@
+import glob
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.dataset
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+SINK_FORMATS = ['csv', 'parquet', 'jsonl', 'pickle']
+
+
+def to_frame(result):
+    '''
+    converts a scraper result to a DataFrame, ie. the array of get_clubnames_league
+    or the color list of get_club_colors
+    '''
+    if isinstance(result, pd.DataFrame):
+        return result
+    if isinstance(result, pd.Series):
+        return result.to_frame()
+    return pd.DataFrame(np.asarray(result))
+
+
+class DirectorySink(object):
+    '''
+    writes every job result to its own file in a directory
+
+    Parameters:
+    -----------
+    path: output directory, created if it does not exist
+    fmt = 'csv': one of SINK_FORMATS
+    '''
+
+    def __init__(self, path, fmt='csv'):
+        assert fmt in SINK_FORMATS, f'fmt must be in {SINK_FORMATS}'
+        self.path = path
+        self.fmt = fmt
+        if os.path.isdir(path) == False:
+            os.makedirs(path)
+
+    def write(self, name, result):
+        df = to_frame(result)
+        extension = {'pickle': 'pkl'}.get(self.fmt, self.fmt)
+        file = os.path.join(self.path, f'{name}.{extension}')
+
+        if self.fmt == 'csv':
+            df.to_csv(file)
+        elif self.fmt == 'parquet':
+            df.to_parquet(file)
+        elif self.fmt == 'jsonl':
+            df.to_json(file, orient='records', lines=True, date_format='iso', force_ascii=False)
+        elif self.fmt == 'pickle':
+            df.to_pickle(file)
+        return file
+
+    def close(self):
+        pass
+
+
+ROW_GROUP_ROWS = 100000
+MAX_MEMORY_BYTES = 256 * 1024 * 1024
+
+
+def job_table(name):
+    '''
+    the table a job result is written to: the job name up to the first '_', ie. kader for kader_L1_2019_fc-bayern
+    '''
+    return name.split('_')[0]
+
+
+def _arrow_frame(df):
+    # keeps meaningful indexes (ie. the dates of get_player_mv_history) as columns
+    # and writes object columns as strings, so the parts of a table share one schema
+    if not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index()
+    df = df.copy()
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if (df[column].dtype == 'object') or isinstance(df[column].dtype, pd.StringDtype):
+            df[column] = df[column].astype('str').where(df[column].notna(), None)
+    return df
+
+
+def _conform(table, schema):
+    # casts the columns of a part to the types the table was first written with where possible,
+    # ie. the all missing columns of a result without data
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if (field.name in schema.names) and (schema.field(field.name).type != field.type):
+            try:
+                column = pyarrow.compute.cast(column, schema.field(field.name).type)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+                pass
+        columns.append(column)
+    return pyarrow.Table.from_arrays(columns, names=table.column_names)
+
+
+def unify_schemas(schemas):
+    '''
+    the schema of a table from the schemas of its parts. Fields whose types cannot be promoted
+    (ie. int64 in one part and string in another) are read as strings.
+    '''
+    try:
+        return pyarrow.unify_schemas(schemas, promote_options='permissive')
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        types = {}
+        for schema in schemas:
+            for field in schema:
+                types.setdefault(field.name, []).append(field.type)
+        fields = []
+        for name, field_types in types.items():
+            non_null = [field_type for field_type in field_types if not pyarrow.types.is_null(field_type)]
+            try:
+                field_type = pyarrow.unify_schemas([pyarrow.schema([(name, field_type)]) for field_type in non_null],
+                                                   promote_options='permissive').field(name).type
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                field_type = pyarrow.string()
+            fields.append(pyarrow.field(name, field_type if non_null else pyarrow.null()))
+        return pyarrow.schema(fields)
+
+
+class StreamingSink(object):
+    '''
+    streams job results into one Parquet dataset per table with bounded memory,
+    instead of keeping every result until a final pd.concat.
+
+    Results are buffered per table (see job_table) and flushed as a Parquet part file
+    once a table buffers row_group_rows rows, or all tables are flushed once the buffers
+    together exceed max_memory_bytes. The combined tables are read lazily with dataset.
+    Empty results (ie. a player without any games) are not written, the columns of later parts
+    are cast to the types of the first part of their table where possible.
+
+    Parameters:
+    -----------
+    path: output directory with a sub directory of part files per table, created if it does not exist
+    row_group_rows = ROW_GROUP_ROWS: rows per flushed part and Parquet row group
+    max_memory_bytes = MAX_MEMORY_BYTES: memory ceiling of all buffered results
+    table = job_table: a function of the job name returning its table name
+    add_job = True: add the job name as a 'job' column
+    '''
+
+    def __init__(self,
+                 path,
+                 row_group_rows=ROW_GROUP_ROWS,
+                 max_memory_bytes=MAX_MEMORY_BYTES,
+                 table=job_table,
+                 add_job=True):
+        if pyarrow is None:
+            raise ImportError('StreamingSink requires the pyarrow package')
+        self.path = path
+        self.row_group_rows = row_group_rows
+        self.max_memory_bytes = max_memory_bytes
+        self.table = table
+        self.add_job = add_job
+
+        self._buffers = {}
+        self._rows = {}
+        self._bytes = 0
+        self._parts = {}
+        self._schemas = {}
+        # parts of sinks of several workers writing to one directory must not overwrite each other
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+
+        if os.path.isdir(path) == False:
+            os.makedirs(path)
+
+    def write(self, name, result):
+        '''
+        buffers one job result
+
+        Returns:
+        -----------
+        the directory of the table the result is written to
+        '''
+        table = self.table(name)
+        df = to_frame(result)
+        if (len(df) == 0) or (len(df.columns) == 0):
+            return os.path.join(self.path, table)
+        df = _arrow_frame(df)
+        if self.add_job:
+            df['job'] = name
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._buffers.setdefault(table, []).append(df)
+            self._rows[table] = self._rows.get(table, 0) + len(df)
+            self._bytes += size
+
+            if self._rows[table] >= self.row_group_rows:
+                self._flush(table)
+            if self._bytes > self.max_memory_bytes:
+                for buffered in list(self._buffers):
+                    self._flush(buffered)
+        return os.path.join(self.path, table)
+
+    def _flush(self, table):
+        # called with the lock held
+        frames = self._buffers.pop(table, [])
+        self._rows.pop(table, None)
+        if len(frames) == 0:
+            return
+        self._bytes -= sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+        self._bytes = max(self._bytes, 0)
+
+        directory = os.path.join(self.path, table)
+        if os.path.isdir(directory) == False:
+            os.makedirs(directory)
+        if table not in self._parts:
+            files = sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))
+            self._parts[table] = len(files)
+            if len(files) > 0:
+                self._schemas[table] = pyarrow.parquet.read_schema(files[0])
+
+        df = pd.concat(frames, ignore_index=True)
+        file = os.path.join(directory, f'part-{self._parts[table]:06d}-{self._token}.parquet')
+        data = pyarrow.Table.from_pandas(df, preserve_index=False)
+        if table in self._schemas:
+            data = _conform(data, self._schemas[table])
+        else:
+            self._schemas[table] = data.schema
+        pyarrow.parquet.write_table(data, file, row_group_size=self.row_group_rows)
+        self._parts[table] += 1
+
+    def flush(self):
+        with self._lock:
+            for table in list(self._buffers):
+                self._flush(table)
+
+    def close(self):
+        self.flush()
+
+    def tables(self):
+        return sorted(os.path.basename(directory) for directory in glob.glob(os.path.join(self.path, '*'))
+                      if os.path.isdir(directory))
+
+    def dataset(self, table):
+        '''
+        the flushed parts of a table as a lazy pyarrow dataset, see open_dataset
+        '''
+        return open_dataset(os.path.join(self.path, table))
+
+
+def open_dataset(path):
+    '''
+    opens the part files of a StreamingSink table as one lazy pyarrow dataset.
+    Nothing is read until it is scanned, ie. dataset.to_table(columns=[...], filter=...).to_pandas()
+    or dataset.to_batches() to process it in chunks.
+    '''
+    if pyarrow is None:
+        raise ImportError('open_dataset requires the pyarrow package')
+    files = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+    schemas = [pyarrow.parquet.read_schema(file) for file in files]
+    schema = unify_schemas(schemas) if len(schemas) > 0 else None
+    return pyarrow.dataset.dataset(files, schema=schema, format='parquet')
+
+
+def iter_table(path, columns=None):
+    '''
+    reads a StreamingSink table part by part, oldest first, to process tables larger than memory.
+    A job written more than once, ie. run again by a run_worker after its lease expired,
+    keeps only the rows of the part written last.
+
+    Parameters:
+    -----------
+    path: the directory of the table, ie. out/transfers
+    columns = None: the columns to read, defaults to all
+
+    Yields:
+    -----------
+    a DataFrame per part file, parts without rows left are skipped
+    '''
+    dataset = open_dataset(path)
+    has_job = 'job' in dataset.schema.names
+    if (columns is not None) and has_job:
+        columns = list(dict.fromkeys(list(columns) + ['job']))
+    fragments = sorted(dataset.get_fragments(), key=lambda fragment: os.path.getmtime(fragment.path))
+
+    # the part every job was written to last, from a first pass over the job column only
+    last_part = {}
+    if has_job:
+        for i, fragment in enumerate(fragments):
+            jobs = fragment.to_table(schema=dataset.schema, columns=['job']).column('job')
+            for job in pyarrow.compute.unique(jobs).to_pylist():
+                last_part[job] = i
+    latest = {}
+    for job, i in last_part.items():
+        latest.setdefault(i, []).append(job)
+
+    for i, fragment in enumerate(fragments):
+        table = fragment.to_table(schema=dataset.schema, columns=columns)
+        if has_job:
+            jobs = table.column('job')
+            table = table.filter(pyarrow.compute.is_in(jobs, value_set=pyarrow.array(latest.get(i, []), type=jobs.type)))
+        if table.num_rows > 0:
+            yield table.to_pandas()
+
+
+def read_table(path, columns=None):
+    '''
+    reads a StreamingSink table into a DataFrame, see iter_table
+
+    Parameters:
+    -----------
+    path: the directory of the table, ie. out/transfers
+    columns = None: the columns to read, defaults to all
+    '''
+    dfs = list(iter_table(path, columns=columns))
+    if len(dfs) == 0:
+        return open_dataset(path).schema.empty_table().to_pandas()
+    return pd.concat(dfs, ignore_index=True)
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from .scrapers import get_gameweek_table
+
+
+TIE_BREAKERS = ['Pts', 'GD', 'GF', 'H2H']
+TIE_BREAKER_KEYS = ['Pts', 'GD', 'GF', 'GA', 'Wins', 'H2H']
+POINTS = (3, 1, 0)
+
+STANDINGS_COLUMNS = ['gameweek', 'Rank', 'Club', 'club_name', 'club_id', 'Played', 'Wins', 'Draw', 'Losses',
+                     'Goals', 'GF', 'GA', 'GD', 'Pts']
+
+
+def _team_games(games):
+    '''
+    the played games of a scrape_league_games frame, one row per team and game
+    '''
+    gameweek = pd.to_numeric(games['Spieltag'].astype('str').str.extract(r'(\d+)', expand=False), errors='coerce')
+    played = (games['Home_Goals'].notna() & games['Away_Goals'].notna() & gameweek.notna()).to_numpy()
+
+    sides = []
+    for side, other in [('Home', 'Away'), ('Away', 'Home')]:
+        links = games[f'{side}_Link'].fillna('').astype('str') if f'{side}_Link' in games else pd.Series('', index=games.index)
+        sides.append(pd.DataFrame({'gameweek': gameweek.to_numpy(),
+                                   'club_id': games[f'{side}_id'].to_numpy() if f'{side}_id' in games else games[side].to_numpy(),
+                                   'opponent_id': games[f'{other}_id'].to_numpy() if f'{other}_id' in games else games[other].to_numpy(),
+                                   'Club': games[side].to_numpy(),
+                                   'club_name': links.str.split('/').str[1].to_numpy(),
+                                   'GF': games[f'{side}_Goals'].to_numpy(dtype='float'),
+                                   'GA': games[f'{other}_Goals'].to_numpy(dtype='float'),
+                                   'played': played}))
+    return pd.concat(sides, ignore_index=True)
+
+
+def compute_standings(games,
+                      tie_breakers=TIE_BREAKERS,
+                      points=POINTS,
+                      deductions=None):
+    '''
+    computes the table after every gameweek of a season from its results,
+    instead of scraping a 'Spieltagtabelle' page per gameweek with get_gameweek_table
+
+    Parameters:
+    -----------
+    games: the results of one league season, ie. from scrape_league_games or one season of scrape_schedules.
+           Unplayed games (no goals) are skipped.
+    tie_breakers = TIE_BREAKERS: the order of the ranking keys of TIE_BREAKER_KEYS. 'H2H' ranks clubs level
+                   on all previous keys by the points, goal difference and goals of the games between them.
+                   Clubs still level are ordered by name.
+    points = (3, 1, 0): points for a win, draw and loss
+    deductions = None: a dict of club_id: points deducted from the start of the season
+
+    Returns:
+    -----------
+    a DataFrame of every club after every gameweek with STANDINGS_COLUMNS, sorted by gameweek and rank
+    '''
+    for key in tie_breakers:
+        assert key in TIE_BREAKER_KEYS, f'tie_breakers must be in {TIE_BREAKER_KEYS}'
+
+    team_games = _team_games(games)
+    played = team_games.loc[team_games['played']].copy()
+    played['Wins'] = (played['GF'] > played['GA']).astype('int')
+    played['Draw'] = (played['GF'] == played['GA']).astype('int')
+    played['Losses'] = (played['GF'] < played['GA']).astype('int')
+    played['Played'] = 1
+    played['Pts'] = played['Wins'] * points[0] + played['Draw'] * points[1] + played['Losses'] * points[2]
+
+    clubs = (team_games.dropna(subset=['club_id'])
+                       .drop_duplicates(subset=['club_id'], keep='last')
+                       .set_index('club_id')[['Club', 'club_name']])
+    gameweeks = np.arange(1, int(team_games['gameweek'].max()) + 1)
+
+    # one (club x gameweek) matrix per statistic, summed up over the gameweeks
+    stats = ['Played', 'Wins', 'Draw', 'Losses', 'GF', 'GA', 'Pts']
+    grid = pd.MultiIndex.from_product([clubs.index, gameweeks], names=['club_id', 'gameweek'])
+    totals = (played.groupby(['club_id', 'gameweek'])[stats].sum()
+                    .reindex(grid, fill_value=0)
+                    .groupby(level='club_id').cumsum()
+                    .astype('int')
+                    .reset_index())
+
+    if deductions:
+        totals['Pts'] -= totals['club_id'].map(deductions).fillna(0).astype('int')
+    totals['GD'] = totals['GF'] - totals['GA']
+    totals = totals.join(clubs, on='club_id')
+
+    sort_keys = []
+    for key in tie_breakers:
+        if key == 'H2H':
+            totals = _add_head_to_head(totals, played, ['gameweek'] + sort_keys, points)
+            sort_keys += ['H2H_Pts', 'H2H_GD', 'H2H_GF']
+        else:
+            sort_keys.append(key)
+    ascending = [key == 'GA' for key in sort_keys]
+
+    totals = totals.sort_values(['gameweek'] + sort_keys + ['Club'], ascending=[True] + ascending + [True],
+                                kind='stable')
+    totals['Rank'] = totals.groupby('gameweek').cumcount() + 1
+    totals['Goals'] = totals['GF'].astype('str') + ':' + totals['GA'].astype('str')
+
+    return totals[STANDINGS_COLUMNS].reset_index(drop=True)
+
+
+def _add_head_to_head(totals, played, level_keys, points):
+    '''
+    adds the points, goal difference and goals of the games among clubs level on level_keys in a gameweek.
+    The mini tables are only computed for the (rare) groups of level clubs.
+    '''
+    totals = totals.copy()
+    totals['H2H_Pts'] = 0
+    totals['H2H_GD'] = 0
+    totals['H2H_GF'] = 0
+
+    group_sizes = totals.groupby(level_keys)['club_id'].transform('size')
+    level = totals.loc[group_sizes > 1]
+    if len(level) == 0:
+        return totals
+
+    gameweeks = played['gameweek'].to_numpy()
+    for _, group in level.groupby(level_keys):
+        gameweek = group['gameweek'].iloc[0]
+        members = group['club_id'].to_numpy()
+        games = played.loc[(gameweeks <= gameweek) &
+                           played['club_id'].isin(members) &
+                           played['opponent_id'].isin(members)]
+        if len(games) == 0:
+            continue
+        mini = games.groupby('club_id')[['Pts', 'GF', 'GA']].sum()
+        mini = mini.reindex(members, fill_value=0)
+        totals.loc[group.index, 'H2H_Pts'] = mini['Pts'].to_numpy()
+        totals.loc[group.index, 'H2H_GD'] = (mini['GF'] - mini['GA']).to_numpy()
+        totals.loc[group.index, 'H2H_GF'] = mini['GF'].to_numpy()
+    return totals
+
+
+def gameweek_placements(standings, club_id):
+    '''
+    the rank and record of one club after every gameweek, from compute_standings
+    '''
+    return standings.loc[standings['club_id'].astype('str') == str(club_id)].reset_index(drop=True)
+
+
+def validate_standings(standings, tables, columns=('Rank', 'Pts', 'GD', 'GF', 'GA', 'Played')):
+    '''
+    compares computed standings with scraped tables
+
+    Parameters:
+    -----------
+    standings: the output of compute_standings
+    tables: a dict of gameweek: table, ie. from get_gameweek_table
+    columns: the columns compared
+
+    Returns:
+    -----------
+    a DataFrame of all mismatches: gameweek, club_id, column, computed and scraped value. Empty if all agree.
+    '''
+    mismatches = []
+    for gameweek, table in tables.items():
+        computed = standings.loc[standings['gameweek'] == int(gameweek)].copy()
+        computed['club_id'] = computed['club_id'].astype('str')
+        scraped = table.copy()
+        scraped['club_id'] = scraped['club_id'].astype('str')
+        merged = computed.merge(scraped, on='club_id', how='outer', suffixes=('_computed', '_scraped'))
+        for column in columns:
+            a = pd.to_numeric(merged[f'{column}_computed'], errors='coerce')
+            b = pd.to_numeric(merged[f'{column}_scraped'], errors='coerce')
+            differ = (a != b) | a.isna() | b.isna()
+            for i in np.flatnonzero(differ.to_numpy()):
+                mismatches.append([int(gameweek), merged['club_id'].iloc[i], column, a.iloc[i], b.iloc[i]])
+    return pd.DataFrame(mismatches, columns=['gameweek', 'club_id', 'column', 'computed', 'scraped'])
+
+
+def check_standings(standings, league_abbrev, season, gameweeks=None):
+    '''
+    scrapes a few gameweek tables and validates the computed standings against them, see validate_standings
+
+    Parameters:
+    -----------
+    standings: the output of compute_standings for the season
+    league_abbrev: the transfermarkt specific league abbreviation, ie. L1
+    season: the year the season begins, ie: 2019
+    gameweeks = None: the gameweeks to check, defaults to the first, middle and last one
+
+    Returns:
+    -----------
+    a DataFrame of all mismatches, empty if all checked tables agree
+    '''
+    if gameweeks is None:
+        last = int(standings['gameweek'].max())
+        gameweeks = sorted(set([1, (last + 1) // 2, last]))
+    tables = {gameweek: get_gameweek_table(league_abbrev, season, gameweek) for gameweek in gameweeks}
+    return validate_standings(standings, tables)
@@ -0,0 +1,458 @@
+import glob
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .dateparse import DATE_FORMATS, parse_dates
+from .registry import REGISTRY
+from .sinks import iter_table
+
+
+WAREHOUSE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tmscrape', 'warehouse.sqlite')
+
+# dates are stored as ISO strings, parsed from ISO (ie. CSVs written by a DirectorySink) or transfermarkt formats
+_DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d'] + DATE_FORMATS['de']
+
+# every table: its columns as (column, type, source column(s) of the scraper output), the natural key,
+# defaults for key columns the scraper output may not have and the indexes beside the primary key
+WAREHOUSE_TABLES = {
+    'squads': {
+        'columns': [('player_id', 'INTEGER', 'player_id'),
+                    ('club_id', 'INTEGER', 'club_id'),
+                    ('season', 'INTEGER', 'season'),
+                    ('competition', 'TEXT', 'competition'),
+                    ('club', 'TEXT', 'club'),
+                    ('player_string', 'TEXT', 'player_string'),
+                    ('name', 'TEXT', 'Name'),
+                    ('last_name', 'TEXT', 'Last Name'),
+                    ('shirt_number', 'INTEGER', 'Shirt Number'),
+                    ('position', 'TEXT', 'Position'),
+                    ('date_of_birth', 'DATE', 'Date of Birth'),
+                    ('age', 'REAL', 'Age'),
+                    ('height', 'REAL', 'Height'),
+                    ('footedness', 'TEXT', 'Footedness'),
+                    ('at_club_since', 'DATE', 'At Club Since'),
+                    ('contract_expires', 'DATE', 'Contract Expires'),
+                    ('market_value', 'REAL', 'Market Value'),
+                    ('image_link', 'TEXT', 'Image Link')],
+        'key': ['player_id', 'club_id', 'season'],
+        'defaults': {},
+        'indexes': [['club_id', 'season'], ['season', 'competition']]},
+    'performance': {
+        'columns': [('player_id', 'INTEGER', 'player_id'),
+                    ('club_id', 'INTEGER', 'club_id'),
+                    ('season', 'INTEGER', 'season'),
+                    ('competition', 'TEXT', 'competition'),
+                    ('club', 'TEXT', 'club'),
+                    ('player_string', 'TEXT', 'player_string'),
+                    ('name', 'TEXT', 'Name'),
+                    ('position', 'TEXT', 'Position'),
+                    ('age', 'INTEGER', 'Age'),
+                    ('in_squad', 'INTEGER', 'In Squad'),
+                    ('games_played', 'INTEGER', 'Games Played'),
+                    ('goals', 'INTEGER', 'Goals'),
+                    ('assists', 'INTEGER', 'Assists'),
+                    ('yellow', 'INTEGER', 'Yellow'),
+                    ('second_yellow', 'INTEGER', 'Second Yellow'),
+                    ('red', 'INTEGER', 'Red'),
+                    ('substituted_on', 'INTEGER', 'Substituted On'),
+                    ('substituted_off', 'INTEGER', 'Substituted Off'),
+                    ('ppm', 'REAL', 'PPM'),
+                    ('minutes_played', 'INTEGER', 'Minutes Played')],
+        # competition is '' for the performance in all competitions
+        'key': ['player_id', 'club_id', 'season', 'competition'],
+        'defaults': {'competition': ''},
+        'indexes': [['club_id', 'season'], ['season']]},
+    'mv_history': {
+        'columns': [('player_id', 'INTEGER', 'player_id'),
+                    ('date', 'DATE', 'Date'),
+                    ('market_value', 'REAL', 'Market Value'),
+                    ('club', 'TEXT', 'Club'),
+                    ('age', 'INTEGER', 'Age')],
+        'key': ['player_id', 'date'],
+        'defaults': {},
+        'indexes': [['date']]},
+    'transfers': {
+        'columns': [('player_id', 'INTEGER', 'player_id'),
+                    ('season', 'TEXT', 'Season'),
+                    ('date', 'DATE', 'Date'),
+                    ('old_club', 'TEXT', 'Old_Club'),
+                    ('old_club_id', 'INTEGER', 'old_club_id'),
+                    ('old_club_string', 'TEXT', 'old_club_string'),
+                    ('new_club', 'TEXT', 'New_Club'),
+                    ('new_club_id', 'INTEGER', 'new_club_id'),
+                    ('new_club_string', 'TEXT', 'new_club_string'),
+                    ('market_value', 'REAL', 'MV'),
+                    ('fee', 'REAL', 'Transferfee'),
+                    ('loan', 'INTEGER', 'Leihe'),
+                    ('loan_end', 'INTEGER', 'Leihende'),
+                    ('fee_unknown', 'INTEGER', 'fee_unknown')],
+        'key': ['player_id', 'date', 'old_club_id', 'new_club_id'],
+        'defaults': {},
+        'indexes': [['old_club_id', 'date'], ['new_club_id', 'date'], ['season']]},
+    'injuries': {
+        'columns': [('player_id', 'INTEGER', 'player_id'),
+                    ('von', 'DATE', 'von'),
+                    ('bis', 'DATE', 'bis'),
+                    ('injury', 'TEXT', 'Verletzung'),
+                    ('season', 'TEXT', 'Saison'),
+                    ('days', 'INTEGER', 'Tage'),
+                    ('missed_games', 'INTEGER', 'Verpasste Spiele')],
+        'key': ['player_id', 'von', 'injury'],
+        'defaults': {'injury': ''},
+        'indexes': [['von']]},
+    'fixtures': {
+        'columns': [('competition', 'TEXT', 'competition'),
+                    ('season', 'INTEGER', 'season'),
+                    ('round', 'TEXT', ['Spieltag', 'Round']),
+                    ('date', 'DATE', 'Date'),
+                    ('home', 'TEXT', 'Home'),
+                    ('away', 'TEXT', 'Away'),
+                    ('home_id', 'INTEGER', 'Home_id'),
+                    ('away_id', 'INTEGER', 'Away_id'),
+                    ('home_rank', 'INTEGER', 'Home_Rank'),
+                    ('away_rank', 'INTEGER', 'Away_Rank'),
+                    ('result', 'TEXT', 'Result'),
+                    ('period', 'TEXT', 'Period'),
+                    ('home_goals', 'INTEGER', 'Home_Goals'),
+                    ('away_goals', 'INTEGER', 'Away_Goals'),
+                    ('report_link', 'TEXT', 'Report_Link')],
+        'key': ['competition', 'season', 'round', 'home_id', 'away_id'],
+        'defaults': {'round': ''},
+        'indexes': [['home_id', 'season'], ['away_id', 'season'], ['season', 'date']]},
+    'standings': {
+        'columns': [('competition', 'TEXT', 'competition'),
+                    ('season', 'INTEGER', 'season'),
+                    ('gameweek', 'INTEGER', 'gameweek'),
+                    ('club_id', 'INTEGER', 'club_id'),
+                    ('club', 'TEXT', 'Club'),
+                    ('club_string', 'TEXT', 'club_name'),
+                    ('rank', 'INTEGER', 'Rank'),
+                    ('played', 'INTEGER', 'Played'),
+                    ('wins', 'INTEGER', 'Wins'),
+                    ('draw', 'INTEGER', 'Draw'),
+                    ('losses', 'INTEGER', 'Losses'),
+                    ('gf', 'INTEGER', 'GF'),
+                    ('ga', 'INTEGER', 'GA'),
+                    ('gd', 'INTEGER', 'GD'),
+                    ('pts', 'INTEGER', 'Pts')],
+        # gameweek is 0 for a league table as scraped by get_league_table
+        'key': ['competition', 'season', 'gameweek', 'club_id'],
+        'defaults': {'gameweek': 0},
+        'indexes': [['club_id', 'season'], ['season']]},
+}
+
+# the tables of batch job results by the job name up to the first '_', see sinks.job_table
+JOB_TABLES = {'kader': 'squads',
+              'leistungsdaten': 'performance',
+              'mv': 'mv_history',
+              'transfers': 'transfers',
+              'injuries': 'injuries',
+              'schedule': 'fixtures'}
+
+# the clubs of every competition and season, from any table that knows them
+_LEAGUE_CLUBS = '''league_clubs AS (
+    SELECT competition, season, club_id FROM standings
+    UNION SELECT competition, season, home_id FROM fixtures
+    UNION SELECT competition, season, away_id FROM fixtures
+    UNION SELECT competition, season, club_id FROM performance WHERE competition != ''
+    UNION SELECT competition, season, club_id FROM squads WHERE competition IS NOT NULL)'''
+
+_SQUAD_VALUES = f'''WITH {_LEAGUE_CLUBS},
+squad_values AS (
+    SELECT l.competition, l.season, s.club_id, MAX(s.club) AS club, COUNT(*) AS players,
+           COUNT(s.market_value) AS valued_players, SUM(s.market_value) AS squad_value,
+           AVG(s.market_value) AS average_value
+    FROM league_clubs l JOIN squads s ON s.club_id = l.club_id AND s.season = l.season
+    WHERE (:competition IS NULL OR l.competition = :competition) AND (:season IS NULL OR l.season = :season)
+    GROUP BY l.competition, l.season, s.club_id)'''
+
+QUERIES = {
+    'squad_values': _SQUAD_VALUES + '''
+        SELECT * FROM squad_values ORDER BY competition, season, squad_value DESC''',
+    'league_values': _SQUAD_VALUES + '''
+        SELECT competition, season, COUNT(*) AS clubs, SUM(players) AS players, SUM(squad_value) AS league_value,
+               AVG(squad_value) AS average_squad_value, MAX(squad_value) AS max_squad_value
+        FROM squad_values GROUP BY competition, season ORDER BY competition, season''',
+    'player_seasons': '''
+        SELECT p.*, s.market_value, s.contract_expires
+        FROM performance p LEFT JOIN squads s
+             ON s.player_id = p.player_id AND s.club_id = p.club_id AND s.season = p.season
+        WHERE p.player_id = :player_id ORDER BY p.season, p.competition''',
+    'injured_players': '''
+        SELECT s.club_id, s.club, i.player_id, s.name, i.injury, i.von, i.bis
+        FROM injuries i JOIN squads s ON s.player_id = i.player_id AND s.season = :season
+        WHERE i.von <= :date AND (i.bis IS NULL OR i.bis >= :date)
+              AND (:club_id IS NULL OR s.club_id = :club_id)
+        ORDER BY s.club_id, i.player_id''',
+    'top_transfers': '''
+        SELECT * FROM transfers
+        WHERE (:season IS NULL OR season = :season) AND (:club_id IS NULL OR new_club_id = :club_id)
+        ORDER BY fee DESC LIMIT COALESCE(:n, 20)''',
+    'latest_market_values': '''
+        SELECT m.player_id, m.date, m.market_value, m.club
+        FROM mv_history m
+        WHERE m.date = (SELECT MAX(date) FROM mv_history WHERE player_id = m.player_id)
+              AND (:player_id IS NULL OR m.player_id = :player_id)
+        ORDER BY m.market_value DESC''',
+    'club_fixtures': '''
+        SELECT * FROM fixtures
+        WHERE (home_id = :club_id OR away_id = :club_id) AND (:season IS NULL OR season = :season)
+        ORDER BY date''',
+}
+
+
+def _sql_values(series, sql_type):
+    # converts a column to python values sqlite3 can bind, None for missing values
+    if sql_type == 'DATE':
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            series = parse_dates(series, formats=_DATE_FORMATS, errors='coerce')
+        dates = pd.Series(series).dt.strftime('%Y-%m-%d')
+        return [None if pd.isna(date) else date for date in dates]
+    if sql_type in ['INTEGER', 'REAL']:
+        if series.dtype == 'object':
+            series = series.replace({'True': 1, 'False': 0, True: 1, False: 0})
+        numbers = pd.to_numeric(series, errors='coerce').astype('float')
+        cast = int if sql_type == 'INTEGER' else float
+        return [None if np.isnan(number) else cast(number) for number in numbers]
+    return [None if pd.isna(value) else str(value) for value in series]
+
+
+def _source(df, source):
+    for column in ([source] if isinstance(source, str) else source):
+        if column in df:
+            return df[column]
+    return None
+
+
+def job_values(name):
+    '''
+    the values a batch job name implies for the rows of its result, ie. the player_id of mv_12345
+    or the competition, season and club of kader_L1_2019_borussia-dortmund (see batch.league_jobs)
+    '''
+    parts = name.split('_')
+    kind = parts[0]
+    if kind in ['mv', 'transfers', 'injuries']:
+        return {'player_id': parts[-1]}
+    if kind in ['kader', 'leistungsdaten']:
+        # reparsed squads have no league, ie. kader__2019_borussia-dortmund
+        values = {'competition': parts[1] or None}
+        if len(parts) > 2:
+            values['season'] = parts[2]
+        if len(parts) > 3:
+            club = '_'.join(parts[3:])
+            values['club'] = club
+            values['club_id'] = REGISTRY.get_id('club', club)
+        if kind == 'leistungsdaten':
+            # league_jobs only name the league, the performance may be in all competitions
+            values.pop('competition')
+        return values
+    if kind == 'schedule':
+        return {'competition': parts[1]}
+    return {}
+
+
+class Warehouse(object):
+    '''
+    an embedded SQLite database of scraped data for queries without loading CSVs into pandas or re-scraping:
+    squads, performance, mv_history, transfers, injuries, fixtures and standings (see WAREHOUSE_TABLES).
+
+    Rows are upserted on the natural key of their table, ie. (player_id, club_id, season) for squads,
+    so reloading a crawl updates the rows instead of duplicating them. Every table is indexed on its
+    player_id, club_id and season columns, and QUERIES holds canned queries, ie.
+
+    warehouse = Warehouse('crawl.sqlite')
+    warehouse.load_directory('out')
+    warehouse.query('squad_values', competition='L1', season=2019)
+
+    Parameters:
+    -----------
+    path = WAREHOUSE_PATH: the SQLite database file, created if it does not exist
+    '''
+
+    def __init__(self, path=WAREHOUSE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and (os.path.isdir(directory) == False):
+            os.makedirs(directory)
+
+        with self._connect() as con:
+            for table, spec in WAREHOUSE_TABLES.items():
+                columns = ', '.join(f'{column} {sql_type}' for column, sql_type, _ in spec['columns'])
+                con.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({", ".join(spec["key"])}))')
+                for index in spec['indexes']:
+                    con.execute(f'CREATE INDEX IF NOT EXISTS {table}_{"_".join(index)} ON {table} ({", ".join(index)})')
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def add(self, table, df, **values):
+        '''
+        upserts a scraper result into a table. Only the columns the result has are updated and missing values
+        (NaN, None) do not overwrite stored ones, so a partial result (ie. a market value without age)
+        keeps the other columns of existing rows. Rows missing a key column are skipped.
+
+        Parameters:
+        -----------
+        table: a key of WAREHOUSE_TABLES
+        df: the scraper result, ie. from scrape_squads_many for squads or compute_standings for standings
+        values: constants for columns the result does not have, ie. season=2019 for scrape_kaderdaten
+
+        Returns:
+        -----------
+        the number of rows written
+        '''
+        assert table in WAREHOUSE_TABLES, f'table must be in {sorted(WAREHOUSE_TABLES)}'
+        spec = WAREHOUSE_TABLES[table]
+        if len(df) == 0:
+            return 0
+        # keeps meaningful indexes, ie. the dates of get_player_mv_history, as columns
+        if not isinstance(df.index, pd.RangeIndex):
+            df = df.reset_index()
+
+        names = []
+        columns = []
+        for column, sql_type, source in spec['columns']:
+            series = _source(df, source)
+            if series is None:
+                if values.get(column) is not None:
+                    series = pd.Series([values[column]] * len(df), index=df.index)
+                elif column in spec['defaults']:
+                    series = pd.Series([spec['defaults'][column]] * len(df), index=df.index)
+                elif column in spec['key']:
+                    series = pd.Series([None] * len(df), index=df.index, dtype='object')
+                else:
+                    continue
+            names.append(column)
+            columns.append(_sql_values(series, sql_type))
+
+        keys = [names.index(column) for column in spec['key']]
+        rows = [row for row in zip(*columns) if all(row[i] is not None for i in keys)]
+        if len(rows) < len(df):
+            print(f'warehouse {table} - {len(df) - len(rows)} rows without {spec["key"]} skipped')
+        if len(rows) == 0:
+            return 0
+
+        updates = [column for column in names if column not in spec['key']]
+        sql = (f'INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" * len(names))}) '
+               f'ON CONFLICT ({", ".join(spec["key"])}) DO ')
+        if len(updates) > 0:
+            sql += 'UPDATE SET ' + ', '.join(f'{column} = COALESCE(excluded.{column}, {column})' for column in updates)
+        else:
+            sql += 'NOTHING'
+
+        with self._lock:
+            with self._connect() as con:
+                con.executemany(sql, rows)
+        return len(rows)
+
+    def add_job(self, name, result):
+        '''
+        upserts a batch job result into the table of its job name (see JOB_TABLES and job_values),
+        ie. as the write method of a sink for run_jobs. Results of other jobs are ignored.
+
+        Returns:
+        -----------
+        the number of rows written
+        '''
+        table = JOB_TABLES.get(name.split('_')[0])
+        if (table is None) or (not isinstance(result, pd.DataFrame)):
+            return 0
+        if 'job' in result:
+            result = result.drop(columns='job')
+        return self.add(table, result, **job_values(name))
+
+    def write(self, name, result):
+        self.add_job(name, result)
+
+    def close(self):
+        pass
+
+    def load_directory(self, path):
+        '''
+        loads the job results a DirectorySink wrote to path. The results of per club jobs
+        (ie. kader_L1_2019_borussia-dortmund) have no club_id column, it is looked up in the REGISTRY,
+        so load the registry snapshot of the crawl first.
+
+        Returns:
+        -----------
+        a dict of the rows written per table
+        '''
+        counts = {}
+        for file in sorted(glob.glob(os.path.join(path, '*.*'))):
+            name, extension = os.path.splitext(os.path.basename(file))
+            table = JOB_TABLES.get(name.split('_')[0])
+            if table is None:
+                continue
+            if extension == '.csv':
+                df = pd.read_csv(file, index_col=0)
+            elif extension == '.parquet':
+                df = pd.read_parquet(file)
+            elif extension == '.jsonl':
+                df = pd.read_json(file, orient='records', lines=True)
+            elif extension == '.pkl':
+                df = pd.read_pickle(file)
+            else:
+                continue
+            counts[table] = counts.get(table, 0) + self.add_job(name, df)
+        return counts
+
+    def load_dataset(self, path):
+        '''
+        loads the job results of a StreamingSink table, ie. out/kader, split by their job column.
+        The table is read and upserted one part at a time, see sinks.iter_table.
+
+        Returns:
+        -----------
+        the number of rows written
+        '''
+        n = 0
+        for df in iter_table(path):
+            n += sum(self.add_job(name, group.reset_index(drop=True)) for name, group in df.groupby('job', sort=False))
+        return n
+
+    def sql(self, query, params=None):
+        '''
+        runs an SQL query and returns the result as a DataFrame
+        '''
+        with self._connect() as con:
+            return pd.read_sql_query(query, con, params=params)
+
+    def query(self, name, **params):
+        '''
+        runs a canned query of QUERIES, parameters it takes that are not given are None (no filter), ie.
+
+        warehouse.query('squad_values', season=2019)
+        warehouse.query('injured_players', date='2019-11-09', season=2019, club_id=27)
+        '''
+        assert name in QUERIES, f'name must be in {sorted(QUERIES)}'
+        query = QUERIES[name]
+        for key, value in params.items():
+            if isinstance(value, (pd.Timestamp, np.datetime64)) or hasattr(value, 'strftime'):
+                params[key] = pd.Timestamp(value).strftime('%Y-%m-%d')
+            elif isinstance(value, np.integer):
+                params[key] = int(value)
+        params = {key: params.get(key) for key in dict.fromkeys(re.findall(r':(\w+)', query))}
+        return self.sql(query, params)
+
+    def count(self, table=None):
+        '''
+        the number of rows of a table, or of every table as a dict
+        '''
+        with self._connect() as con:
+            if table is not None:
+                assert table in WAREHOUSE_TABLES, f'table must be in {sorted(WAREHOUSE_TABLES)}'
+                return con.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            return {table: con.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in WAREHOUSE_TABLES}
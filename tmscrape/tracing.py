@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+
+MAX_EVENTS = 1000000
+
+_tracer = {'tracer': None, 'last': None}
+
+
+class Tracer(object):
+    '''
+    collects timed spans of scraper calls, ie. fetch, wait_for_rate_limit, request, parse, extract and clean,
+    with their attributes (url, bytes, ...) and the stack of spans they were opened in.
+
+    Spans are recorded per thread. Work handed to other threads, ie. the fetches of get_page_trees_and_soups,
+    is attributed to the span it was started from with carry. Carried spans appear under the stack of that span,
+    but as they run concurrently their time is not subtracted from its self time, which stays its own wall time
+    less the child spans of its own thread.
+
+    Parameters:
+    -----------
+    max_events = MAX_EVENTS: spans beyond this many are counted in dropped but not kept
+    '''
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, cat='stage', **attrs):
+        stack = self.stack()
+        frame = {'name': name, 'child': 0.0, 'carried': False}
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                if stack and (stack[-1]['carried'] == False):
+                    stack[-1]['child'] += duration
+                if len(self.events) < self.max_events:
+                    self.events.append({'name': name,
+                                        'cat': cat,
+                                        'start': start - self.start,
+                                        'duration': duration,
+                                        'self_time': max(duration - frame['child'], 0.0),
+                                        'thread': threading.get_ident(),
+                                        'stack': tuple(f['name'] for f in stack) + (name,),
+                                        'attrs': attrs})
+                else:
+                    self.dropped += 1
+
+    def to_frame(self):
+        '''
+        all spans as a DataFrame with name, cat, start and duration in seconds since the tracer started,
+        self_time (without child spans in the same thread), thread, stack and one column per attribute
+        '''
+        with self._lock:
+            events = list(self.events)
+        df = pd.DataFrame([{key: value for key, value in event.items() if key != 'attrs'} for event in events],
+                          columns=['name', 'cat', 'start', 'duration', 'self_time', 'thread', 'stack'])
+        attrs = pd.DataFrame([event['attrs'] for event in events], index=df.index)
+        df['stack'] = df['stack'].map(';'.join)
+        return pd.concat([df, attrs], axis=1)
+
+    def summary(self):
+        '''
+        the number of spans, total and self time in seconds and the bytes per span name, slowest first
+        '''
+        df = self.to_frame()
+        if 'bytes' not in df:
+            df['bytes'] = 0
+        return (df.groupby('name')
+                  .agg(calls=('duration', 'size'), total=('duration', 'sum'), self_time=('self_time', 'sum'),
+                       bytes=('bytes', 'sum'))
+                  .sort_values('self_time', ascending=False))
+
+    def save_chrome_trace(self, path):
+        '''
+        writes the spans as a Chrome trace (chrome://tracing, Perfetto or speedscope)
+        '''
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = [{'name': event['name'],
+                  'cat': event['cat'],
+                  'ph': 'X',
+                  'ts': event['start'] * 1e6,
+                  'dur': event['duration'] * 1e6,
+                  'pid': pid,
+                  'tid': event['thread'],
+                  'args': event['attrs']} for event in events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def save_collapsed(self, path):
+        '''
+        writes the self time of every span stack in microseconds in the collapsed stack format
+        of flamegraph.pl and speedscope, ie. scrape_kaderdaten;fetch;request 120000
+        '''
+        totals = defaultdict(float)
+        with self._lock:
+            for event in self.events:
+                totals[';'.join(event['stack'])] += event['self_time']
+        with open(path, 'w') as f:
+            for stack, seconds in sorted(totals.items()):
+                f.write(f'{stack} {int(round(seconds * 1e6))}\n')
+
+
+def start_tracing(max_events=MAX_EVENTS):
+    '''
+    starts recording spans of all scraper calls, see Tracer
+    '''
+    if _tracer['tracer'] is None:
+        _tracer['tracer'] = Tracer(max_events=max_events)
+    return _tracer['tracer']
+
+
+def stop_tracing():
+    '''
+    stops recording spans
+
+    Returns:
+    -----------
+    the Tracer with the recorded spans, or None if tracing was not started
+    '''
+    tracer = _tracer['tracer']
+    _tracer['tracer'] = None
+    if tracer is not None:
+        _tracer['last'] = tracer
+    return tracer
+
+
+def get_tracer():
+    '''
+    the active Tracer, or the one of the last traced run, ie. after run_jobs(profile=True)
+    '''
+    return _tracer['tracer'] or _tracer['last']
+
+
+@contextmanager
+def tracing(max_events=MAX_EVENTS):
+    '''
+    context manager around start_tracing / stop_tracing, ie.
+
+    with tracing() as tracer:
+        scrape_kaderdaten('borussia-dortmund', 16, 2019)
+    tracer.save_chrome_trace('kader.json')
+    '''
+    already_started = _tracer['tracer'] is not None
+    tracer = start_tracing(max_events=max_events)
+    try:
+        yield tracer
+    finally:
+        if not already_started:
+            stop_tracing()
+
+
+@contextmanager
+def span(name, cat='stage', **attrs):
+    '''
+    times the enclosed block as a span of the active tracer, a no-op if tracing is off.
+    Yields the attribute dict, so attributes known at the end (ie. response sizes) can be added.
+    '''
+    tracer = _tracer['tracer']
+    if tracer is None:
+        yield attrs
+        return
+    with tracer.span(name, cat=cat, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def traced(name, cat='stage'):
+    '''
+    decorator recording every call of a function as a span name
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer['tracer'] is None:
+                return func(*args, **kwargs)
+            with span(name, cat=cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def carry(func):
+    '''
+    wraps func to run under the spans open in the calling thread, for work handed to a thread pool.
+    The worker gets copies of their frames, so the concurrent spans it records do not count as child time
+    of the calling thread's spans.
+    '''
+    tracer = _tracer['tracer']
+    if tracer is None:
+        return func
+    parents = [{'name': frame['name'], 'child': 0.0, 'carried': True} for frame in tracer.stack()]
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = tracer.stack()
+        outer = stack[:]
+        stack[:] = [dict(frame) for frame in parents]
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack[:] = outer
+    return wrapper
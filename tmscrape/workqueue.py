@@ -0,0 +1,333 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import batch
+from . import scrapers
+from .tracing import tracing
+
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+def job_to_spec(job):
+    '''
+    converts a batch.make_job dict into a json serializable spec, referencing the scraper by name
+    '''
+    return {'name': job['name'], 'scraper': job['func'].__name__, 'kwargs': job['kwargs']}
+
+
+def spec_to_job(spec):
+    '''
+    converts a job spec back into a batch.make_job dict
+    '''
+    func = getattr(batch, spec['scraper'], None) or getattr(scrapers, spec['scraper'])
+    return batch.make_job(spec['name'], func, **spec['kwargs'])
+
+
+class MemoryQueue(object):
+    '''
+    an in-process work queue with the same lease semantics as SQLiteQueue,
+    as a local stand-in for tests and single host runs
+
+    Parameters:
+    -----------
+    lease_seconds = LEASE_SECONDS: how long a leased job may run without a heartbeat
+                                   before it is handed to another worker
+    max_attempts = MAX_ATTEMPTS: leases per job before it is marked failed
+    '''
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, specs):
+        '''
+        enqueues job specs. Jobs whose name is already queued are ignored, so enqueuing is idempotent.
+
+        Returns:
+        -----------
+        the number of new jobs
+        '''
+        n = 0
+        with self._lock:
+            for spec in specs:
+                if spec['name'] not in self._jobs:
+                    self._jobs[spec['name']] = {'spec': spec, 'status': 'pending', 'worker': None,
+                                                'lease_until': 0.0, 'attempts': 0, 'error': None, 'result': None}
+                    n += 1
+        return n
+
+    def lease(self, worker_id, n=1):
+        '''
+        leases up to n pending jobs or jobs whose lease expired
+
+        Returns:
+        -----------
+        a list of job specs
+        '''
+        now = time.time()
+        leased = []
+        with self._lock:
+            for job in self._jobs.values():
+                if len(leased) == n:
+                    break
+                expired = (job['status'] == 'leased') and (job['lease_until'] < now)
+                if (job['status'] == 'pending') or expired:
+                    if job['attempts'] >= self.max_attempts:
+                        job['status'] = 'failed'
+                        job['error'] = job['error'] or 'lease expired'
+                        continue
+                    job.update(status='leased', worker=worker_id, lease_until=now + self.lease_seconds,
+                               attempts=job['attempts'] + 1)
+                    leased.append(job['spec'])
+        return leased
+
+    def heartbeat(self, worker_id, names):
+        '''
+        extends the leases worker_id holds on the jobs names
+        '''
+        with self._lock:
+            for name in names:
+                job = self._jobs[name]
+                if (job['status'] == 'leased') and (job['worker'] == worker_id):
+                    job['lease_until'] = time.time() + self.lease_seconds
+
+    def complete(self, worker_id, name, result=None):
+        '''
+        marks a job done. The first reported result wins, later reports of the same job are ignored.
+        '''
+        with self._lock:
+            job = self._jobs[name]
+            if job['status'] != 'done':
+                job.update(status='done', worker=worker_id, result=result, error=None)
+
+    def fail(self, worker_id, name, error):
+        '''
+        releases a failed job for another attempt, or marks it failed after max_attempts
+        '''
+        with self._lock:
+            job = self._jobs[name]
+            if (job['status'] == 'leased') and (job['worker'] == worker_id):
+                job['status'] = 'pending' if job['attempts'] < self.max_attempts else 'failed'
+                job['error'] = error
+
+    def counts(self):
+        '''
+        the number of jobs by status
+        '''
+        with self._lock:
+            counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        return counts
+
+    def failures(self):
+        with self._lock:
+            return [[job['spec']['name'], job['error']] for job in self._jobs.values() if job['status'] == 'failed']
+
+
+class SQLiteQueue(object):
+    '''
+    a work queue in an SQLite file, ie. on a volume shared by the crawler nodes.
+    Leases are taken in IMMEDIATE transactions, so workers on several hosts never lease the same job twice
+    while its lease is valid.
+
+    Parameters:
+    -----------
+    path: the SQLite database file, created if it does not exist
+    lease_seconds = LEASE_SECONDS: how long a leased job may run without a heartbeat
+                                   before it is handed to another worker
+    max_attempts = MAX_ATTEMPTS: leases per job before it is marked failed
+    '''
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as con:
+            con.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                               name TEXT PRIMARY KEY,
+                               spec TEXT NOT NULL,
+                               status TEXT NOT NULL DEFAULT 'pending',
+                               worker TEXT,
+                               lease_until REAL NOT NULL DEFAULT 0,
+                               attempts INTEGER NOT NULL DEFAULT 0,
+                               error TEXT,
+                               result TEXT)''')
+            con.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)')
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        return _Transaction(con)
+
+    def put(self, specs):
+        with self._connect() as con:
+            before = con.total_changes
+            con.executemany('INSERT OR IGNORE INTO jobs (name, spec) VALUES (?, ?)',
+                            [(spec['name'], json.dumps(spec, default=str)) for spec in specs])
+            return con.total_changes - before
+
+    def lease(self, worker_id, n=1):
+        now = time.time()
+        with self._connect() as con:
+            con.execute('''UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired')
+                           WHERE status = 'leased' AND lease_until < ? AND attempts >= ?''',
+                        (now, self.max_attempts))
+            rows = con.execute('''SELECT name, spec FROM jobs
+                                  WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?))
+                                    AND attempts < ?
+                                  ORDER BY rowid LIMIT ?''', (now, self.max_attempts, n)).fetchall()
+            con.executemany('''UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                               WHERE name = ?''',
+                            [(worker_id, now + self.lease_seconds, name) for name, _ in rows])
+        return [json.loads(spec) for _, spec in rows]
+
+    def heartbeat(self, worker_id, names):
+        with self._connect() as con:
+            con.executemany('''UPDATE jobs SET lease_until = ?
+                               WHERE name = ? AND worker = ? AND status = 'leased' ''',
+                            [(time.time() + self.lease_seconds, name, worker_id) for name in names])
+
+    def complete(self, worker_id, name, result=None):
+        with self._connect() as con:
+            con.execute('''UPDATE jobs SET status = 'done', worker = ?, result = ?, error = NULL
+                           WHERE name = ? AND status != 'done' ''', (worker_id, result, name))
+
+    def fail(self, worker_id, name, error):
+        with self._connect() as con:
+            con.execute('''UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                                           error = ?
+                           WHERE name = ? AND worker = ? AND status = 'leased' ''',
+                        (self.max_attempts, error, name, worker_id))
+
+    def counts(self):
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self._connect() as con:
+            for status, n in con.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'):
+                counts[status] = n
+        return counts
+
+    def failures(self):
+        with self._connect() as con:
+            return [list(row) for row in con.execute("SELECT name, error FROM jobs WHERE status = 'failed'")]
+
+
+class _Transaction(object):
+    '''
+    an sqlite3 connection used as an IMMEDIATE transaction that is committed and closed on exit
+    '''
+
+    def __init__(self, con):
+        self.con = con
+
+    def __enter__(self):
+        self.con.execute('BEGIN IMMEDIATE')
+        return self.con
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.con.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+        finally:
+            self.con.close()
+
+
+def run_worker(queue,
+               worker_id=None,
+               sink=None,
+               max_workers=1,
+               poll_interval=5,
+               exit_when_empty=True,
+               stream=sys.stderr,
+               profile=False):
+    '''
+    leases jobs from a shared queue and runs them until the queue is drained.
+    Leases of running jobs are renewed by a heartbeat thread every third of the lease time,
+    jobs of dead workers are picked up again once their lease expires.
+
+    Parameters:
+    -----------
+    queue: a SQLiteQueue or MemoryQueue
+    worker_id = None: a name for this worker, defaults to host name and process id
+    sink = None: a sink with a write(name, result) method, ie. DirectorySink. Writes must be idempotent,
+                 as a job may run twice if a lease expires while it is still running.
+                 A StreamingSink writes the rows of such a job twice, read its tables with sinks.read_table,
+                 which keeps the rows of the last run of every job.
+    max_workers = 1: number of jobs run at the same time
+    poll_interval = 5: seconds to wait when all remaining jobs are leased by other workers
+    exit_when_empty = True: return once no pending or leased jobs remain, otherwise keep polling
+    profile = False: trace every job and print the time spent per stage when done, see batch.run_jobs
+
+    Returns:
+    -----------
+    the number of jobs this worker completed
+    '''
+    if profile:
+        with tracing() as tracer:
+            completed = run_worker(queue, worker_id=worker_id, sink=sink, max_workers=max_workers,
+                                   poll_interval=poll_interval, exit_when_empty=exit_when_empty, stream=stream)
+        print(tracer.summary().to_string(), file=stream)
+        return completed
+
+    if worker_id is None:
+        worker_id = f'{socket.gethostname()}-{os.getpid()}'
+
+    running = set()
+    running_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(queue.lease_seconds / 3):
+            with running_lock:
+                names = list(running)
+            if len(names) > 0:
+                queue.heartbeat(worker_id, names)
+
+    def run(spec):
+        try:
+            job = spec_to_job(spec)
+            result = batch.call_job(job)
+            written = sink.write(job['name'], result) if sink is not None else None
+            queue.complete(worker_id, spec['name'], result=written)
+            return True
+        except Exception as e:
+            queue.fail(worker_id, spec['name'], f'{type(e).__name__}: {e}')
+            print(f'{worker_id}: {spec["name"]} failed - {type(e).__name__}: {e}', file=stream)
+            return False
+        finally:
+            with running_lock:
+                running.discard(spec['name'])
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+
+    completed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                specs = queue.lease(worker_id, n=max_workers)
+                if len(specs) == 0:
+                    counts = queue.counts()
+                    if exit_when_empty and (counts['pending'] + counts['leased'] == 0):
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                with running_lock:
+                    running.update(spec['name'] for spec in specs)
+                completed += sum(executor.map(run, specs))
+                print(f'{worker_id}: {completed} jobs completed, {queue.counts()}', file=stream)
+    finally:
+        stop.set()
+        if sink is not None:
+            sink.close()
+
+    return completed